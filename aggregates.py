@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from neo4j import Driver
+import instrumentation
+import queries
+
+scheduler_log = logging.getLogger("neo4j_app.aggregates")
+
+# Precomputed aggregates: name -> (query, refresh interval in seconds, labels whose
+# writes force a refresh). Every query returns one record with a `value` column,
+# a map, a list of [key, count] pairs (read as a dict) or a number.
+AGGREGATES = {
+    "totals": ("aggregate_totals", 60, ("Aircraft", "Soldier", "Drone")),
+    "drones_per_brand": ("aggregate_drones_per_brand", 300, ("Drone",)),
+    "drones_per_aircraft": ("aggregate_drones_per_aircraft", 300, ("Aircraft", "Drone")),
+    "soldiers_without_drones": ("aggregate_soldiers_without_drones", 120, ("Soldier", "Drone")),
+}
+
+# Aggregate queries whose value is also a part of the statistics query
+STATISTICS_QUERIES = ("aggregate_totals", "aggregate_drones_per_brand", "aggregate_drones_per_aircraft",
+                      "aggregate_soldiers_without_drones")
+
+# Value of an aggregate query taken from a record of the statistics query, for the
+# drivers that answer it in one go (fake_driver.py, snapshot.py) and for refreshing
+# several aggregates in one round trip (AggregateScheduler.refresh)
+def value_from_statistics(query, record):
+    if query == "aggregate_totals":
+        return {"Aircraft": record["aircraft"], "Soldier": record["soldiers"], "Drone": record["drones"]}
+    if query == "aggregate_drones_per_brand":
+        return [[row["brand"], row["count"]] for row in record["drones_per_brand"]]
+    if query == "aggregate_drones_per_aircraft":
+        return [[row["aircraft"], row["count"]] for row in record["drones_per_aircraft"]]
+    return record["soldiers_without_drones"]
+
+def _parse(value):
+    if isinstance(value, list):
+        return {key: count for key, count in value}
+    return dict(value) if isinstance(value, dict) else value
+
+# Aggregates shared by every session of the process. A background thread (see
+# start) refreshes each one when its interval has passed or when a write to one of
+# its labels marked it dirty, so readers get the cached value at once together
+# with when it was computed and whether a refresh is pending. Without the thread,
+# readers refresh due aggregates themselves, as before.
+class AggregateScheduler:
+    def __init__(self, aggregates=None, tick=1.0):
+        self.aggregates = dict(aggregates or AGGREGATES)
+        self.tick = tick
+        self._lock = threading.Lock()
+        # name -> {"value", "refreshed_at", "duration_ms", "error"}
+        self._entries = {}
+        self._dirty = set(self.aggregates)
+        # Writes and patches per aggregate, to tell whether one happened during a refresh
+        self._writes = {name: 0 for name in self.aggregates}
+        self._attempted_at = {}
+        self._driver = None
+        self._thread = None
+        self._wake = threading.Event()
+
+    # Override refresh intervals, as {name: seconds}
+    def configure(self, intervals):
+        with self._lock:
+            for name, interval in intervals.items():
+                query, _, labels = self.aggregates[name]
+                self.aggregates[name] = (query, float(interval), labels)
+
+    # Run the refresh thread against this driver, once per process. A later call
+    # with another driver (e.g. after a reconnect) switches it over.
+    def start(self, driver: Driver):
+        with self._lock:
+            self._driver = driver
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="aggregate-scheduler", daemon=True)
+            self._thread.start()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Recompute aggregates now (all of them by default), returns their values.
+    # Several aggregates that are parts of the statistics query are read together
+    # with it, in one round trip; the others with their own query.
+    def refresh(self, driver: Driver, names=None):
+        names = list(names or self.aggregates)
+        combined = [name for name in names if self.aggregates[name][0] in STATISTICS_QUERIES]
+        if len(combined) < 2:
+            combined = []
+        groups = ([combined] if combined else []) + [[name] for name in names if name not in combined]
+        values = {}
+        for group in groups:
+            values.update(self._refresh(driver, group))
+        return {name: values[name] for name in names}
+
+    def _refresh(self, driver: Driver, names):
+        with self._lock:
+            writes = {name: self._writes[name] for name in names}
+            for name in names:
+                self._attempted_at[name] = time.monotonic()
+        started = time.perf_counter()
+        try:
+            with driver.session() as session:
+                if len(names) == 1:
+                    record = instrumentation.run_single(session, queries.render(self.aggregates[names[0]][0]))
+                    results = {names[0]: record["value"]}
+                else:
+                    record = instrumentation.run_single(session, queries.render("statistics"))
+                    results = {name: value_from_statistics(self.aggregates[name][0], record) for name in names}
+        except Exception as e:
+            with self._lock:
+                for name in names:
+                    entry = self._entries.setdefault(name, {"value": None, "refreshed_at": None, "duration_ms": None})
+                    entry["error"] = str(e)
+            raise
+        duration_ms = (time.perf_counter() - started) * 1000
+        values = {name: _parse(value) for name, value in results.items()}
+        with self._lock:
+            for name, value in values.items():
+                self._entries[name] = {"value": value, "refreshed_at": time.time(), "duration_ms": duration_ms, "error": None}
+                # A write during the refresh may be missing from the value
+                if self._writes[name] == writes[name]:
+                    self._dirty.discard(name)
+        return values
+
+    # Writes to these labels (every label when none are given) force a refresh
+    def mark_dirty(self, *labels):
+        with self._lock:
+            for name, (_, _, aggregate_labels) in self.aggregates.items():
+                if not labels or set(labels) & set(aggregate_labels):
+                    self._dirty.add(name)
+                    self._writes[name] += 1
+        self._wake.set()
+
+    # Update a cached value in place with update(value) -> value, for writes whose
+    # effect is known. Nothing happens before the first refresh.
+    def patch(self, name, update):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["value"] is None:
+                return
+            entry["value"] = update(entry["value"])
+            self._writes[name] += 1
+
+    # Current values of the aggregates. Missing ones are computed here; dirty or
+    # expired ones too unless the refresh thread runs, which is woken instead.
+    def values(self, driver: Driver, names=None):
+        names = names or list(self.aggregates)
+        due = self._due(names)
+        with self._lock:
+            missing = [name for name in names if self._entries.get(name, {}).get("value") is None]
+        refresh = missing if self.running() else sorted(set(missing) | set(due))
+        if refresh:
+            self.refresh(driver, refresh)
+        elif due:
+            self._wake.set()
+        with self._lock:
+            return {name: _copy(self._entries[name]["value"]) for name in names}
+
+    # Staleness of each aggregate: age in seconds, duration of the last refresh,
+    # whether a refresh is pending and the last error
+    def status(self):
+        now = time.time()
+        due = set(self._due(list(self.aggregates)))
+        with self._lock:
+            return {
+                name: {
+                    "age_s": None if entry.get("refreshed_at") is None else now - entry["refreshed_at"],
+                    "duration_ms": entry.get("duration_ms"),
+                    "pending": name in due,
+                    "error": entry.get("error"),
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def _due(self, names):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                name for name in names
+                if name in self._dirty or now - self._attempted_at.get(name, float("-inf")) >= self.aggregates[name][1]
+            ]
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.tick)
+            self._wake.clear()
+            due = self._due(list(self.aggregates))
+            if not due:
+                continue
+            try:
+                self.refresh(self._driver, due)
+            except Exception as e:
+                # Retried at the next interval; readers keep the last value
+                scheduler_log.warning("Refreshing aggregates %s failed: %s", ", ".join(due), e)
+                with self._lock:
+                    self._dirty.difference_update(due)
+
+def _copy(value):
+    return dict(value) if isinstance(value, dict) else value
+
+# Process-wide scheduler
+aggregate_scheduler = AggregateScheduler()
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from neo4j import Driver
+import queries
+from memory_graph import MemoryGraph
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 30
+
+# In-process projection of the whole fleet graph for analytics, kept in a MemoryGraph
+# (typed arrays of nodes and relationships). It is loaded in one read transaction and
+# then follows the change feed (see changes.py): created nodes and relationships are
+# added and deleted nodes removed in place; bulk writes mark it stale, which reloads
+# it on the next view. Results are cached until the projection changes.
+class FleetProjection:
+    def __init__(self, resync_interval=3600):
+        self.resync_interval = resync_interval
+        self._lock = threading.RLock()
+        # Held while loading, so sessions finding the projection stale load it once
+        self._load_lock = threading.Lock()
+        self._graph = None
+        # Server time the projection was read at, as a change log version
+        self._version = 0
+        self._loaded_at = 0.0
+        self._stale = True
+        self._results = {}
+
+    def load(self, driver: Driver):
+        # Imported here: changes.py imports this module for fleet_projection alone
+        import snapshot
+        version, _, nodes, relationships = snapshot.read_graph(driver, statistics=False)
+        graph = MemoryGraph.from_rows(nodes, relationships)
+        with self._lock:
+            self._graph = graph
+            self._version = version
+            self._loaded_at = time.monotonic()
+            self._stale = False
+            self._results = {}
+
+    def _fresh(self):
+        with self._lock:
+            return self._graph is not None and not self._stale and time.monotonic() - self._loaded_at < self.resync_interval
+
+    # The projection, reloaded when stale or older than resync_interval. Sessions
+    # finding it stale meanwhile wait for that load and use its result.
+    def graph(self, driver: Driver):
+        if not self._fresh():
+            with self._load_lock:
+                if not self._fresh():
+                    self.load(driver)
+        return self._graph
+
+    def mark_stale(self):
+        with self._lock:
+            self._stale = True
+
+    # Apply one change of the change log. Changes committed before the projection was
+    # read, i.e. more than COMMIT_LAG before it, are skipped; the others may be in it
+    # or not, so applying them is idempotent.
+    def apply(self, change):
+        with self._lock:
+            graph = self._graph
+            if graph is None or self._stale or change["version"] <= self._version - queries.COMMIT_LAG:
+                return
+            kind = change["kind"]
+            if kind == "node_created" and graph.find_by_uuid(change["label"], change["uuid"]) is None:
+                graph.add_node(change["label"], change["name"], change["uuid"], change.get("brand"))
+            elif kind == "node_deleted":
+                index = graph.find_by_uuid(change["label"], change["uuid"])
+                if index is not None:
+                    graph.delete_node(change["label"], index)
+            elif kind == "relationship_created" and graph.find_edge(change.get("uuid")) is None:
+                if change["type"] not in graph.types:
+                    graph.types.append(change["type"])
+                for source in graph.find_by_name(change["source_label"], change["source"]):
+                    for target in graph.find_by_name("Drone", change["target"]):
+                        graph.add_edge(change["source_label"], source, change["type"], "Drone", target, uuid=change.get("uuid"))
+            elif kind == "invalidated":
+                self._stale = True
+            self._results = {}
+
+    # Cached result of compute(graph), until the projection changes
+    def cached(self, driver: Driver, name, compute):
+        graph = self.graph(driver)
+        with self._lock:
+            if name not in self._results:
+                self._results[name] = compute(graph)
+            return self._results[name]
+
+# Global node ids: the nodes of each label follow those of the previous labels
+def _offsets(graph):
+    sizes = [len(graph.names[label]) for label in graph.labels]
+    return dict(zip(graph.labels, np.cumsum([0] + sizes[:-1]).tolist())), sum(sizes)
+
+# Live relationships as arrays of global source ids, global target ids and type codes
+def _edge_arrays(graph):
+    offsets, _ = _offsets(graph)
+    label_offsets = np.array([offsets[label] for label in graph.labels], dtype=np.int64)
+    alive = np.frombuffer(graph.edge_alive, dtype=np.uint8).astype(bool)
+    source_labels = np.frombuffer(graph.edge_source_label, dtype=np.uint8)[alive]
+    target_labels = np.frombuffer(graph.edge_target_label, dtype=np.uint8)[alive]
+    sources = np.frombuffer(graph.edge_source, dtype=np.int64)[alive] + label_offsets[source_labels]
+    targets = np.frombuffer(graph.edge_target, dtype=np.int64)[alive] + label_offsets[target_labels]
+    return sources, targets, np.frombuffer(graph.edge_type, dtype=np.uint8)[alive]
+
+def _alive(graph):
+    return np.concatenate([np.frombuffer(graph.node_alive[label], dtype=np.uint8) for label in graph.labels]).astype(bool)
+
+# Label, name and UUID of every global node id
+def _node_frame(graph):
+    return pd.DataFrame({
+        "Label": pd.Categorical(np.repeat(graph.labels, [len(graph.names[label]) for label in graph.labels]), categories=graph.labels),
+        "Name": [name for label in graph.labels for name in graph.names[label]],
+        "UUID": [uuid for label in graph.labels for uuid in graph.uuids[label]],
+    })
+
+# Per node: degree, degree centrality and PageRank on the undirected graph
+def node_metrics(graph):
+    _, count = _offsets(graph)
+    sources, targets, _ = _edge_arrays(graph)
+    alive = _alive(graph)
+    ends = np.concatenate([sources, targets])
+    degree = np.bincount(ends, minlength=count)
+
+    # Power iteration; a random surfer leaves every node over one of its relationships
+    live = max(int(alive.sum()), 1)
+    rank = np.where(alive, 1.0 / live, 0.0)
+    others = np.concatenate([targets, sources])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(degree > 0, 1.0 / degree, 0.0)
+    for _ in range(PAGERANK_ITERATIONS):
+        flow = np.bincount(others, weights=(rank * share)[ends], minlength=count)
+        dangling = rank[alive & (degree == 0)].sum()
+        rank = np.where(alive, (1 - PAGERANK_DAMPING) / live + PAGERANK_DAMPING * (flow + dangling / live), 0.0)
+
+    frame = _node_frame(graph)
+    frame["Degree"] = degree
+    frame["DegreeCentrality"] = degree / max(live - 1, 1)
+    frame["PageRank"] = rank
+    return frame[alive].reset_index(drop=True)
+
+# Connected component of every live node, by minimum-label propagation with pointer
+# jumping; every pass is a few vectorized operations over the relationships
+def components(graph):
+    _, count = _offsets(graph)
+    sources, targets, _ = _edge_arrays(graph)
+    component = np.arange(count)
+    while True:
+        previous = component.copy()
+        lowest = np.minimum(component[sources], component[targets])
+        np.minimum.at(component, sources, lowest)
+        np.minimum.at(component, targets, lowest)
+        component = component[component]
+        if np.array_equal(component, previous):
+            break
+    frame = _node_frame(graph)
+    frame["Component"] = component
+    frame = frame[_alive(graph)]
+    sizes = frame["Component"].map(frame["Component"].value_counts())
+    return frame.assign(ComponentSize=sizes).reset_index(drop=True)
+
+# Soldiers by number of drones they are RESPONSIBLE_FOR, most loaded first
+def soldier_load(graph):
+    counts = np.zeros(len(graph.names["Soldier"]), dtype=np.int64)
+    for soldier, _, _ in graph.edges("Soldier", "Drone", "RESPONSIBLE_FOR"):
+        counts[soldier] += 1
+    indexes = graph.node_indexes("Soldier")
+    frame = pd.DataFrame({
+        "Soldier": [graph.names["Soldier"][index] for index in indexes],
+        "UUID": [graph.uuids["Soldier"][index] for index in indexes],
+        "Drones": counts[indexes] if indexes else np.zeros(0, dtype=np.int64),
+    })
+    return frame.sort_values(["Drones", "Soldier"], ascending=[False, True]).reset_index(drop=True)
+
+# Drones that no aircraft HAS
+def orphaned_drones(graph):
+    owned = {drone for _, _, drone in graph.edges("Aircraft", "Drone", "HAS")}
+    return pd.DataFrame(
+        [
+            {"Drone": graph.names["Drone"][index], "UUID": graph.uuids["Drone"][index], "Brand": graph.brands["Drone"][index]}
+            for index in graph.node_indexes("Drone") if index not in owned
+        ],
+        columns=["Drone", "UUID", "Brand"],
+    )
+
+# Shortest path between two nodes over relationships in either direction, by
+# breadth-first search from the source. Returns the steps as dicts with the label,
+# name and UUID of each node and the relationship followed to reach it, or None
+# when they are not connected.
+def shortest_path(graph, source_label, source_uuid, target_label, target_uuid):
+    source = (source_label, graph.find_by_uuid(source_label, source_uuid))
+    target = (target_label, graph.find_by_uuid(target_label, target_uuid))
+    if source[1] is None or target[1] is None:
+        return None
+    previous = {source: None}
+    queue = deque([source])
+    while queue and target not in previous:
+        label, index = queue.popleft()
+        for other_label, other, rel_type, outgoing in graph.neighbours(label, index):
+            if (other_label, other) not in previous:
+                previous[(other_label, other)] = ((label, index), rel_type, outgoing)
+                queue.append((other_label, other))
+    if target not in previous:
+        return None
+
+    steps = []
+    node = target
+    while node is not None:
+        step = previous[node]
+        label, index = node
+        steps.append({
+            "Label": label,
+            "Name": graph.names[label][index],
+            "UUID": graph.uuids[label][index],
+            "Via": None if step is None else f"{'-' if step[2] else '<-'}[{step[1]}]{'->' if step[2] else '-'}",
+        })
+        node = None if step is None else step[0]
+    return steps[::-1]
+
+# Analyses by name, for FleetProjection.cached
+ANALYSES = {
+    "soldier_load": soldier_load,
+    "orphaned_drones": orphaned_drones,
+    "node_metrics": node_metrics,
+    "components": components,
+}
+
+# Process-wide projection
+fleet_projection = FleetProjection()
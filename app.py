@@ -1,12 +1,10 @@
+import time
+# Start of this rerun, for the paint timings of startup.py
+rerun_started = time.perf_counter()
 import streamlit as st
-from neo4j import GraphDatabase
-from pyvis.network import Network
-import pandas as pd
-import uuid  
 from enum import Enum
-import secrets
-import time
-import utils
+import startup
+import auth
 
 # Load the password from secrets
 APP_PASSWORD = st.secrets["App"]["PASSWORD"]
@@ -16,33 +14,87 @@ if "token" not in st.session_state:
     st.session_state["token"] = None
 
 # Authentication flow
-if st.session_state["token"] is None or not utils.is_token_valid(st.session_state["token"]):
+if st.session_state["token"] is None or not auth.is_token_valid(st.session_state["token"]):
     st.title("Login")
     password_input = st.text_input("Enter Password", type="password")
     if st.button("Login"):
         if password_input == APP_PASSWORD:
             # Generate a new token and store with timestamp
-            token = f"{utils.generate_token()}:{int(time.time())}"
+            token = f"{auth.generate_token()}:{int(time.time())}"
             st.session_state["token"] = token
             st.success("Login successful!")
         else:
             st.error("Incorrect password.")
-
-if st.session_state["token"] is not None and utils.is_token_valid(st.session_state["token"]):
-
-
-    st.sidebar.button("Logout", on_click=utils.logout)
-    # Connect to the database
-    uri = st.secrets["AuraDB"]["URI"]
-    username = st.secrets["AuraDB"]["USERNAME"]
-    password = st.secrets["AuraDB"]["PASSWORD"]
-
-    # Neo4j connection
-    try:
-        driver = GraphDatabase.driver(uri, auth=(username, password))
-    except Exception as e:
-        st.error(f"Error connecting to Neo4j: {e}")
-        st.stop()
+    startup.painted("Login", rerun_started)
+
+if st.session_state["token"] is not None and auth.is_token_valid(st.session_state["token"]):
+
+    # Modules of the authenticated pages, loaded after login (see startup.py)
+    with startup.timed("imports after login"):
+        import threading
+        import pandas as pd
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        import utils
+        import assets
+        import backends
+        import bulk_import
+        import graph_layout
+        import schema
+        import instrumentation
+        import snapshot
+        import ego
+        import aggregates
+
+    st.sidebar.button("Logout", on_click=auth.logout)
+    # Read-only dashboards are served from a local snapshot (see snapshot.py)
+    # without touching the database
+    snapshot_settings = dict(st.secrets.get("Snapshot", {}))
+    read_only = bool(snapshot_settings.get("READ_ONLY", False))
+
+    if read_only:
+        try:
+            driver = snapshot.get_snapshot_driver(snapshot_settings["PATH"], snapshot_settings.get("CHECK_INTERVAL", 5.0))
+            current_snapshot = driver.snapshot()
+        except Exception as e:
+            st.error(f"Error opening the snapshot: {e}")
+            st.stop()
+        st.sidebar.info("Read-only snapshot taken " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(current_snapshot.created_at)))
+        max_age = snapshot_settings.get("MAX_AGE")
+        if max_age and current_snapshot.age() > max_age:
+            st.sidebar.warning(f"The snapshot is {current_snapshot.age() / 60:.0f} minutes old, check that the exporter is running.")
+    else:
+        # Neo4j by default, or the embedded in-memory graph (see backends.py)
+        backend_settings = dict(st.secrets.get("Backend", {}))
+        database = dict(st.secrets.get("AuraDB", {}))
+
+        # Connection, shared by every rerun and session of this process
+        try:
+            driver = backends.get_driver(backend_settings, database.get("URI"), database.get("USERNAME"),
+                                         database.get("PASSWORD"), dict(st.secrets.get("Pool", {})))
+        except Exception as e:
+            st.error(f"Error connecting to Neo4j: {e}")
+            st.stop()
+
+    # Statistics are precomputed by a background thread, shared by every session
+    aggregate_settings = dict(st.secrets.get("Aggregates", {}))
+    aggregates.aggregate_scheduler.configure(dict(aggregate_settings.get("INTERVALS", {})))
+    if aggregate_settings.get("BACKGROUND", True):
+        aggregates.aggregate_scheduler.start(driver)
+
+    # Query profiling settings
+    admin_settings = dict(st.secrets.get("Admin", {}))
+    instrumentation.SLOW_QUERY_MS = admin_settings.get("SLOW_QUERY_MS", instrumentation.SLOW_QUERY_MS)
+
+    # Constraints and indexes, created once per process
+    if not read_only:
+        try:
+            missing_schema = schema.ensure_schema(driver)
+        except Exception as e:
+            missing_schema = {"schema": str(e)}
+        if missing_schema:
+            st.sidebar.warning("Missing constraints or indexes: " + ", ".join(
+                f"{name} ({reason})" for name, reason in missing_schema.items()
+            ))
 
 
 
@@ -56,150 +108,155 @@ if st.session_state["token"] is not None and utils.is_token_valid(st.session_sta
         DRONES = "Drones"
         AIRCRAFT_AND_DRONES_RELATIONSHIPS = "Aircraft and Drones Relationships"
         SOLDIERS_AND_DRONES_RELATIONSHIPS = "Soldiers and Drones Relationships"
+        EXPLORE = "Explore Neighbourhood"
+        ANALYTICS = "Fleet Analytics"
         DELETE_ENTITY = "Delete Entity"
+        BULK_IMPORT = "Bulk Import"
 
     # Get the options from the Enum for the radio button
-    options = [action.value for action in Action]
+    options = [action.value for action in Action if not (read_only and action in (Action.DELETE_ENTITY, Action.BULK_IMPORT))]
 
     # Create the radio button in the sidebar
     option = st.sidebar.radio("Choose an action:", options)
 
+    # Collect query totals for this rerun
+    rerun = instrumentation.start_rerun(option)
+
+    # Apply writes made since the last rerun to the cached data
+    utils.sync_changes(driver)
+
     if option == Action.STATISTICS.value:
         
         # Get statistics from the database
-        aircraft_count, soldier_count, drone_count = utils.get_statistics(driver)
+        statistics = utils.get_fleet_statistics(driver)
+        if statistics is None:
+            st.stop()
+        aircraft_count, soldier_count, drone_count = statistics["Aircraft"], statistics["Soldier"], statistics["Drone"]
 
         # Display an image on the front page
-        st.image("images/gremlins-deployment.jpg", caption="source: https://breakingdefense.com/2021/11/a-mothership-finally-recovers-darpas-gremlins-drone-but-its-not-all-good-news/", use_container_width=True)
+        st.image(assets.image("images/gremlins-deployment.jpg"), caption="source: https://breakingdefense.com/2021/11/a-mothership-finally-recovers-darpas-gremlins-drone-but-its-not-all-good-news/", use_container_width=True)
         
         # Display statistics
         st.subheader("Current Statistics:")
         st.write(f"Total Aircraft: {aircraft_count}")
         st.write(f"Total Soldiers: {soldier_count}")
         st.write(f"Total Drones: {drone_count}")
+        st.write(f"Soldiers without Drones: {statistics['soldiers_without_drones']}")
+
+        # Age of the precomputed aggregates
+        status = aggregates.aggregate_scheduler.status()
+        ages = [entry["age_s"] for entry in status.values() if entry["age_s"] is not None]
+        if ages:
+            pending = [name.replace("_", " ") for name, entry in status.items() if entry["pending"]]
+            st.caption(f"Computed up to {max(ages):.0f} s ago" + (f", refreshing {', '.join(pending)}" if pending else ""))
+        for name, entry in status.items():
+            if entry["error"]:
+                st.warning(f"Refreshing {name.replace('_', ' ')} failed, showing the last value: {entry['error']}")
+
+        if statistics["drones_per_brand"]:
+            st.subheader("Drones per Brand")
+            st.write(pd.DataFrame(
+                [{"Brand": brand, "Drones": count} for brand, count in statistics["drones_per_brand"].items()]
+            ))
+
+        if statistics["drones_per_aircraft"]:
+            st.subheader("Drones per Aircraft")
+            st.write(pd.DataFrame(
+                [{"Aircraft": name, "Drones": count} for name, count in statistics["drones_per_aircraft"].items()]
+            ))
 
     elif option == Action.AIRCRAFTS.value:
-        st.subheader("Add a New Aircraft")
-
-        # Add a new aircraft
-        aircraft_name = st.text_input("Enter Aircraft Name")
-
-        if st.button("Add an Aircraft"):
-            if aircraft_name:
-                result = utils.add_entity_with_uuid(driver, "Aircraft", aircraft_name)
-                if result:
-                    st.success(f"Aircraft '{aircraft_name}' added successfully.")
+        if not read_only:
+            st.subheader("Add a New Aircraft")
+
+            # Add a new aircraft
+            aircraft_name = st.text_input("Enter Aircraft Name")
+
+            if st.button("Add an Aircraft"):
+                if aircraft_name:
+                    result = utils.add_entity_with_uuid(driver, "Aircraft", aircraft_name)
+                    if result:
+                        st.success(f"Aircraft '{aircraft_name}' added successfully.")
+                    else:
+                        st.warning(f"Failed to add Aircraft '{aircraft_name}'.")
                 else:
-                    st.warning(f"Failed to add Aircraft '{aircraft_name}'.")
-            else:
-                st.error("Please provide a name for the Aircraft.")
+                    st.error("Please provide a name for the Aircraft.")
         
-        # Fetch all aircraft and display them in a table
-        query_aircraft = """
-        MATCH (a:Aircraft)
-        RETURN a.name AS Name, a.uuid AS UUID
-        """
-        aircraft = utils.run_query(driver, query_aircraft)
-
-        if aircraft:
-            # Convert aircraft data to a DataFrame for easier handling
-            aircraft_df = pd.DataFrame(aircraft)
-            
-            # Create a list of options showing both aircraft name and UUID
-            aircraft_options = [
-                f"{name} (UUID: {uuid})" for name, uuid in zip(aircraft_df['Name'], aircraft_df['UUID'])
-            ] if not aircraft_df.empty else []
-            
-            # Select aircraft to delete based on name and UUID
-            st.subheader("Delete an Aircraft")
-            aircraft_to_delete = st.selectbox("Select Aircraft to Delete", aircraft_options)
-            
-            # Extract the aircraft name and UUID from the selected option
-            if aircraft_to_delete:
-                selected_aircraft_name = aircraft_to_delete.split(" (UUID: ")[0]
-                selected_aircraft_uuid = aircraft_to_delete.split(" (UUID: ")[1].strip(")")
-
-            if st.button("Delete Aircraft"):
-                if aircraft_to_delete:
-                    # Construct the query to delete by both UUID and name
-                    delete_query = f"""
-                    MATCH (a:Aircraft {{name: '{selected_aircraft_name}', uuid: '{selected_aircraft_uuid}'}})
-                    DETACH DELETE a
-                    """
-                    utils.run_query(driver, delete_query)
-                    st.success(f"Aircraft with name '{selected_aircraft_name}' and UUID '{selected_aircraft_uuid}' has been deleted.")
-                else:
-                    st.error("Please select an aircraft to delete.")
+        # Fetch the current page of aircraft and display it in a table
+        aircraft, has_next = utils.get_current_page(driver, "Aircraft")
+
+        if not aircraft.empty:
+            if not read_only:
+                # Search the aircraft to delete by name
+                st.subheader("Delete an Aircraft")
+                aircraft_to_delete = utils.search_entity(driver, "Aircraft", "Select Aircraft to Delete", "delete_aircraft")
+
+                if st.button("Delete Aircraft"):
+                    if aircraft_to_delete:
+                        # Delete by UUID, together with its relationships
+                        counts = utils.delete_entity(driver, "Aircraft", aircraft_to_delete["UUID"])
+                        if counts and counts["nodes"]:
+                            st.success(f"Aircraft with name '{aircraft_to_delete['Name']}' and UUID '{aircraft_to_delete['UUID']}' has been deleted "
+                                       f"with {counts['relationships']} relationships.")
+                        elif counts:
+                            st.warning(f"Aircraft with UUID '{aircraft_to_delete['UUID']}' no longer exists.")
+                    else:
+                        st.error("Please select an aircraft to delete.")
             
             # Refresh the data after deletion
             st.subheader("All Aircrafts in the Database")
 
-            aircraft = utils.run_query(driver, query_aircraft)
-            aircraft_df = pd.DataFrame(aircraft)
-            st.write(aircraft_df)
+            aircraft, has_next = utils.get_current_page(driver, "Aircraft")
+            st.dataframe(aircraft)
+            utils.show_page_controls("Aircraft", aircraft, has_next)
+            utils.show_export(driver, "Aircraft", "all Aircraft")
             
             # Render the graph
-            graph = utils.create_aircrafts_network(aircraft, "Aircrafts")
-            graph.save_graph("aircrafts.html")
-            st.components.v1.html(open("aircrafts.html", "r").read(), height=500)
+            graph_html = utils.render_network_html("aircraft", aircraft, "Aircrafts")
+            st.components.v1.html(graph_html, height=500)
         else:
             st.warning("No aircrafts found in the database.")
         
         # Display image
-        st.image("images/aircraft.jpg", caption="source: https://www.fliteline.com/aircraft-guide/special-aircrafts/sprayer", use_container_width=True)
+        st.image(assets.image("images/aircraft.jpg"), caption="source: https://www.fliteline.com/aircraft-guide/special-aircrafts/sprayer", use_container_width=True)
 
 
     elif option == Action.SOLDIERS.value:
-        st.subheader("Add a New Soldier")
+        if not read_only:
+            st.subheader("Add a New Soldier")
 
-        # Add a new soldier
-        soldier_name = st.text_input("Enter Soldier Name")
+            # Add a new soldier
+            soldier_name = st.text_input("Enter Soldier Name")
         
-        if st.button("Add a soldier"):
-            if soldier_name:
-                result = utils.add_entity_with_uuid(driver, "Soldier", soldier_name)
-                if result:
-                    st.success(f"Soldier '{soldier_name}' added successfully.")
+            if st.button("Add a soldier"):
+                if soldier_name:
+                    result = utils.add_entity_with_uuid(driver, "Soldier", soldier_name)
+                    if result:
+                        st.success(f"Soldier '{soldier_name}' added successfully.")
+                    else:
+                        st.warning(f"Failed to add Soldier '{soldier_name}'.")
                 else:
-                    st.warning(f"Failed to add Soldier '{soldier_name}'.")
-            else:
-                st.error("Please provide a name for the Soldier.")
+                    st.error("Please provide a name for the Soldier.")
         
-        # Fetch all soldiers and display them in a table
-        query_soldier = """
-        MATCH (s:Soldier)
-        RETURN s.name AS Name, s.uuid AS UUID
-        """
-        soldier = utils.run_query(driver, query_soldier)
-        if soldier:
-            # Convert soldiers to DataFrame for easier handling
-            soldier_df = pd.DataFrame(soldier)
-            
-            # Create a list of options showing both soldier name and UUID
-            soldier_options = [
-                f"{name} (UUID: {uuid})" for name, uuid in zip(soldier_df['Name'], soldier_df['UUID'])
-            ] if not soldier_df.empty else []
-            
-            # Select soldier to delete based on name and UUID
-            st.subheader("Delete a Soldier")
-            soldier_to_delete = st.selectbox("Select Soldier to Delete", soldier_options)
-            
-            # Extract the soldier name and UUID from the selected option
-            if soldier_to_delete:
-                selected_soldier_name = soldier_to_delete.split(" (UUID: ")[0]
-                selected_soldier_uuid = soldier_to_delete.split(" (UUID: ")[1].strip(")")
-
-            if st.button("Delete Soldier"):
-                if soldier_to_delete:
-                    # Construct the query to delete by both UUID and name
-                    delete_query = f"""
-                    MATCH (s:Soldier {{name: '{selected_soldier_name}', uuid: '{selected_soldier_uuid}'}})
-                    DETACH DELETE s
-                    """
-                    utils.run_query(driver, delete_query)
-                    st.success(f"Soldier with name '{selected_soldier_name}' and UUID '{selected_soldier_uuid}' has been deleted.")
-                else:
-                    st.error("Please select a soldier to delete.")
+        # Fetch the current page of soldiers and display it in a table
+        soldier, has_next = utils.get_current_page(driver, "Soldier")
+        if not soldier.empty:
+            if not read_only:
+                # Search the soldier to delete by name
+                st.subheader("Delete a Soldier")
+                soldier_to_delete = utils.search_entity(driver, "Soldier", "Select Soldier to Delete", "delete_soldier")
+
+                if st.button("Delete Soldier"):
+                    if soldier_to_delete:
+                        # Delete by UUID, together with its relationships
+                        counts = utils.delete_entity(driver, "Soldier", soldier_to_delete["UUID"])
+                        if counts and counts["nodes"]:
+                            st.success(f"Soldier with name '{soldier_to_delete['Name']}' and UUID '{soldier_to_delete['UUID']}' has been deleted "
+                                       f"with {counts['relationships']} relationships.")
+                        elif counts:
+                            st.warning(f"Soldier with UUID '{soldier_to_delete['UUID']}' no longer exists.")
+                    else:
+                        st.error("Please select a soldier to delete.")
 
             
         else:
@@ -207,195 +264,294 @@ if st.session_state["token"] is not None and utils.is_token_valid(st.session_sta
 
         # Refresh the data after deletion
         st.subheader("All Soldiers in the Database")
-        soldier = utils.run_query(driver, query_soldier)
-        soldier_df = pd.DataFrame(soldier)
-        st.write(soldier_df)
+        soldier, has_next = utils.get_current_page(driver, "Soldier")
+        st.dataframe(soldier)
+        utils.show_page_controls("Soldier", soldier, has_next)
+        utils.show_export(driver, "Soldier", "all Soldiers")
         # Render the graph
-        graph = utils.create_soldiers_network(soldier, "Soldiers")
-        graph.save_graph("soldiers.html")
-        st.components.v1.html(open("soldiers.html", "r").read(), height=500)
+        graph_html = utils.render_network_html("soldiers", soldier, "Soldiers")
+        st.components.v1.html(graph_html, height=500)
         
-        st.image("images/soldier.jpg", caption="source: https://www.defense.gov/Multimedia/Photos/igphoto/2002889537/", use_container_width=True)
+        st.image(assets.image("images/soldier.jpg"), caption="source: https://www.defense.gov/Multimedia/Photos/igphoto/2002889537/", use_container_width=True)
 
     elif option == Action.DRONES.value:
-        st.subheader("Add a New Drone")
-
-        aircraft_names = utils.get_aircraft_names(driver)
-        soldier_names = utils.get_soldier_names(driver)
-
-        if not aircraft_names:
-            st.error("No Aircraft found in the database. Add Aircraft first.")
-        if not soldier_names:
-            st.error("No Soldiers found in the database. Add Soldiers first.")
+        # Search results for aircraft and soldiers and the current drones page, fetched concurrently
+        aircraft_matches, soldier_matches, drones, has_next = utils.fetch_drones_page(driver, "drone_aircraft", "drone_soldier")
         
-        # Adding a drone section
-        aircraft_name = st.selectbox("Select Aircraft", aircraft_names)
-        drone_name = st.text_input("Enter Drone Name")
-        soldier_name = st.selectbox("Select Soldier", soldier_names)
-        brand = st.text_input("Enter Drone Brand")
-
-        if st.button("Add a drone"):
-            if drone_name and soldier_name and brand:
-                result = utils.add_drone_with_unique_name_and_brand(driver, aircraft_name, drone_name, soldier_name, brand)
-                if result:
-                    st.success(f"Drone '{drone_name}' of brand '{brand}' added and assigned to Soldier '{soldier_name}'.")
-                else:
-                    st.warning(f"Failed to add drone '{drone_name}'.")
-            else:
-                st.error("Please provide all fields.")
-
-        # Fetch all drones and display them in a table
-        query_drones = """
-        MATCH (d:Drone)
-        RETURN d.name AS Drone, d.uuid AS UUID, d.brand AS Brand
-        """
-        drones = utils.run_query(driver, query_drones)
-        if drones:
-            drones_df = pd.DataFrame(drones)
-            
-            # Create a list of options showing both drone name and UUID
-            drone_options = [
-                f"{drone} (UUID: {uuid})" for drone, uuid in zip(drones_df['Drone'], drones_df['UUID'])
-            ] if not drones_df.empty else []
-            
-            # Select drone to delete based on UUID
-            st.subheader("Delete a Drone")
-            drone_to_delete = st.selectbox("Select Drone to Delete", drone_options)
-            
-            # Extract the drone name and UUID from the selected option
-            if drone_to_delete:
-                selected_drone_name = drone_to_delete.split(" (UUID: ")[0]
-                selected_drone_uuid = drone_to_delete.split(" (UUID: ")[1].strip(")")
-
-            if st.button("Delete Drone"):
-                if drone_to_delete:
-                    # Construct the query to delete by both UUID and name
-                    delete_query = f"""
-                    MATCH (d:Drone {{name: '{selected_drone_name}', uuid: '{selected_drone_uuid}'}})
-                    DETACH DELETE d
-                    """
-                    utils.run_query(driver, delete_query)
-                    st.success(f"Drone with name '{selected_drone_name}' and UUID '{selected_drone_uuid}' has been deleted.")
+        if not read_only:
+            st.subheader("Add a New Drone")
+
+            # Adding a drone section
+            selected_aircraft = utils.show_entity_search("Aircraft", "Select Aircraft", "drone_aircraft", aircraft_matches)
+            drone_name = st.text_input("Enter Drone Name")
+            selected_soldier = utils.show_entity_search("Soldier", "Select Soldier", "drone_soldier", soldier_matches)
+            brand = st.text_input("Enter Drone Brand")
+
+            if st.button("Add a drone"):
+                if selected_aircraft and drone_name and selected_soldier and brand:
+                    soldier_name = selected_soldier["Name"]
+                    result = utils.add_drone_with_unique_name_and_brand(driver, selected_aircraft["UUID"], drone_name, selected_soldier["UUID"], brand)
+                    if result:
+                        st.success(f"Drone '{drone_name}' of brand '{brand}' added and assigned to Soldier '{soldier_name}'.")
+                    else:
+                        st.warning(f"Failed to add drone '{drone_name}'.")
                 else:
-                    st.error("Please select a drone to delete.")
+                    st.error("Please provide all fields.")
+
+        # Display the current page of drones in a table
+        if not drones.empty:
+            if not read_only:
+                # Search the drone to delete by name
+                st.subheader("Delete a Drone")
+                drone_to_delete = utils.search_entity(driver, "Drone", "Select Drone to Delete", "delete_drone")
+
+                if st.button("Delete Drone"):
+                    if drone_to_delete:
+                        # Delete by UUID, together with its relationships
+                        counts = utils.delete_entity(driver, "Drone", drone_to_delete["UUID"])
+                        if counts and counts["nodes"]:
+                            st.success(f"Drone with name '{drone_to_delete['Name']}' and UUID '{drone_to_delete['UUID']}' has been deleted "
+                                       f"with {counts['relationships']} relationships.")
+                        elif counts:
+                            st.warning(f"Drone with UUID '{drone_to_delete['UUID']}' no longer exists.")
+                    else:
+                        st.error("Please select a drone to delete.")
             # Render the graph
         else:
             st.warning("No drones found in the database.")
         
         # Refresh the data after deletion
         st.subheader("All Drones in the Database")
-        drone = utils.run_query(driver, query_drones)
-        drones_df = pd.DataFrame(drone)
-        st.write(drones_df)
-        graph = utils.create_drones_network(drones, "Drones")
-        graph.save_graph("drones.html")
-        st.components.v1.html(open("drones.html", "r").read(), height=500)
+        drone, has_next = utils.get_current_page(driver, "Drone")
+        st.dataframe(drone)
+        utils.show_page_controls("Drone", drone, has_next)
+        utils.show_export(driver, "Drone", "all Drones")
+        graph_html = utils.render_network_html("drones", drone, "Drones")
+        st.components.v1.html(graph_html, height=500)
         
-        st.image("images/gremlins-x-61.jpg", caption="source: https://en.wikipedia.org/wiki/Dynetics_X-61_Gremlins", use_container_width=True)
+        st.image(assets.image("images/gremlins-x-61.jpg"), caption="source: https://en.wikipedia.org/wiki/Dynetics_X-61_Gremlins", use_container_width=True)
 
 
     elif option == Action.AIRCRAFT_AND_DRONES_RELATIONSHIPS.value:
 
         st.subheader("Relationships")
 
-        # Dropdown for existing aircraft and drone names
-        aircraft_names = utils.get_aircraft_names(driver)
-        drone_names = utils.get_drone_names(driver)
-
-        if not aircraft_names:
-            st.error("No Aircraft found in the database. Add Aircraft first.")
-        if not drone_names:
-            st.error("No Drones found in the database. Add Drones first.")
-
-        selected_aircraft = st.selectbox("Select Aircraft", aircraft_names, index=0 if aircraft_names else -1)
-        selected_drone = st.selectbox("Select Drone", drone_names, index=0 if drone_names else -1)
-        relationship_type = st.selectbox("Select Relationship Type", utils.allowed_relationship_types)
-
-        if st.button("Add a relationship"):
-            if selected_aircraft and selected_drone and relationship_type:
-                result = utils.add_relationship(driver, selected_aircraft, selected_drone, relationship_type)
-                if result:
-                    st.success(f"Relationship {relationship_type} added between {selected_aircraft} and {selected_drone}.")
+        # Search results for aircraft and drones, fetched concurrently with the relationships
+        aircraft_matches, drone_matches, relationships = utils.fetch_aircraft_drone_page(driver, "relationship_aircraft", "relationship_drone")
+
+        if not read_only:
+            aircraft = utils.show_entity_search("Aircraft", "Select Aircraft", "relationship_aircraft", aircraft_matches)
+            drone = utils.show_entity_search("Drone", "Select Drone", "relationship_drone", drone_matches)
+            selected_aircraft = aircraft["Name"] if aircraft else None
+            selected_drone = drone["Name"] if drone else None
+            relationship_type = st.selectbox("Select Relationship Type", utils.allowed_relationship_types)
+
+            if st.button("Add a relationship"):
+                if selected_aircraft and selected_drone and relationship_type:
+                    result = utils.add_relationship(driver, selected_aircraft, selected_drone, relationship_type)
+                    if result:
+                        st.success(f"Relationship {relationship_type} added between {selected_aircraft} and {selected_drone}.")
+                        relationships = utils.get_aircraft_drone_relationships(driver)
+                    else:
+                        st.warning("Failed to add relationship. Check the entity names.")
                 else:
-                    st.warning("Failed to add relationship. Check the entity names.")
-            else:
-                st.error("Please provide all fields.")
-
-        # Relationship query
-        query_aircraft_drones = """
-        MATCH (a:Aircraft)-[r]->(d:Drone)
-        RETURN a.name AS Aircraft, d.name AS Drone, type(r) AS Relationship
-        """
-        relationships = utils.run_query(driver, query_aircraft_drones)
+                    st.error("Please provide all fields.")
 
-        if relationships:
+        if not relationships.empty:
             st.subheader("Relationships between Aircraft and Drones")
-            st.write(pd.DataFrame(relationships))
+            st.dataframe(relationships)
+            utils.show_export(driver, "aircraft_drone", "Relationships")
 
-            graph = utils.create_aircraft_drone_network(relationships, "Aircraft-Drone Relationships")
-            graph.save_graph("graph.html")
-            st.components.v1.html(open("graph.html", "r").read(), height=500)
+            if graph_layout.is_large(relationships, "Aircraft", "Drone"):
+                # Server-side layout with groups collapsed to fit the node budget, client physics off
+                expanded = st.multiselect("Expand clusters", graph_layout.cluster_names(relationships, "Aircraft", "Drone"))
+                graph_html = utils.render_large_network_html(relationships, "Aircraft-Drone Relationships", "Aircraft", "Drone", expanded)
+            else:
+                graph_html = utils.render_network_html("aircraft_drone", relationships, "Aircraft-Drone Relationships")
+            st.components.v1.html(graph_html, height=500)
         else:
             st.warning("No relationships found.")
 
     elif option == Action.SOLDIERS_AND_DRONES_RELATIONSHIPS.value:
-        st.subheader("Assign Soldier to Drone")
-
-        drone_names = utils.get_drone_names(driver)
-
-        if not drone_names:
-            st.error("No Drones found in the database. Add Drones first.")
-
-        soldier_names = utils.get_soldier_names(driver)
-        if not soldier_names:
-            st.error("No Soldiers found in the database. Add Soldiers first.")
-
-        soldier_name = st.selectbox("Select Soldier", soldier_names)
-        drone_name = st.selectbox("Select Drone", drone_names)
-
-        if st.button("Assign Soldier to Drone"):
-            if soldier_name and drone_name:
-                result = utils.assign_soldier_to_drone(driver, soldier_name, drone_name)
-                if result:
-                    st.success(f"Soldier '{soldier_name}' has been assigned to Drone '{drone_name}'.")
+        # Search results for soldiers and drones, fetched concurrently with the relationships
+        soldier_matches, drone_matches, relationships = utils.fetch_soldier_drone_page(driver, "assign_soldier", "assign_drone")
+
+        if not read_only:
+            st.subheader("Assign Soldier to Drone")
+
+            soldier = utils.show_entity_search("Soldier", "Select Soldier", "assign_soldier", soldier_matches)
+            drone = utils.show_entity_search("Drone", "Select Drone", "assign_drone", drone_matches)
+            soldier_name = soldier["Name"] if soldier else None
+            drone_name = drone["Name"] if drone else None
+
+            if st.button("Assign Soldier to Drone"):
+                if soldier_name and drone_name:
+                    result = utils.assign_soldier_to_drone(driver, soldier_name, drone_name)
+                    if result:
+                        st.success(f"Soldier '{soldier_name}' has been assigned to Drone '{drone_name}'.")
+                        relationships = utils.get_soldier_drone_relationships(driver)
+                    else:
+                        st.warning(f"Failed to assign Soldier to Drone '{drone_name}'.")
                 else:
-                    st.warning(f"Failed to assign Soldier to Drone '{drone_name}'.")
-            else:
-                st.error("Please provide both Soldier and Drone names.")
+                    st.error("Please provide both Soldier and Drone names.")
 
-        
-        # Relationship query
-        query_soldiers_drones = """
-        MATCH (a:Soldier)-[r]->(d:Drone)
-        RETURN a.name AS Soldier, d.name AS Drone, type(r) AS Relationship
-        """
-        relationships = utils.run_query(driver, query_soldiers_drones)
-
-        if relationships:
+
+        if not relationships.empty:
             st.subheader("Relationships between Soldier and Drones")
-            st.write(pd.DataFrame(relationships))
+            st.dataframe(relationships)
+            utils.show_export(driver, "soldier_drone", "Relationships")
 
-            graph = utils.create_soldier_drone_network(relationships, "Soldier-Drone Relationships")
-            graph.save_graph("graph.html")
-            st.components.v1.html(open("graph.html", "r").read(), height=500)
+            if graph_layout.is_large(relationships, "Soldier", "Drone"):
+                # Server-side layout with groups collapsed to fit the node budget, client physics off
+                expanded = st.multiselect("Expand clusters", graph_layout.cluster_names(relationships, "Soldier", "Drone"))
+                graph_html = utils.render_large_network_html(relationships, "Soldier-Drone Relationships", "Soldier", "Drone", expanded)
+            else:
+                graph_html = utils.render_network_html("soldier_drone", relationships, "Soldier-Drone Relationships")
+            st.components.v1.html(graph_html, height=500)
         else:
             st.warning("No relationships found.")
 
+    elif option == Action.EXPLORE.value:
+        st.subheader("Explore the Neighbourhood of an Entity")
+
+        entity_type = st.selectbox("Start from", ["Aircraft", "Soldier", "Drone"], key="explore_type")
+        root = utils.search_entity(driver, entity_type, f"Select {entity_type}", f"explore_{entity_type}")
+        depth = st.slider("Hops", 1, ego.MAX_DEPTH, ego.DEFAULT_DEPTH)
+        fan_out = st.number_input("Neighbours per node", min_value=5, max_value=200, value=ego.DEFAULT_FAN_OUT, step=5)
+
+        if root:
+            # Pages loaded per node, reset when the starting entity changes
+            if st.session_state.get("explore_root") != (entity_type, root["UUID"]):
+                st.session_state["explore_root"] = (entity_type, root["UUID"])
+                st.session_state["explore_pages"] = {}
+            pages = st.session_state["explore_pages"]
+
+            nodes, relationships = utils.get_neighbourhood(driver, entity_type, root["UUID"], root["Name"], depth, int(fan_out), pages)
+            st.write(f"{len(nodes)} entities and {len(relationships)} relationships within {depth} hops of {root['Name']}.")
+
+            # Expanded entities with neighbours not loaded yet
+            truncated = nodes[nodes["More"]] if not nodes.empty else nodes
+            if not truncated.empty:
+                node = st.selectbox("Load more neighbours of", truncated.to_dict("records"),
+                                    format_func=lambda node: f"{node['Name']} ({node['Label']})")
+                if st.button("Load more"):
+                    pages[(node["Label"], node["UUID"])] = pages.get((node["Label"], node["UUID"]), 1) + 1
+                    st.rerun()
+
+            if not relationships.empty:
+                graph_html = utils.render_network_html("ego", relationships, f"Neighbourhood of {root['Name']}")
+                st.components.v1.html(graph_html, height=500)
+                st.dataframe(relationships)
+            else:
+                st.info(f"{root['Name']} has no relationships.")
+
+    elif option == Action.ANALYTICS.value:
+        st.subheader("Fleet Analytics")
+
+        # Soldiers responsible for more drones than the threshold
+        threshold = st.number_input("Overloaded above this many drones", min_value=0, value=3, step=1)
+        load = utils.get_fleet_analysis(driver, "soldier_load")
+        if not load.empty:
+            overloaded = load[load["Drones"] > threshold]
+            st.write(f"{len(overloaded)} of {len(load)} soldiers are responsible for more than {threshold} drones.")
+            st.dataframe(overloaded)
+
+        st.subheader("Drones without an Aircraft")
+        orphaned = utils.get_fleet_analysis(driver, "orphaned_drones")
+        st.write(f"{len(orphaned)} drones are not carried by any aircraft.")
+        if not orphaned.empty:
+            st.dataframe(orphaned)
+
+        st.subheader("Connected Components")
+        components = utils.get_fleet_analysis(driver, "components")
+        if not components.empty:
+            sizes = components.drop_duplicates("Component")["ComponentSize"]
+            st.write(f"{len(sizes)} components, the largest with {sizes.max()} entities; {int((sizes == 1).sum())} isolated entities.")
+            st.dataframe(sizes.value_counts().sort_index(ascending=False).rename_axis("Entities").reset_index(name="Components"))
+
+        st.subheader("Most Connected Entities")
+        top = st.number_input("Show", min_value=5, max_value=500, value=20, step=5)
+        metrics = utils.get_fleet_analysis(driver, "node_metrics")
+        if not metrics.empty:
+            by_degree, by_rank = st.columns(2)
+            by_degree.write("By degree")
+            by_degree.dataframe(metrics.nlargest(int(top), "Degree")[["Label", "Name", "Degree", "DegreeCentrality"]])
+            by_rank.write("By PageRank")
+            by_rank.dataframe(metrics.nlargest(int(top), "PageRank")[["Label", "Name", "PageRank"]])
+
+        st.subheader("Shortest Path")
+        source_type = st.selectbox("From", ["Soldier", "Aircraft", "Drone"], key="path_source_type")
+        source = utils.search_entity(driver, source_type, f"Select {source_type}", f"path_source_{source_type}")
+        target_type = st.selectbox("To", ["Soldier", "Aircraft", "Drone"], key="path_target_type")
+        target = utils.search_entity(driver, target_type, f"Select {target_type}", f"path_target_{target_type}")
+        if source and target:
+            path = utils.get_shortest_path(driver, source_type, source["UUID"], target_type, target["UUID"])
+            if path:
+                st.write(f"{len(path) - 1} hops from {source['Name']} to {target['Name']}.")
+                st.dataframe(pd.DataFrame(path))
+            elif path is None:
+                st.info(f"{source['Name']} and {target['Name']} are not connected.")
+            # An empty path is a failed search, already reported by utils
+
     elif option == Action.DELETE_ENTITY.value:
         st.subheader("Delete Entity (Drone, Soldier, or Aircraft)")
 
         entity_type = st.selectbox("Select Entity Type", ["Drone", "Soldier", "Aircraft"])
-        entity_uuid = st.text_input(f"Enter {entity_type} UUID")
-
-        if st.button("Delete Entity"):
-            if entity_uuid:
-                result = utils.delete_entity(driver, entity_type, entity_uuid)
-                if result:
-                    st.success(f"{entity_type} with UUID {entity_uuid} deleted successfully.")
-                else:
-                    st.warning(f"Failed to delete {entity_type} with UUID {entity_uuid}.")
+        selected = utils.search_entities(driver, entity_type, f"{entity_type} to Delete", f"delete_many_{entity_type}")
+        pasted = st.text_area(f"Or paste {entity_type} UUIDs, one per line")
+        uuids = [entity["UUID"] for entity in selected] + pasted.split()
+
+        if st.button("Delete Entities"):
+            if uuids:
+                progress_bar = st.progress(0.0)
+                progress_line = st.empty()
+
+                def report(done, total, nodes, relationships):
+                    progress_bar.progress(done / total)
+                    progress_line.write(f"{done}/{total} UUIDs processed, {nodes} {entity_type} and {relationships} relationships deleted")
+
+                counts = utils.delete_entities(driver, entity_type, uuids, progress=report)
+                if counts:
+                    st.success(f"Deleted {counts['nodes']} {entity_type} and {counts['relationships']} relationships.")
+                    if counts["missing"]:
+                        st.warning(f"{counts['missing']} of {counts['requested']} UUIDs matched no {entity_type}.")
+                    st.session_state.pop(f"delete_many_{entity_type}_select", None)
+            else:
+                st.error(f"Please select or paste at least one {entity_type} UUID.")
+
+    elif option == Action.BULK_IMPORT.value:
+        st.subheader("Bulk Import from CSV or Parquet")
+        st.write("Aircraft and Soldiers files need a `name` column, Drones files `name`, `brand`, `aircraft` and `soldier`, "
+                 "Relationships files `aircraft`, `drone` and `type`. An optional `uuid` column is kept as is.")
+
+        sources = {
+            "Aircraft": st.file_uploader("Aircraft", type=["csv", "parquet"]),
+            "Soldier": st.file_uploader("Soldiers", type=["csv", "parquet"]),
+            "Drone": st.file_uploader("Drones", type=["csv", "parquet"]),
+            "Relationship": st.file_uploader("Relationships", type=["csv", "parquet"]),
+        }
+        batch_size = st.number_input("Batch size", min_value=100, max_value=50000, value=bulk_import.DEFAULT_BATCH_SIZE, step=100)
+
+        if st.button("Import"):
+            if any(source is not None for source in sources.values()):
+                # Progress is reported from worker threads, which need the script context to draw
+                ctx = get_script_run_ctx()
+                progress_lines = {kind: st.empty() for kind, source in sources.items() if source is not None}
+
+                def report(kind, rows, written):
+                    add_script_run_ctx(threading.current_thread(), ctx)
+                    progress_lines[kind].write(f"{kind}: {rows} rows read, {written} written")
+
+                try:
+                    totals = bulk_import.run_import(driver, sources, batch_size=int(batch_size), progress=report)
+                    st.success("Import finished: " + ", ".join(f"{written} {kind}" for kind, written in totals.items()))
+                except Exception as e:
+                    st.error(f"Error importing data: {e}")
             else:
-                st.error(f"Please provide a UUID for the {entity_type}.")
+                st.error("Please upload at least one file.")
+
+    # Optional admin panel with query timings
+    if st.sidebar.checkbox("Show query profiler"):
+        utils.show_profiler_panel(rerun)
 
-    # Close the connection with Neo4j
-    driver.close()
\ No newline at end of file
+    startup.painted(option, rerun_started)
@@ -0,0 +1,64 @@
+import argparse
+import glob
+import io
+import os
+from functools import lru_cache
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+# Resized variants, built on first use or ahead of time with `python assets.py`
+CACHE_DIR = os.path.join(IMAGES_DIR, ".cache")
+# Main column of the centered layout in CSS pixels, drawn at 2x for high-DPI screens
+LAYOUT_WIDTH = 704
+SCALE = 2
+QUALITY = 80
+
+def _variant_path(path, width, quality):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{width}w-q{quality}-{int(os.path.getmtime(path))}.jpg")
+
+# An image scaled down to at most `width` pixels wide, as progressive JPEG bytes
+def _resize(path, width, quality):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        output = io.BytesIO()
+        image.convert("RGB").save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+# Bytes of an image resized for the layout, for st.image. Variants are kept in
+# process memory and in CACHE_DIR, keyed by the modification time of the original,
+# so the original is decoded once per change; a read-only CACHE_DIR only costs the
+# disk copy.
+@lru_cache(maxsize=32)
+def image(path, width=LAYOUT_WIDTH * SCALE, quality=QUALITY):
+    path = path if os.path.isabs(path) else os.path.join(os.path.dirname(IMAGES_DIR), path)
+    variant = _variant_path(path, width, quality)
+    if os.path.exists(variant):
+        with open(variant, "rb") as f:
+            return f.read()
+
+    data = _resize(path, width, quality)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{variant}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, variant)
+    except OSError:
+        pass
+    return data
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the resized variants of the images ahead of time.")
+    parser.add_argument("--width", type=int, default=LAYOUT_WIDTH * SCALE)
+    parser.add_argument("--quality", type=int, default=QUALITY)
+    args = parser.parse_args(argv)
+
+    for path in sorted(glob.glob(os.path.join(IMAGES_DIR, "*.jpg"))):
+        data = image(path, args.width, args.quality)
+        print(f"{os.path.basename(path)}: {os.path.getsize(path) // 1024} KB -> {len(data) // 1024} KB")
+
+if __name__ == "__main__":
+    main()
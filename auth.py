@@ -0,0 +1,30 @@
+import secrets
+import time
+import streamlit as st
+
+# Login helpers, kept apart from utils so the login page loads without the
+# database and graph modules
+
+# Function to generate a secure token
+def generate_token():
+    return secrets.token_hex(32)
+
+# Function to check token expiration (optional)
+def is_token_valid(token):
+    if token is None:
+        return False
+    token_parts = token.split(":")
+    if len(token_parts) != 2:
+        return False
+    try:
+        token_creation_time = int(token_parts[1])
+        current_time = int(time.time())
+        # Token valid for 1 hour (3600 seconds)
+        return current_time - token_creation_time < 3600
+    except ValueError:
+        return False
+
+# Logout function
+def logout():
+    st.session_state["token"] = None
+    st.sidebar.info("You have been logged out!")
@@ -0,0 +1,41 @@
+import threading
+import connection
+import snapshot
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+# Backends the app runs on. utils only uses the neo4j.Driver surface (sessions,
+# run / execute_read / execute_write, verify_connectivity, close) with queries
+# from the registry in queries.py, so each backend is a driver answering them:
+# - "neo4j": the shared pooled neo4j.Driver of connection.py, Cypher run by the server,
+#   replaced when it can no longer reach it (see connection.get_healthy_driver)
+# - "embedded": a MemoryGraph in this process (memory_graph.py), each registered
+#   query answered by its handler in fake_driver.py. Data lives as long as the
+#   process and can be seeded from a snapshot (see snapshot.py).
+# tests/test_conformance.py runs the same checks against both.
+BACKENDS = ("neo4j", "embedded")
+
+# One embedded graph per seed and process, like connection.get_driver
+_embedded = {}
+_lock = threading.Lock()
+
+def get_embedded_driver(seed=None):
+    with _lock:
+        driver = _embedded.get(seed)
+        if driver is None:
+            graph = MemoryGraph()
+            if seed:
+                graph = MemoryGraph.from_snapshot(snapshot.SnapshotDriver(seed).snapshot())
+            driver = FakeDriver(graph)
+            _embedded[seed] = driver
+    return driver
+
+# Driver of the configured backend. settings is the "Backend" section of secrets
+# (KIND, and SEED for the embedded backend); credentials are only needed for Neo4j.
+def get_driver(settings, uri=None, username=None, password=None, pool=None):
+    kind = settings.get("KIND", "neo4j")
+    if kind == "embedded":
+        return get_embedded_driver(settings.get("SEED"))
+    if kind == "neo4j":
+        return connection.get_healthy_driver(uri, username, password, pool)
+    raise ValueError(f"Unknown backend {kind!r}, expected one of {', '.join(BACKENDS)}")
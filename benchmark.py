@@ -0,0 +1,303 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+import pandas as pd
+import utils
+import analytics
+import graph_layout
+import columnar
+import queries
+from cache import entity_cache, graph_cache
+from changes import change_feed
+from fake_driver import FakeDriver
+from fleet_stats import fleet_statistics
+from memory_graph import MemoryGraph
+
+# Fleet sizes (total entities) benchmarked by default
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+BRANDS = ["Kratos", "Dynetics", "General Atomics", "Boeing", "Anduril"]
+
+# Populate a graph with a synthetic fleet: 1% aircraft, 10% soldiers and the rest
+# drones unless given. Every drone HAS one aircraft and one RESPONSIBLE_FOR soldier,
+# plus `degree` extra CONNECTED_TO / SUPPORTS / MONITORS relationships from aircraft.
+def generate_fleet(entities, aircraft=None, soldiers=None, degree=1, seed=42, graph=None):
+    rng = random.Random(seed)
+    graph = graph or MemoryGraph()
+    aircraft = aircraft if aircraft is not None else max(1, entities // 100)
+    soldiers = soldiers if soldiers is not None else max(1, entities // 10)
+    drones = max(0, entities - aircraft - soldiers)
+
+    def new_uuid():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    aircraft_ids = [graph.add_node("Aircraft", f"Aircraft-{i}", new_uuid()) for i in range(aircraft)]
+    soldier_ids = [graph.add_node("Soldier", f"Soldier-{i}", new_uuid()) for i in range(soldiers)]
+    for i in range(drones):
+        drone = graph.add_node("Drone", f"Drone-{i}", new_uuid(), rng.choice(BRANDS))
+        graph.add_edge("Aircraft", rng.choice(aircraft_ids), "HAS", "Drone", drone)
+        graph.add_edge("Soldier", rng.choice(soldier_ids), "RESPONSIBLE_FOR", "Drone", drone)
+        for _ in range(degree):
+            rel_type = rng.choice(utils.allowed_relationship_types)
+            graph.add_edge("Aircraft", rng.choice(aircraft_ids), rel_type, "Drone", drone)
+    return graph
+
+# The reads each page of app.py performs. Every function returns the graph
+# rendering step of the page and its number of input rows (or None), which is timed separately.
+def statistics_page(driver):
+    utils.get_fleet_statistics(driver)
+    return None
+
+def entity_page(entity_type, spec_name):
+    def page(driver):
+        rows, _ = utils.get_current_page(driver, entity_type)
+        return lambda: utils.render_network_html(spec_name, rows, entity_type), len(rows)
+    return page
+
+def drones_page(driver):
+    _, _, drones, _ = utils.fetch_drones_page(driver, "drone_aircraft", "drone_soldier")
+    return lambda: utils.render_network_html("drones", drones, "Drones"), len(drones)
+
+def relationship_page(fetch_page, search_keys, group_column, spec_name, title):
+    def page(driver):
+        _, _, relationships = fetch_page(driver, *search_keys)
+
+        def render():
+            if graph_layout.is_large(relationships, group_column, "Drone"):
+                return utils.render_large_network_html(relationships, title, group_column, "Drone")
+            return utils.render_network_html(spec_name, relationships, title)
+        return render, len(relationships)
+    return page
+
+# Two hops around the first aircraft, as on the Explore Neighbourhood page
+def explore_page(driver):
+    root = utils.load_search(driver, "Aircraft", "Aircraft-0", 1)[0]
+    _, relationships = utils.get_neighbourhood(driver, "Aircraft", root["UUID"], root["Name"], 2, 25, {})
+    return lambda: utils.render_network_html("ego", relationships, "Neighbourhood"), len(relationships)
+
+# The analyses of the Fleet Analytics page, on a freshly loaded projection
+def analytics_page(driver):
+    for name in analytics.ANALYSES:
+        utils.get_fleet_analysis(driver, name)
+    return None
+
+PAGES = {
+    "Statistics": statistics_page,
+    "Aircrafts": entity_page("Aircraft", "aircraft"),
+    "Soldiers": entity_page("Soldier", "soldiers"),
+    "Drones": drones_page,
+    "Aircraft and Drones Relationships": relationship_page(
+        utils.fetch_aircraft_drone_page, ("relationship_aircraft", "relationship_drone"),
+        "Aircraft", "aircraft_drone", "Aircraft-Drone Relationships"),
+    "Soldiers and Drones Relationships": relationship_page(
+        utils.fetch_soldier_drone_page, ("assign_soldier", "assign_drone"),
+        "Soldier", "soldier_drone", "Soldier-Drone Relationships"),
+    "Explore Neighbourhood": explore_page,
+    "Fleet Analytics": analytics_page,
+}
+
+def clear_caches():
+    entity_cache.clear()
+    graph_cache.clear()
+    graph_layout.layout_cache.clear()
+    fleet_statistics.mark_stale()
+    analytics.fleet_projection.mark_stale()
+    change_feed.reset()
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "p50_ms": at(0.50) * 1000,
+        "p95_ms": at(0.95) * 1000,
+        "p99_ms": at(0.99) * 1000,
+        "mean_ms": statistics.mean(ordered) * 1000,
+    }
+
+# Measure one page: cold (caches cleared) and warm reruns, query counts and round
+# trips of a cold rerun, peak Python memory and the graph render time.
+# Graphs with more than max_render_rows input rows are not rendered.
+def measure_page(driver, page, repeat, max_render_rows=None):
+    clear_caches()
+    driver.reset_counters()
+    page(driver)
+    cold_round_trips = driver.round_trips
+    cold_queries = dict(driver.query_counts)
+
+    cold = []
+    for _ in range(repeat):
+        clear_caches()
+        started = time.perf_counter()
+        page(driver)
+        cold.append(time.perf_counter() - started)
+
+    driver.reset_counters()
+    warm = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page(driver)
+        warm.append(time.perf_counter() - started)
+    warm_round_trips = driver.round_trips / repeat
+
+    clear_caches()
+    tracemalloc.start()
+    render = page(driver)
+    render_seconds = None
+    render_skipped = False
+    if render is not None:
+        render, rows = render
+        render_skipped = max_render_rows is not None and rows > max_render_rows
+    if render is not None and not render_skipped:
+        started = time.perf_counter()
+        render()
+        render_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "queries": cold_queries,
+        "round_trips_cold": cold_round_trips,
+        "round_trips_warm": warm_round_trips,
+        "latency_cold": percentiles(cold),
+        "latency_warm": percentiles(warm),
+        "peak_memory_mb": peak / 2 ** 20,
+        "render_ms": None if render_seconds is None else render_seconds * 1000,
+        "render_skipped": render_skipped,
+    }
+
+# Largest result sets of the app, used to compare the two ways of building a DataFrame
+CONVERSION_QUERIES = [
+    ("list_entities", "Soldier"),
+    ("list_drones", None),
+    ("aircraft_drone_relationships", None),
+    ("soldier_drone_relationships", None),
+]
+
+# Time and peak memory of turning fetched records into a DataFrame: the row path
+# (result.data() dicts, then pd.DataFrame) against the columnar one (columnar.py).
+# Records are fetched once beforehand, so only the client-side conversion is measured.
+def measure_conversion(driver, repeat):
+    results = {}
+    for name, label in CONVERSION_QUERIES:
+        with driver.session() as session:
+            result = session.run(queries.render(name, label=label))
+            keys = result.keys()
+            records = list(result)
+        paths = {
+            "rows": lambda: pd.DataFrame([record.data() for record in records]),
+            "columnar": lambda: columnar.to_frame(keys, records),
+        }
+        results[name] = {}
+        for path, convert in paths.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                convert()
+                samples.append(time.perf_counter() - started)
+            tracemalloc.start()
+            frame = convert()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name][path] = {
+                "rows": len(frame),
+                "latency": percentiles(samples),
+                "peak_memory_mb": peak / 2 ** 20,
+                "frame_memory_mb": frame.memory_usage(deep=True).sum() / 2 ** 20,
+            }
+    return results
+
+def run(sizes, pages, repeat, degree, latency, max_render_rows=None):
+    results = {}
+    conversion = {}
+    for size_name in sizes:
+        started = time.perf_counter()
+        graph = generate_fleet(SIZES[size_name], degree=degree)
+        driver = FakeDriver(graph, latency=latency)
+        print(f"{size_name}: fleet generated in {time.perf_counter() - started:.1f}s", flush=True)
+        results[size_name] = {}
+        for page_name in pages:
+            results[size_name][page_name] = measure_page(driver, PAGES[page_name], repeat, max_render_rows)
+            summary = results[size_name][page_name]
+            print(f"  {page_name}: p50 cold {summary['latency_cold']['p50_ms']:.1f} ms, "
+                  f"{summary['round_trips_cold']} round trips, peak {summary['peak_memory_mb']:.1f} MB", flush=True)
+        conversion[size_name] = measure_conversion(FakeDriver(graph), repeat)
+        for query_name, paths in conversion[size_name].items():
+            print(f"  {query_name} to DataFrame: " + ", ".join(
+                f"{path} p50 {summary['latency']['p50_ms']:.1f} ms, peak {summary['peak_memory_mb']:.1f} MB, "
+                f"frame {summary['frame_memory_mb']:.1f} MB"
+                for path, summary in paths.items()
+            ), flush=True)
+    return results, conversion
+
+# Metrics that got worse than an earlier run by more than threshold (relative)
+# and min_delta (absolute, to ignore noise on sub-millisecond timings)
+def compare(results, baseline, threshold=0.25, min_delta=1.0):
+    regressions = []
+    for size_name, pages in results.items():
+        for page_name, metrics in pages.items():
+            before = baseline.get("results", {}).get(size_name, {}).get(page_name)
+            if not before:
+                continue
+            for metric, after_value, before_value in [
+                ("latency_cold.p50_ms", metrics["latency_cold"]["p50_ms"], before["latency_cold"]["p50_ms"]),
+                ("latency_warm.p50_ms", metrics["latency_warm"]["p50_ms"], before["latency_warm"]["p50_ms"]),
+                ("round_trips_cold", metrics["round_trips_cold"], before["round_trips_cold"]),
+                ("peak_memory_mb", metrics["peak_memory_mb"], before["peak_memory_mb"]),
+                ("render_ms", metrics["render_ms"], before["render_ms"]),
+            ]:
+                if after_value is None or not before_value:
+                    continue
+                change = (after_value - before_value) / before_value
+                if change > threshold and after_value - before_value >= min_delta:
+                    regressions.append(f"{size_name} / {page_name} / {metric}: {before_value:.2f} -> {after_value:.2f} (+{change:.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app pages against an in-process graph stand-in.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--degree", type=int, default=1, help="Extra aircraft relationships per drone")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated round-trip time in seconds")
+    parser.add_argument("--max-render-rows", type=int, default=250_000,
+                        help="Skip graph rendering above this many rows, to keep runs on the largest fleets short")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative change reported as a regression")
+    args = parser.parse_args(argv)
+
+    results, conversion = run(args.sizes, args.pages, args.repeat, args.degree, args.latency, args.max_render_rows)
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "degree": args.degree,
+            "latency": args.latency,
+            "max_render_rows": args.max_render_rows,
+        },
+        "results": results,
+        "conversion": conversion,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+from neo4j import Driver
+import connection
+import instrumentation
+import queries
+import schema
+import writes
+
+# Relationships deleted per server-side transaction
+DEFAULT_BATCH_SIZE = 10000
+# Nodes per chunk; progress is reported after every chunk
+DEFAULT_CHUNK_SIZE = 500
+
+# Delete one chunk of nodes: their relationships in batches of batch_size, each batch
+# committed on its own so a node with many thousands of relationships never builds
+# one huge transaction, then the nodes. Adds the labels of the nodes the deleted
+# relationships connected to `invalidated`. Returns (nodes, relationships) deleted.
+def _delete_chunk(driver: Driver, label, uuids, batch_size, invalidated):
+    # CALL { ... } IN TRANSACTIONS only runs in an auto-commit transaction (session.run).
+    # Its batches are not in the change log, see delete_entities.
+    try:
+        with driver.session() as session:
+            record = instrumentation.run_single(session, queries.render("delete_relationships_batched", label=label),
+                                                {"uuids": uuids, "batch_size": batch_size})
+    except Exception:
+        # Batches committed before the failure may have connected any label
+        invalidated.update(queries.ENTITY_LABELS)
+        raise
+    for ends in record["labels"]:
+        invalidated.update(end for end in ends if end in queries.ENTITY_LABELS)
+    relationships = record["relationships"]
+
+    # The relationships are gone, so deleting the nodes is short: it logs their
+    # tombstones in the same transaction, within writes.TRANSACTION_TIMEOUT
+    record = writes.execute_write(driver, lambda tx: instrumentation.run_single(
+        tx, queries.render("delete_entities", label=label), {"uuids": uuids}))
+    return record["nodes"], relationships + record["relationships"]
+
+# Delete the nodes of a label with the given UUIDs, chunk by chunk.
+# Returns the number of UUIDs requested (duplicates and blanks dropped), of nodes
+# and of relationships deleted, and of UUIDs that matched no node. progress is
+# called after every chunk with (done, total, nodes, relationships).
+# The relationships deleted in batches are logged as one invalidation of the label
+# and of the labels they connected to, once the deletion ended or failed.
+def delete_entities(driver: Driver, label, uuids, batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    schema.ensure_schema(driver)
+    uuids = list(dict.fromkeys(uuid.strip() for uuid in uuids if uuid and uuid.strip()))
+    nodes = relationships = 0
+    invalidated = {label}
+
+    try:
+        for start in range(0, len(uuids), chunk_size):
+            chunk = uuids[start:start + chunk_size]
+            chunk_nodes, chunk_relationships = _delete_chunk(driver, label, chunk, batch_size, invalidated)
+            nodes += chunk_nodes
+            relationships += chunk_relationships
+            if progress:
+                progress(start + len(chunk), len(uuids), nodes, relationships)
+    finally:
+        writes.write_data(driver, queries.render("log_invalidated"), {"labels": sorted(invalidated)})
+
+    return {"requested": len(uuids), "nodes": nodes, "relationships": relationships, "missing": len(uuids) - nodes}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete aircraft, soldiers or drones and their relationships by UUID.")
+    parser.add_argument("label", choices=queries.ENTITY_LABELS)
+    parser.add_argument("uuids", help="File with one UUID per line, - for standard input")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Relationships per transaction")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Nodes per chunk")
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI"))
+    parser.add_argument("--username", default=os.environ.get("NEO4J_USERNAME", "neo4j"))
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD"))
+    args = parser.parse_args(argv)
+
+    if not args.uri or not args.password:
+        parser.error("--uri and --password (or NEO4J_URI and NEO4J_PASSWORD) are required")
+
+    if args.uuids == "-":
+        uuids = sys.stdin.read().splitlines()
+    else:
+        with open(args.uuids, "r") as f:
+            uuids = f.read().splitlines()
+
+    def report(done, total, nodes, relationships):
+        print(f"{args.label}: {done}/{total} UUIDs, {nodes} nodes and {relationships} relationships deleted", flush=True)
+
+    driver = connection.get_driver(args.uri, args.username, args.password)
+    totals = delete_entities(driver, args.label, uuids, args.batch_size, args.chunk_size, report)
+    print(f"{args.label}: done, {totals['nodes']} nodes and {totals['relationships']} relationships deleted, "
+          f"{totals['missing']} UUIDs not found")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from neo4j import Driver
+import connection
+import instrumentation
+import queries
+import schema
+import writes
+from cache import entity_cache
+from fleet_stats import fleet_statistics
+
+# Columns expected in each kind of file
+COLUMNS = {
+    "Aircraft": ["name"],
+    "Soldier": ["name"],
+    "Drone": ["name", "brand", "aircraft", "soldier"],
+    "Relationship": ["aircraft", "drone", "type"],
+}
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Labels whose cached data a batch of each kind may change
+INVALIDATED = {
+    "Aircraft": ["Aircraft"],
+    "Soldier": ["Soldier"],
+    "Drone": ["Drone", "Aircraft", "Soldier"],
+    "Relationship": ["Aircraft", "Drone"],
+}
+
+# Namespace of the uuids derived for rows without one
+ROW_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "neo4j-fleet/bulk_import")
+
+# Read a CSV or Parquet file (path or uploaded file) as lists of row dicts
+def read_chunks(source, chunk_size, file_format=None):
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        file_format = "parquet" if name.lower().endswith(".parquet") else "csv"
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+    else:
+        for chunk in pd.read_csv(source, chunksize=chunk_size, dtype=str):
+            chunk = chunk.astype(object).where(pd.notna(chunk), None)
+            yield chunk.to_dict("records")
+
+# Uuid of a row without one: the same for the same row of the same source, so
+# writing a batch again (see import_source) MERGEs onto what the first write created
+def _row_uuid(key, number, item):
+    return str(uuid.uuid5(ROW_NAMESPACE, json.dumps([key, number, item], sort_keys=True)))
+
+# Keep only the expected columns and give every row a uuid, the one of the file or
+# one derived from the source key and the row number (first is the number of rows[0])
+def _prepare(kind, rows, key, first=0):
+    prepared = []
+    for number, row in enumerate(rows, first):
+        missing = [column for column in COLUMNS[kind] if not row.get(column)]
+        if missing:
+            raise ValueError(f"{kind} row {row} is missing {', '.join(missing)}")
+        item = {column: str(row[column]) for column in COLUMNS[kind]}
+        item["uuid"] = str(row.get("uuid") or _row_uuid(key, number, item))
+        prepared.append(item)
+    return prepared
+
+# Resumable progress: number of rows already written for each source. It is saved
+# after the transactions of a batch committed, so a crash in between makes the next
+# run write that batch again, which the MERGE on row uuids turns into a no-op.
+class Checkpoint:
+    def __init__(self, path=None):
+        self.path = path
+        self._done = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self._done = json.load(f)
+
+    def done(self, key):
+        return self._done.get(key, 0)
+
+    def advance(self, key, rows):
+        with self._lock:
+            self._done[key] = self._done.get(key, 0) + rows
+            if self.path:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self._done, f)
+                os.replace(tmp_path, self.path)
+
+# Write one batch in a managed transaction, retried by the driver on transient errors
+# (also after a lost acknowledgement of a commit that went through, see _prepare).
+# It runs without writes.TRANSACTION_TIMEOUT, as large batches may take longer.
+def _write_batch(driver: Driver, query, rows):
+    def work(tx):
+        return instrumentation.run_single(tx, query, {"rows": rows})["count"]
+
+    with driver.session() as session:
+        return session.execute_write(work)
+
+# Log the changes of a committed batch for the change feed, in a transaction of its
+# own so it is versioned after the batch committed (see COMMIT_LAG in queries.py)
+def _log_batch(driver: Driver, kind):
+    writes.write_data(driver, queries.render("log_invalidated"), {"labels": INVALIDATED[kind]})
+
+def _source_key(kind, source):
+    name = source if isinstance(source, str) else getattr(source, "name", repr(source))
+    return f"{kind}:{name}"
+
+# Stream one source into the database in UNWIND batches
+def import_source(driver: Driver, kind, source, batch_size=DEFAULT_BATCH_SIZE, checkpoint=None, progress=None):
+    checkpoint = checkpoint or Checkpoint()
+    key = _source_key(kind, source)
+    skip = checkpoint.done(key)
+    seen = 0
+    written = 0
+
+    for chunk in read_chunks(source, batch_size):
+        start = seen
+        seen += len(chunk)
+        # Skip rows already written by an earlier, interrupted run
+        if seen <= skip:
+            continue
+        first = max(skip, start)
+        chunk = chunk[first - start:]
+
+        rows = _prepare(kind, chunk, key, first)
+        if kind == "Relationship":
+            by_type = {}
+            for row in rows:
+                by_type.setdefault(row["type"], []).append(row)
+            for rel_type, typed_rows in by_type.items():
+                query = queries.render("bulk_add_relationships", rel_type=rel_type)
+                written += _write_batch(driver, query, typed_rows)
+        elif kind == "Drone":
+            written += _write_batch(driver, queries.render("bulk_create_drones"), rows)
+        else:
+            written += _write_batch(driver, queries.render("bulk_create_entities", label=kind), rows)
+
+        # Every transaction of the batch committed
+        _log_batch(driver, kind)
+        checkpoint.advance(key, len(chunk))
+        if progress:
+            progress(kind, seen, written)
+
+    return written
+
+# Import every given source. Aircraft and Soldiers are independent and run in
+# parallel; Drones need both and Relationships need Drones, so they follow. The
+# schema is bootstrapped first, so the MERGEs on uuids are backed by constraints.
+def run_import(driver: Driver, sources, batch_size=DEFAULT_BATCH_SIZE, workers=2, checkpoint_path=None, progress=None):
+    schema.ensure_schema(driver)
+    checkpoint = Checkpoint(checkpoint_path)
+    totals = {}
+
+    def run(kind):
+        totals[kind] = import_source(driver, kind, sources[kind], batch_size, checkpoint, progress)
+
+    try:
+        independent = [kind for kind in ("Aircraft", "Soldier") if sources.get(kind) is not None]
+        if workers > 1 and len(independent) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(run, kind) for kind in independent]:
+                    future.result()
+        else:
+            for kind in independent:
+                run(kind)
+
+        for kind in ("Drone", "Relationship"):
+            if sources.get(kind) is not None:
+                run(kind)
+    finally:
+        entity_cache.invalidate(*queries.ENTITY_LABELS)
+        fleet_statistics.mark_stale()
+
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import aircraft, soldiers, drones and relationships from CSV or Parquet files.")
+    parser.add_argument("--aircraft", help="File with a name column (optional uuid)")
+    parser.add_argument("--soldiers", help="File with a name column (optional uuid)")
+    parser.add_argument("--drones", help="File with name, brand, aircraft and soldier columns (optional uuid)")
+    parser.add_argument("--relationships", help="File with aircraft, drone and type columns (optional uuid)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--checkpoint", help="JSON file used to resume an interrupted import")
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI"))
+    parser.add_argument("--username", default=os.environ.get("NEO4J_USERNAME", "neo4j"))
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD"))
+    args = parser.parse_args(argv)
+
+    if not args.uri or not args.password:
+        parser.error("--uri and --password (or NEO4J_URI and NEO4J_PASSWORD) are required")
+
+    sources = {
+        "Aircraft": args.aircraft,
+        "Soldier": args.soldiers,
+        "Drone": args.drones,
+        "Relationship": args.relationships,
+    }
+
+    def report(kind, rows, written):
+        print(f"{kind}: {rows} rows read, {written} written", flush=True)
+
+    driver = connection.get_driver(args.uri, args.username, args.password)
+    totals = run_import(driver, sources, args.batch_size, args.workers, args.checkpoint, report)
+    for kind, written in totals.items():
+        print(f"{kind}: done, {written} written")
+
+if __name__ == "__main__":
+    main()
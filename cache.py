@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Thread-safe LRU cache with a TTL per entry.
+# Every entry carries a set of tags (entity labels), so writes can drop exactly
+# the entries built from the label they touched.
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    # Cached value for key, or None when missing or expired
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Like get, without touching the LRU order or the hit/miss counters
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Read-through: return the cached value or load, store and return it.
+    # Exceptions from the loader propagate and nothing is stored.
+    def get_or_load(self, key, loader, tags=(), ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, tags, ttl)
+        return value
+
+    # Live (key, value) pairs, least recently used first
+    def items(self):
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at, _) in self._entries.items() if expires_at >= now]
+
+    # Replace the value of an existing entry, keeping its tags and expiry
+    def replace(self, key, value):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (value, entry[1], entry[2])
+
+    def delete(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    # Drop every entry tagged with one of the given tags
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# Process-wide cache for entity name lists, tables and relationship sets
+entity_cache = TTLCache(maxsize=256, ttl=300)
+
+# Process-wide cache for rendered graph HTML, keyed by a hash of the graph input
+graph_cache = TTLCache(maxsize=64, ttl=3600)
@@ -0,0 +1,226 @@
+import threading
+import time
+from neo4j import Driver
+import columnar
+import instrumentation
+import queries
+from cache import entity_cache, graph_cache
+from fleet_stats import fleet_statistics
+from analytics import fleet_projection
+
+# Cached relationship sets (see utils.load_relationships) by the label of their source
+RELATIONSHIP_QUERIES = {"Aircraft": "aircraft_drone_relationships", "Soldier": "soldier_drone_relationships"}
+
+# Move the per-row Version column of a relationship set into frame.attrs["version"],
+# the newest write the set is known to contain
+def track_versions(frame):
+    versions = frame.pop("Version") if "Version" in frame.columns else None
+    frame.attrs["version"] = int(versions.max()) if versions is not None and versions.notna().any() else 0
+    return frame
+
+# Client side of the change log (see WRITE_VERSION in queries.py).
+# Every poll reads the changes of the last COMMIT_LAG milliseconds before the previous
+# poll, which includes the writes that started before it but committed after; the
+# changes not seen yet (by id) are applied to the cached tables and relationship sets
+# in place, and the cached name lists, pages and search results they touch are
+# dropped. Graphs are cached under a hash of their input frame (see
+# utils.render_network_html), so a patched frame is drawn without the database.
+# Cache entries still expire after the cache TTL, which bounds any drift.
+class ChangeFeed:
+    def __init__(self, poll_interval=2.0, max_changes=5000, retention=86400, prune_interval=3600):
+        self.poll_interval = poll_interval
+        # Above this many new changes since the last sync the caches are dropped instead
+        self.max_changes = max_changes
+        # Changes are kept in the database for this many seconds
+        self.retention = retention
+        self.prune_interval = prune_interval
+        # Server time of the last sync, as a version
+        self.version = None
+        # Id -> version of the changes seen within COMMIT_LAG of the last sync
+        self._seen = {}
+        # Number of syncs applied and resets, to tell whether one happened meanwhile
+        self._generation = 0
+        self._checked_at = 0.0
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Changes with a version above since (the last COMMIT_LAG milliseconds when None),
+    # oldest first, as (server time, version below which changes were pruned, changes).
+    # Each change is a dict with id, version and kind (node_created, node_deleted,
+    # relationship_created or invalidated) and the fields of that kind.
+    def changes_since(self, driver: Driver, since, limit=None):
+        parameters = {"since": since, "lag": queries.COMMIT_LAG, "limit": limit or self.max_changes}
+        with driver.session() as session:
+            record = instrumentation.run_single(session, queries.render("changes_since"), parameters)
+        return record["version"], record["pruned_before"], record["changes"]
+
+    # Bring the caches up to date with the database. Unless forced, the database is
+    # polled at most once per poll_interval. Returns True when anything changed.
+    # The round trips run outside the lock; the changes read are applied only if no
+    # other sync applied its own meanwhile. A forced sync (after a write) then reads
+    # again, so it applies changes read after its write committed.
+    def sync(self, driver: Driver, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.poll_interval:
+                return False
+            self._checked_at = now
+
+        while True:
+            with self._lock:
+                generation = self._generation
+                since = None if self.version is None else self.version - queries.COMMIT_LAG
+                limit = self.max_changes + len(self._seen) + 1
+            version, pruned_before, changes = self.changes_since(driver, since, limit)
+
+            with self._lock:
+                if self._generation != generation:
+                    if force:
+                        continue
+                    return False
+                changes = [change for change in changes if change["id"] not in self._seen]
+                if since is None or since < pruned_before or len(changes) > self.max_changes:
+                    # First sync of the process, the changes since the last one were
+                    # pruned, or too many of them: start over. The changes read are in
+                    # the caches loaded from now on.
+                    self._drop_all()
+                else:
+                    drones = {
+                        change["name"] for change in changes
+                        if change["kind"] == "node_created" and change.get("label") == "Drone"
+                    }
+                    for change in changes:
+                        self._apply(change, drones)
+                for change in changes:
+                    self._seen[change["id"]] = change["version"]
+                self._seen = {id: seen for id, seen in self._seen.items() if seen > version - queries.COMMIT_LAG}
+                self.version = version
+                self._generation += 1
+                prune = now - self._pruned_at > self.prune_interval
+                if prune:
+                    self._pruned_at = now
+            break
+
+        if prune:
+            with driver.session() as session:
+                instrumentation.run_single(session, queries.render("prune_changes"),
+                                           {"before": version - self.retention * 1000})
+        return since is None or bool(changes)
+
+    # Forget the synced version, the next sync starts over
+    def reset(self):
+        with self._lock:
+            self.version = None
+            self._seen = {}
+            self._checked_at = 0.0
+            self._generation += 1
+
+    def _drop_all(self):
+        entity_cache.clear()
+        graph_cache.clear()
+        fleet_statistics.mark_stale()
+        fleet_projection.mark_stale()
+
+    # drones: names of the drones created in the same sync, whose relationships are
+    # already counted by fleet_statistics.drone_created
+    def _apply(self, change, drones):
+        kind = change["kind"]
+        fleet_projection.apply(change)
+        if kind == "invalidated":
+            entity_cache.invalidate(change["label"])
+            fleet_statistics.mark_stale(change["label"])
+        elif kind == "node_created":
+            self._node_created(change)
+        elif kind == "node_deleted":
+            self._node_deleted(change)
+            self._drop_neighbourhoods()
+            fleet_statistics.mark_stale(change["label"])
+        elif kind == "relationship_created":
+            self._relationship_created(change)
+            self._drop_neighbourhoods()
+            if change["type"] == "RESPONSIBLE_FOR" and change["target"] not in drones:
+                fleet_statistics.mark_stale("Soldier")
+
+    def _node_created(self, change):
+        label, name, uuid = change["label"], change["name"], change["uuid"]
+        fields = {"Name": name, "Drone": name, "UUID": uuid, "Brand": change.get("brand")}
+        for key, value in entity_cache.items():
+            if key[0] == "table" and key[1] == label and value.columns.empty:
+                entity_cache.delete(key)
+            elif key[0] == "table" and key[1] == label:
+                if uuid not in set(value["UUID"]):
+                    record = tuple(fields.get(column) for column in value.columns)
+                    entity_cache.replace(key, columnar.append_records(value, [record]))
+            elif _touches(key, value, label, name, uuid):
+                entity_cache.delete(key)
+
+        if label == "Drone" and change.get("aircraft") is not None:
+            fleet_statistics.drone_created(change.get("brand"), change["aircraft"], change.get("soldier_drones"))
+        elif label == "Drone":
+            fleet_statistics.mark_stale("Drone")
+        else:
+            fleet_statistics.entity_created(label, name)
+
+    def _node_deleted(self, change):
+        label, name, uuid = change["label"], change["name"], change["uuid"]
+        for key, value in entity_cache.items():
+            if key[0] == "table" and key[1] == label and not value.columns.empty:
+                entity_cache.replace(key, value[value["UUID"] != uuid])
+            elif key[0] == "relationships" and label == "Drone" and not value.columns.empty:
+                # Drone names are unique, so the rows of the drone are known
+                entity_cache.replace(key, value[value["Drone"] != name])
+            elif key == ("relationships", RELATIONSHIP_QUERIES.get(label)) or _touches(key, value, label, name, uuid):
+                entity_cache.delete(key)
+
+    def _relationship_created(self, change):
+        key = ("relationships", RELATIONSHIP_QUERIES[change["source_label"]])
+        value = entity_cache.peek(key)
+        if value is None:
+            return
+        if value.columns.empty:
+            entity_cache.delete(key)
+            return
+        fields = {change["source_label"]: change["source"], "Drone": change["target"], "Relationship": change["type"]}
+        record = tuple(fields.get(column) for column in value.columns)
+        # Versions are not in commit order: the set may hold a relationship older than
+        # its newest one, in which case it holds the row
+        if value.attrs.get("version", 0) >= change["version"] and _holds(value, record):
+            return
+        patched = columnar.append_records(value, [record])
+        # Still the version the set was loaded at: a coalesced write (see writes.py)
+        # logs many relationships with one version, and each is patched in
+        patched.attrs["version"] = value.attrs.get("version", 0)
+        entity_cache.replace(key, patched)
+
+    # Cached neighbour pages (see ego.py) hold nodes by UUID but changes name them,
+    # so any relationship created or deleted drops them all
+    def _drop_neighbourhoods(self):
+        for key, _ in entity_cache.items():
+            if key[0] == "ego":
+                entity_cache.delete(key)
+
+# Whether a frame has a row with the given values of its columns
+def _holds(frame, record):
+    matches = True
+    for column, value in zip(frame.columns, record):
+        matches = matches & (frame[column] == value)
+    return bool(matches.any())
+
+# Whether a cached name list, page or search result of the label may include the node
+def _touches(key, value, label, name, uuid):
+    if len(key) < 2 or key[1] != label:
+        return False
+    if key[0] == "names":
+        return True
+    if key[0] == "search":
+        return name is not None and name.startswith(key[2])
+    if key[0] == "page":
+        _, _, after, limit = key
+        uuids = columnar.column(value, "UUID")
+        # The page holds the node, or would once it is created: it starts before
+        # the UUID and either ends after it or is the last page
+        return uuid > (after or "") and (len(value) < limit or uuid <= uuids.iloc[-1])
+    return False
+
+# Process-wide change feed
+change_feed = ChangeFeed()
@@ -0,0 +1,84 @@
+import hashlib
+import itertools
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Strings are stored in Arrow buffers when pyarrow is installed (see requirements.txt),
+# which is what st.dataframe serializes to anyway.
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+# pandas dtypes of the columns returned by the query registry (queries.py).
+# Columns whose values repeat on many rows, like the aircraft of every one of its
+# relationships, are categories: one copy of each distinct value plus integer codes.
+COLUMN_TYPES = {
+    "Name": STRING_DTYPE,
+    "UUID": STRING_DTYPE,
+    "Drone": STRING_DTYPE,
+    "DroneUUID": STRING_DTYPE,
+    "Aircraft": "category",
+    "Soldier": "category",
+    "Brand": "category",
+    "Relationship": "category",
+    "Source": STRING_DTYPE,
+    "SourceUUID": STRING_DTYPE,
+    "Target": STRING_DTYPE,
+    "TargetUUID": STRING_DTYPE,
+    "SourceLabel": "category",
+    "TargetLabel": "category",
+    "SoldierDrones": "int64",
+    "Version": "Int64",
+}
+
+# Build a DataFrame from records (value sequences in key order, e.g. neo4j Records).
+# Every column is gathered in one pass and built in one call with its final dtype,
+# without an intermediate dict per row.
+def to_frame(keys, records):
+    return pd.DataFrame({
+        key: pd.Series([record[position] for record in records], dtype=COLUMN_TYPES.get(key, "object"))
+        for position, key in enumerate(keys)
+    })
+
+# One frame from frames with the same columns, e.g. built by to_frame from
+# consecutive chunks of one result. Categories are unioned, so categorical columns
+# stay categorical.
+def concat_frames(frames):
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for key in frames[0].columns:
+        parts = [frame[key] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[key] = pd.Series(union_categoricals(parts, sort_categories=True, ignore_order=True))
+        else:
+            columns[key] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+# A frame with records appended, keeping the column dtypes (concatenating
+# categoricals with different categories would fall back to object)
+def append_records(frame, records):
+    if not records:
+        return frame
+    added = to_frame(frame.columns, records)
+    combined = pd.concat([frame, added], ignore_index=True)
+    combined = combined.astype({key: COLUMN_TYPES[key] for key in frame.columns if key in COLUMN_TYPES})
+    combined.attrs = dict(frame.attrs)
+    return combined
+
+# A column of the frame, or `default` repeated when the frame does not have it
+# (a failed or empty read comes back as a frame without columns)
+def column(frame, name, default=None):
+    if name in frame.columns:
+        return frame[name]
+    return list(itertools.repeat(default, len(frame)))
+
+# Content hash of a frame, for cache keys
+def fingerprint(frame):
+    digest = hashlib.sha256()
+    digest.update("\0".join(map(str, frame.columns)).encode("utf-8"))
+    if len(frame.columns):
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
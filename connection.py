@@ -0,0 +1,122 @@
+import atexit
+import hashlib
+import threading
+import time
+from neo4j import Driver, GraphDatabase
+
+# Default pool settings, can be overridden from the "Pool" section of secrets
+DEFAULT_POOL_CONFIG = {
+    "max_connection_pool_size": 50,
+    "max_connection_lifetime": 3600,
+    "liveness_check_timeout": 60,
+    "connection_acquisition_timeout": 30,
+    "connection_timeout": 15,
+    "keep_alive": True,
+}
+
+# Seconds between health checks of a shared driver, see get_healthy_driver
+HEALTH_CHECK_INTERVAL = 30.0
+
+# One driver per process, keyed by URI and credentials
+_drivers = {}
+# Key -> time.monotonic() of the last successful connectivity check
+_checked_at = {}
+_lock = threading.Lock()
+
+# Build a key without keeping the plain password in memory twice
+def _driver_key(uri, username, password):
+    digest = hashlib.sha256(f"{username}:{password}".encode("utf-8")).hexdigest()
+    return (uri, username, digest)
+
+# Merge the pool settings with the defaults, ignoring unknown keys
+def pool_config(overrides=None):
+    config = dict(DEFAULT_POOL_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key in DEFAULT_POOL_CONFIG:
+            config[key] = value
+    return config
+
+# Get the shared driver, creating and verifying it on first use
+def get_driver(uri, username, password, config=None) -> Driver:
+    key = _driver_key(uri, username, password)
+    driver = _drivers.get(key)
+    if driver is not None:
+        return driver
+
+    with _lock:
+        driver = _drivers.get(key)
+        if driver is None:
+            driver = GraphDatabase.driver(uri, auth=(username, password), **pool_config(config))
+            try:
+                driver.verify_connectivity()
+            except Exception:
+                driver.close()
+                raise
+            _drivers[key] = driver
+            _checked_at[key] = time.monotonic()
+    return driver
+
+# Get the shared driver, replacing it when it can no longer reach the server (e.g.
+# after AuraDB dropped the connection). It is checked at most every
+# HEALTH_CHECK_INTERVAL seconds, or on the next call after mark_unhealthy. When the
+# server is still unreachable, the error of the new driver propagates.
+def get_healthy_driver(uri, username, password, config=None) -> Driver:
+    driver = get_driver(uri, username, password, config)
+    key = _driver_key(uri, username, password)
+    with _lock:
+        due = time.monotonic() - _checked_at.get(key, float("-inf")) >= HEALTH_CHECK_INTERVAL
+    if not due:
+        return driver
+    if is_healthy(driver):
+        with _lock:
+            _checked_at[key] = time.monotonic()
+        return driver
+    reset_driver(uri, username, password)
+    return get_driver(uri, username, password, config)
+
+# Check that the shared driver can still reach the server
+def is_healthy(driver: Driver):
+    try:
+        driver.verify_connectivity()
+        return True
+    except Exception:
+        return False
+
+# Key of a shared driver (URI and credentials), or None for any other driver
+def shared_key(driver: Driver):
+    with _lock:
+        return next((key for key, shared in _drivers.items() if shared is driver), None)
+
+# Check a shared driver on the next get_healthy_driver, e.g. after a query failed
+# with ServiceUnavailable
+def mark_unhealthy(driver: Driver):
+    with _lock:
+        for key, shared in _drivers.items():
+            if shared is driver:
+                _checked_at.pop(key, None)
+
+# Drop a driver that can no longer reach the server so the next call rebuilds it
+def reset_driver(uri, username, password):
+    key = _driver_key(uri, username, password)
+    with _lock:
+        driver = _drivers.pop(key, None)
+        _checked_at.pop(key, None)
+    if driver is not None:
+        try:
+            driver.close()
+        except Exception:
+            pass
+
+# Close every shared driver, called automatically on interpreter exit
+def close_all():
+    with _lock:
+        drivers = list(_drivers.values())
+        _drivers.clear()
+        _checked_at.clear()
+    for driver in drivers:
+        try:
+            driver.close()
+        except Exception:
+            pass
+
+atexit.register(close_all)
@@ -0,0 +1,85 @@
+import pandas as pd
+from neo4j import Driver
+import columnar
+import instrumentation
+import queries
+from cache import entity_cache
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 3
+# Neighbours shown per node and page
+DEFAULT_FAN_OUT = 25
+
+# Pages of neighbours, one per (label, uuid, after) request, as {"neighbours": rows,
+# "more": bool}. Pages are cached, the others are fetched with one query per label;
+# fan_out + 1 rows are read per node to tell whether there is a next page.
+def load_pages(driver: Driver, requests, fan_out):
+    pages = {}
+    missing = {}
+    for label, uuid, after in requests:
+        page = entity_cache.peek(("ego", label, uuid, after, fan_out))
+        if page is None:
+            missing.setdefault(label, []).append({"uuid": uuid, "after": after})
+        else:
+            pages[(label, uuid, after)] = page
+
+    for label, nodes in missing.items():
+        parameters = {"nodes": nodes, "limit": fan_out + 1, "labels": queries.ENTITY_LABELS}
+        with driver.session() as session:
+            rows = instrumentation.run_data(session, queries.render("ego_neighbours", label=label), parameters)
+        by_source = {}
+        for row in rows:
+            by_source.setdefault(row["Source"], []).append(row)
+        for node in nodes:
+            neighbours = sorted(by_source.get(node["uuid"], []), key=lambda row: row["UUID"])
+            page = {"neighbours": neighbours[:fan_out], "more": len(neighbours) > fan_out}
+            entity_cache.set(("ego", label, node["uuid"], node["after"], fan_out), page, tags=queries.ENTITY_LABELS)
+            pages[(label, node["uuid"], node["after"])] = page
+    return pages
+
+# Nodes and relationships within `depth` hops of a root node, breadth first.
+# Every expanded node contributes `pages.get((label, uuid), 1)` pages of at most
+# fan_out neighbours, so the cost follows what is drawn, not the size of the fleet:
+# one query per label and page round of each hop, none for cached pages.
+# Returns (nodes, relationships) frames. nodes has Label, Name, UUID, Depth and More
+# (an expanded node with neighbours left to load); relationships has Source,
+# SourceLabel, SourceUUID, Target, TargetLabel, TargetUUID and Relationship.
+def neighbourhood(driver: Driver, label, uuid, name, depth=DEFAULT_DEPTH, fan_out=DEFAULT_FAN_OUT, pages=None):
+    pages = pages or {}
+    nodes = {(label, uuid): {"Label": label, "Name": name, "UUID": uuid, "Depth": 0, "More": False}}
+    relationships = {}
+    frontier = [(label, uuid)]
+
+    for hop in range(1, depth + 1):
+        next_frontier = []
+        remaining = {key: pages.get(key, 1) for key in frontier}
+        # Page n + 1 of a node starts after the last UUID of page n
+        cursors = {key: "" for key in frontier}
+        while cursors:
+            loaded = load_pages(driver, [(key[0], key[1], after) for key, after in cursors.items()], fan_out)
+            next_cursors = {}
+            for key, after in cursors.items():
+                page = loaded[(key[0], key[1], after)]
+                for row in page["neighbours"]:
+                    other = (row["Label"], row["UUID"])
+                    if other not in nodes:
+                        nodes[other] = {"Label": row["Label"], "Name": row["Name"], "UUID": row["UUID"], "Depth": hop, "More": False}
+                        next_frontier.append(other)
+                    for relationship in row["Relationships"]:
+                        source, target = (key, other) if relationship["outgoing"] else (other, key)
+                        relationships[(source, target, relationship["type"])] = None
+                remaining[key] -= 1
+                if page["more"] and remaining[key] > 0:
+                    next_cursors[key] = page["neighbours"][-1]["UUID"]
+                else:
+                    nodes[key]["More"] = page["more"]
+            cursors = next_cursors
+        frontier = next_frontier
+
+    node_frame = pd.DataFrame(list(nodes.values()), columns=["Label", "Name", "UUID", "Depth", "More"])
+    keys = ["Source", "SourceLabel", "SourceUUID", "Target", "TargetLabel", "TargetUUID", "Relationship"]
+    records = [
+        (nodes[source]["Name"], source[0], source[1], nodes[target]["Name"], target[0], target[1], rel_type)
+        for source, target, rel_type in relationships
+    ]
+    return node_frame, columnar.to_frame(keys, records)
@@ -0,0 +1,157 @@
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import os
+import tempfile
+from itertools import islice
+from neo4j import Driver
+import connection
+import fetch
+import queries
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Exportable tables: query name, label and the columns written, in order
+TABLES = {
+    "Aircraft": ("list_entities", "Aircraft", ["Name", "UUID"]),
+    "Soldier": ("list_entities", "Soldier", ["Name", "UUID"]),
+    "Drone": ("list_drones", None, ["Drone", "UUID", "Brand"]),
+    "aircraft_drone": ("aircraft_drone_relationships", None, ["Aircraft", "Drone", "Relationship"]),
+    "soldier_drone": ("soldier_drone_relationships", None, ["Soldier", "Drone", "Relationship"]),
+}
+
+# Compressions of each format, the first is the default
+COMPRESSIONS = {
+    "csv": ["none", "gzip", "bz2"],
+    "parquet": ["zstd", "snappy", "gzip", "none"],
+}
+
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# File name of an export, e.g. aircraft_drone.csv.gz
+def file_name(table, file_format, compression):
+    suffix = {"gzip": ".gz", "bz2": ".bz2"}.get(compression, "") if file_format == "csv" else ""
+    return f"{table}.{file_format}{suffix}"
+
+def mime_type(file_format, compression):
+    if file_format == "csv" and compression != "none":
+        return "application/gzip" if compression == "gzip" else "application/x-bzip2"
+    return MIME_TYPES[file_format]
+
+# Records of a table as lists of chunk_size row dicts, streamed from the server
+# chunk_size rows at a time (see fetch.stream_query)
+def read_chunks(driver: Driver, table, chunk_size=DEFAULT_CHUNK_SIZE):
+    name, label, _ = TABLES[table]
+    rows = fetch.stream_query(driver, queries.render(name, label=label), fetch_size=chunk_size)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        rows.close()
+
+def _write_csv(chunks, columns, output, compression):
+    if compression == "gzip":
+        output = gzip.GzipFile(fileobj=output, mode="wb")
+    elif compression == "bz2":
+        output = bz2.BZ2File(output, mode="wb")
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    rows = 0
+    for chunk in chunks:
+        writer.writerows([row.get(column) for column in columns] for row in chunk)
+        rows += len(chunk)
+    text.flush()
+    # Close the compressor to write its trailer, leaving the output open
+    text.detach()
+    if compression != "none":
+        output.close()
+    return rows
+
+# One row group per chunk, all columns as strings
+def _write_parquet(chunks, columns, output, compression):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    rows = 0
+    with pq.ParquetWriter(output, schema, compression=compression) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist([{column: row.get(column) for column in columns} for row in chunk], schema))
+            rows += len(chunk)
+    return rows
+
+# Write a table to a binary file object as CSV or Parquet, chunk by chunk, so memory
+# use depends on chunk_size and not on the size of the table. Returns the row count.
+def export_table(driver: Driver, table, output, file_format="csv", compression=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    compression = compression or COMPRESSIONS[file_format][0]
+    if compression not in COMPRESSIONS[file_format]:
+        raise ValueError(f"Unsupported {file_format} compression: {compression}")
+    columns = TABLES[table][2]
+    chunks = read_chunks(driver, table, chunk_size)
+    if file_format == "csv":
+        return _write_csv(chunks, columns, output, compression)
+    return _write_parquet(chunks, columns, output, compression)
+
+# A finished export read back from its temporary file. Streamlit's download_button
+# accepts a BufferedReader and reads it whole, once: that read closes it, and closing
+# deletes the file.
+class TemporaryExport(io.BufferedReader):
+    def __init__(self, path):
+        super().__init__(io.FileIO(path, "rb"))
+        self.path = path
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if size is None or size < 0:
+            self.close()
+        return data
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+# Export a table to a temporary file and return it as a TemporaryExport, for
+# download_button. The export is written chunk by chunk, but Streamlit then keeps the
+# whole file in memory (its media file manager) for the session: tables too large for
+# that are exported with main() instead.
+def export_to_temporary_file(driver: Driver, table, file_format="csv", compression=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    output = tempfile.NamedTemporaryFile(prefix=f"{table}-", suffix=f".{file_format}", delete=False)
+    try:
+        with output:
+            export_table(driver, table, output, file_format, compression, chunk_size)
+    except BaseException:
+        os.unlink(output.name)
+        raise
+    return TemporaryExport(output.name)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a table of the fleet to CSV or Parquet.")
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=list(COMPRESSIONS), default="csv")
+    parser.add_argument("--compression")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI"))
+    parser.add_argument("--username", default=os.environ.get("NEO4J_USERNAME", "neo4j"))
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD"))
+    args = parser.parse_args(argv)
+
+    if not args.uri or not args.password:
+        parser.error("--uri and --password (or NEO4J_URI and NEO4J_PASSWORD) are required")
+
+    driver = connection.get_driver(args.uri, args.username, args.password)
+    with open(args.path, "wb") as output:
+        rows = export_table(driver, args.table, output, args.format, args.compression, args.chunk_size)
+    print(f"{args.table}: {rows} rows written to {args.path}")
+
+if __name__ == "__main__":
+    main()
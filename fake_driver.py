@@ -0,0 +1,386 @@
+import time
+from collections import Counter
+from uuid import uuid4
+from neo4j.exceptions import ClientError, ConstraintError
+import aggregates
+import queries
+import schema
+from memory_graph import MemoryGraph
+
+# Stand-in for neo4j.Driver backed by a MemoryGraph, for benchmarks and for the
+# embedded backend (see backends.py), which run without a database.
+# It implements the surface used by this app: session().run().data() / single() /
+# consume() / iteration, execute_read / execute_write, verify_connectivity and close.
+# Queries are recognised by their name in the query registry (queries.py), so only
+# registered queries and the schema statements are supported; every registered query
+# has a handler (see tests/test_conformance.py).
+class FakeDriver:
+    def __init__(self, graph=None, latency=0.0):
+        self.graph = graph or MemoryGraph()
+        # Simulated network round-trip time in seconds
+        self.latency = latency
+        self.round_trips = 0
+        self.query_counts = Counter()
+
+    def session(self, **config):
+        return FakeSession(self)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.query_counts.clear()
+
+    def run(self, query, parameters):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+        described = queries.describe(query)
+        if described is None:
+            self.query_counts["(schema)"] += 1
+            return _schema_statement(query)
+        name, label, rel_type = described
+        self.query_counts[name] += 1
+        handler = getattr(self, f"_query_{name}", None)
+        if handler is None:
+            raise UnsupportedQueryError(f"FakeDriver does not support query {name}")
+        with self.graph.transaction():
+            return handler(parameters, label, rel_type)
+
+    # Registered queries
+
+    def _query_create_entity(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        if g.find_by_uuid(label, p["uuid"]) is None:
+            g.add_node(label, p["name"], p["uuid"], version=version)
+            g.record_change(version, "node_created", label=label, name=p["name"], uuid=p["uuid"])
+        return [{"Name": g.names[label][g.find_by_uuid(label, p["uuid"])], "UUID": p["uuid"]}]
+
+    def _query_create_drone(self, p, label, rel_type):
+        g = self.graph
+        a = g.find_by_uuid("Aircraft", p["aircraft"])
+        s = g.find_by_uuid("Soldier", p["soldier"])
+        if a is None or s is None:
+            return []
+        d = g.find_by_uuid("Drone", p["uuid"])
+        if d is None and g.find_by_name("Drone", p["name"]):
+            raise ConstraintError(f"Node already exists with label Drone and property name = '{p['name']}'")
+        version = g.next_version()
+        created = d is None
+        if created:
+            has, responsible_for = str(uuid4()), str(uuid4())
+            d = g.add_node("Drone", p["name"], p["uuid"], p["brand"], version=version)
+            g.add_edge("Soldier", s, "RESPONSIBLE_FOR", "Drone", d, version=version, uuid=responsible_for)
+            g.add_edge("Aircraft", a, "HAS", "Drone", d, version=version, uuid=has)
+        soldier_drones = g.out_degree("Soldier", s, "RESPONSIBLE_FOR")
+        if created:
+            aircraft, soldier = g.node("Aircraft", a)["name"], g.node("Soldier", s)["name"]
+            g.record_change(version, "node_created", label="Drone", name=p["name"], uuid=p["uuid"], brand=p["brand"],
+                            aircraft=aircraft, soldier_drones=soldier_drones)
+            g.record_change(version, "relationship_created", source_label="Aircraft", source=aircraft,
+                            type="HAS", target=p["name"], uuid=has)
+            g.record_change(version, "relationship_created", source_label="Soldier", source=soldier,
+                            type="RESPONSIBLE_FOR", target=p["name"], uuid=responsible_for)
+        node = g.node("Drone", d)
+        return [{"Drone": node["name"], "UUID": node["uuid"], "Brand": node["brand"], "SoldierDrones": soldier_drones}]
+
+    def _query_add_relationships(self, p, label, rel_type):
+        return self._merge_relationships(p["rows"], "Aircraft", "aircraft", rel_type)
+
+    def _query_assign_soldiers_to_drones(self, p, label, rel_type):
+        return self._merge_relationships(p["rows"], "Soldier", "soldier", "RESPONSIBLE_FOR")
+
+    # MERGE of one relationship per row, keyed by its ends and type
+    def _merge_relationships(self, rows, source_label, source_key, rel_type):
+        g = self.graph
+        version = g.next_version()
+        result = []
+        for row in rows:
+            for source in g.find_by_name(source_label, row[source_key]):
+                for d in g.find_by_name("Drone", row["drone"]):
+                    _, created = g.merge_edge(source_label, source, rel_type, "Drone", d, version=version, uuid=row["uuid"])
+                    if created:
+                        g.record_change(version, "relationship_created", source_label=source_label, source=row[source_key],
+                                        type=rel_type, target=row["drone"], uuid=row["uuid"])
+                    record = {"Key": row["uuid"], source_label: row[source_key], "Drone": row["drone"]}
+                    if source_label == "Aircraft":
+                        record["Relationship"] = rel_type
+                    result.append(record)
+        return result
+
+    def _query_delete_relationships_batched(self, p, label, rel_type):
+        g = self.graph
+        indexes = [index for index in (g.find_by_uuid(label, uuid) for uuid in p["uuids"]) if index is not None]
+        ends = {
+            (label, other_label) if outgoing else (other_label, label)
+            for index in indexes for other_label, _, _, outgoing in g.neighbours(label, index)
+        }
+        relationships = sum(g.detach_node(label, index) for index in indexes)
+        return [{"relationships": relationships, "labels": [list(pair) for pair in sorted(ends)]}]
+
+    def _query_log_invalidated(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        for invalidated in p["labels"]:
+            g.record_change(version, "invalidated", label=invalidated)
+        return [{"count": len(p["labels"])}]
+
+    def _query_delete_entities(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        nodes = relationships = 0
+        for uuid in p["uuids"]:
+            index = g.find_by_uuid(label, uuid)
+            if index is None:
+                continue
+            g.record_change(version, "node_deleted", label=label, name=g.names[label][index], uuid=uuid)
+            relationships += g.delete_node(label, index)
+            nodes += 1
+        return [{"nodes": nodes, "relationships": relationships}]
+
+    def _query_entity_names(self, p, label, rel_type):
+        names = self.graph.names[label]
+        return [{"Name": names[i]} for i in self.graph.node_indexes(label)]
+
+    def _query_list_entities(self, p, label, rel_type):
+        g = self.graph
+        return [{"Name": g.names[label][i], "UUID": g.uuids[label][i]} for i in g.node_indexes(label)]
+
+    def _query_list_drones(self, p, label, rel_type):
+        g = self.graph
+        return [_drone_row(g, i) for i in g.node_indexes("Drone")]
+
+    def _query_page_entities(self, p, label, rel_type):
+        g = self.graph
+        return [{"Name": g.names[label][i], "UUID": g.uuids[label][i]} for i in g.page(label, p["after"], p["limit"])]
+
+    def _query_page_drones(self, p, label, rel_type):
+        g = self.graph
+        return [_drone_row(g, i) for i in g.page("Drone", p["after"], p["limit"])]
+
+    def _query_search_entities(self, p, label, rel_type):
+        g = self.graph
+        return [{"Name": g.names[label][i], "UUID": g.uuids[label][i]} for i in g.search(label, p["prefix"], p["limit"])]
+
+    def _query_aircraft_drone_relationships(self, p, label, rel_type):
+        g = self.graph
+        return [
+            {"Aircraft": g.names["Aircraft"][a], "Drone": g.names["Drone"][d], "Relationship": t, "Version": v}
+            for a, t, d, v in g.edges("Aircraft", "Drone", versions=True)
+        ]
+
+    def _query_soldier_drone_relationships(self, p, label, rel_type):
+        g = self.graph
+        return [
+            {"Soldier": g.names["Soldier"][s], "Drone": g.names["Drone"][d], "Relationship": t, "Version": v}
+            for s, t, d, v in g.edges("Soldier", "Drone", versions=True)
+        ]
+
+    def _query_bulk_create_entities(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        count = 0
+        for row in p["rows"]:
+            if g.find_by_uuid(label, row["uuid"]) is None:
+                g.add_node(label, row["name"], row["uuid"], version=version)
+                count += 1
+        return [{"count": count}]
+
+    def _query_bulk_create_drones(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        count = 0
+        for row in p["rows"]:
+            d = g.find_by_uuid("Drone", row["uuid"])
+            if d is None:
+                d = g.add_node("Drone", row["name"], row["uuid"], row["brand"], version=version)
+                count += 1
+            for a in g.find_by_name("Aircraft", row["aircraft"]):
+                g.merge_edge("Aircraft", a, "HAS", "Drone", d, version=version, uuid=str(uuid4()))
+            for s in g.find_by_name("Soldier", row["soldier"]):
+                g.merge_edge("Soldier", s, "RESPONSIBLE_FOR", "Drone", d, version=version, uuid=str(uuid4()))
+        return [{"count": count}]
+
+    def _query_bulk_add_relationships(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        count = 0
+        for row in p["rows"]:
+            for a in g.find_by_name("Aircraft", row["aircraft"]):
+                for d in g.find_by_name("Drone", row["drone"]):
+                    count += g.merge_edge("Aircraft", a, rel_type, "Drone", d, version=version, uuid=row["uuid"])[1]
+        return [{"count": count}]
+
+    def _query_current_version(self, p, label, rel_type):
+        return [{"version": self.graph.next_version(), "pruned_before": self.graph.pruned_before}]
+
+    def _query_changes_since(self, p, label, rel_type):
+        g = self.graph
+        version = g.next_version()
+        since = p["since"] if p["since"] is not None else version - p["lag"]
+        changes = [dict(change) for change in g.changes_since(since, p["limit"])]
+        return [{"version": version, "pruned_before": g.pruned_before, "changes": changes}]
+
+    def _query_prune_changes(self, p, label, rel_type):
+        return [{"count": self.graph.prune_changes(p["before"])}]
+
+    def _query_ego_neighbours(self, p, label, rel_type):
+        g = self.graph
+        rows = []
+        for node in p["nodes"]:
+            index = g.find_by_uuid(label, node["uuid"])
+            if index is None:
+                continue
+            neighbours = {}
+            for other_label, other, edge_type, outgoing in g.neighbours(label, index):
+                if other_label in p["labels"] and g.uuids[other_label][other] > node["after"]:
+                    neighbours.setdefault((g.uuids[other_label][other], other_label, other), []).append(
+                        {"type": edge_type, "outgoing": outgoing})
+            for (uuid, other_label, other), relationships in sorted(neighbours.items())[:p["limit"]]:
+                rows.append({"Source": node["uuid"], "Label": other_label, "Name": g.names[other_label][other],
+                             "UUID": uuid, "Relationships": relationships})
+        return rows
+
+    def _query_snapshot_nodes(self, p, label, rel_type):
+        g = self.graph
+        return [g.node(label, i) for i in g.node_indexes(label)]
+
+    def _query_snapshot_relationships(self, p, label, rel_type):
+        g = self.graph
+        return [
+            {"source": g.uuids[label][s], "type": t, "target_label": target_label, "target": g.uuids[target_label][d],
+             "uuid": uuid}
+            for target_label in p["labels"]
+            for s, t, d, uuid in g.edges(label, target_label, uuids=True)
+        ]
+
+    def _query_statistics(self, p, label, rel_type):
+        g = self.graph
+        per_brand = Counter(g.brands["Drone"][i] for i in g.node_indexes("Drone"))
+        per_aircraft = Counter()
+        for a in g.node_indexes("Aircraft"):
+            per_aircraft[g.names["Aircraft"][a]] += 0
+        for a, _, _ in g.edges("Aircraft", "Drone", "HAS"):
+            per_aircraft[g.names["Aircraft"][a]] += 1
+        with_drones = {s for s, _, _ in g.edges("Soldier", "Drone", "RESPONSIBLE_FOR")}
+        return [{
+            "aircraft": g.node_counts["Aircraft"],
+            "soldiers": g.node_counts["Soldier"],
+            "drones": g.node_counts["Drone"],
+            "drones_per_brand": [{"brand": b, "count": c} for b, c in per_brand.items()],
+            "drones_per_aircraft": [{"aircraft": a, "count": c} for a, c in per_aircraft.items()],
+            "soldiers_without_drones": g.node_counts["Soldier"] - len(with_drones),
+        }]
+
+    # Aggregates (see aggregates.py), each a part of the statistics record
+
+    def _query_aggregate_totals(self, p, label, rel_type):
+        return [{"value": aggregates.value_from_statistics("aggregate_totals", self._query_statistics(p, label, rel_type)[0])}]
+
+    def _query_aggregate_drones_per_brand(self, p, label, rel_type):
+        return [{"value": aggregates.value_from_statistics("aggregate_drones_per_brand", self._query_statistics(p, label, rel_type)[0])}]
+
+    def _query_aggregate_drones_per_aircraft(self, p, label, rel_type):
+        return [{"value": aggregates.value_from_statistics("aggregate_drones_per_aircraft", self._query_statistics(p, label, rel_type)[0])}]
+
+    def _query_aggregate_soldiers_without_drones(self, p, label, rel_type):
+        return [{"value": aggregates.value_from_statistics("aggregate_soldiers_without_drones", self._query_statistics(p, label, rel_type)[0])}]
+
+def _drone_row(graph, index):
+    return {"Drone": graph.names["Drone"][index], "UUID": graph.uuids["Drone"][index], "Brand": graph.brands["Drone"][index]}
+
+# Schema statements always succeed and every constraint and index reports as online
+def _schema_statement(query):
+    text = query.strip().upper()
+    if text.startswith("SHOW CONSTRAINTS"):
+        return [{"name": name} for name in schema.CONSTRAINTS]
+    if text.startswith("SHOW INDEXES"):
+        return [{"name": name, "state": "ONLINE"} for name in schema.INDEXES]
+    if text.startswith("CREATE"):
+        return []
+    raise UnsupportedQueryError(f"FakeDriver does not support query: {query.strip()[:60]}")
+
+# Raised for queries without a handler, like the database rejecting a statement, so
+# callers handle it as any other failed query
+class UnsupportedQueryError(ClientError):
+    pass
+
+# Like neo4j.Record: a tuple of values that can also be read by key
+class FakeRecord(tuple):
+    def __new__(cls, row):
+        record = super().__new__(cls, row.values())
+        record._keys = list(row)
+        return record
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._keys.index(key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+
+    def data(self):
+        return dict(zip(self._keys, self))
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return list(self)
+
+class FakeSummary:
+    def __init__(self, rows):
+        self.result_available_after = 0
+        self.result_consumed_after = 0
+        self.rows = rows
+
+class FakeResult:
+    def __init__(self, rows, keys=()):
+        self._rows = [FakeRecord(row) for row in rows]
+        self._keys = list(keys)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    # Columns of the query, also when it returned no rows
+    def keys(self):
+        return self._rows[0].keys() if self._rows else list(self._keys)
+
+    def data(self):
+        return [record.data() for record in self._rows]
+
+    def single(self):
+        return self._rows[0] if self._rows else None
+
+    def consume(self):
+        return FakeSummary(len(self._rows))
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def run(self, query, parameters=None, **kwargs):
+        rows = self._driver.run(query, dict(parameters or {}, **kwargs))
+        return FakeResult(rows, queries.columns(query) if queries.describe(query) else ())
+
+class FakeSession(FakeTransaction):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(FakeTransaction(self._driver), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(FakeTransaction(self._driver), *args, **kwargs)
@@ -0,0 +1,37 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import Driver
+import instrumentation
+
+# Upper bound on reads running at the same time across all sessions of the process.
+# Every read borrows a connection from the shared driver pool (see connection.py).
+MAX_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fetch")
+
+# Run independent reads concurrently and wait for all of them, so a page waits for
+# its slowest query instead of the sum of all of them.
+# tasks is a dict of name -> callable without arguments. Tasks run outside the script
+# thread and must not call Streamlit; their exceptions are returned, not raised.
+# Each task runs in a copy of the caller's context, so query instrumentation is
+# attributed to the caller's rerun.
+def fetch_all(tasks):
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, task)
+        for name, task in tasks.items()
+    }
+    results = {}
+    errors = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+# Yield records as dicts one by one as the server streams them, fetch_size at a
+# time, without building the full list. For reads too large to hold as records,
+# like the exports of export.py.
+def stream_query(driver: Driver, query, parameters=None, fetch_size=1000):
+    with driver.session(fetch_size=fetch_size) as session:
+        yield from instrumentation.run_stream(session, query, parameters)
@@ -0,0 +1,53 @@
+from neo4j import Driver
+from aggregates import aggregate_scheduler
+
+# Fleet statistics, assembled from the precomputed aggregates of aggregates.py.
+# Creates made through utils adjust the cached aggregates in place (see changes.py);
+# writes whose effect on a breakdown is not known (deletes, assignments, bulk
+# writes) mark the aggregates of their labels for a refresh.
+class FleetStatistics:
+    def __init__(self, scheduler=aggregate_scheduler):
+        self.scheduler = scheduler
+
+    # Recompute every aggregate now
+    def load(self, driver: Driver):
+        self.scheduler.refresh(driver)
+        return self.snapshot(driver)
+
+    # Current statistics, as cached by the scheduler
+    def snapshot(self, driver: Driver):
+        values = self.scheduler.values(driver)
+        snapshot = dict(values["totals"])
+        snapshot["drones_per_brand"] = values["drones_per_brand"]
+        snapshot["drones_per_aircraft"] = values["drones_per_aircraft"]
+        snapshot["soldiers_without_drones"] = values["soldiers_without_drones"]
+        return snapshot
+
+    # Writes to these labels (any label when none are given) invalidate their aggregates
+    def mark_stale(self, *labels):
+        self.scheduler.mark_dirty(*labels)
+
+    # Aircraft or Soldier created with add_entity_with_uuid
+    def entity_created(self, entity_type, name):
+        self.scheduler.patch("totals", lambda totals: {**totals, entity_type: totals[entity_type] + 1})
+        if entity_type == "Aircraft":
+            self.scheduler.patch("drones_per_aircraft", lambda counts: {name: 0, **counts})
+        elif entity_type == "Soldier":
+            self.scheduler.patch("soldiers_without_drones", lambda count: count + 1)
+        elif entity_type == "Drone":
+            self.scheduler.patch("drones_per_brand", lambda counts: _increment(counts, None))
+
+    # Drone created with add_drone_with_unique_name_and_brand.
+    # soldier_drones is the soldier's drone count after the write.
+    def drone_created(self, brand, aircraft_name, soldier_drones):
+        self.scheduler.patch("totals", lambda totals: {**totals, "Drone": totals["Drone"] + 1})
+        self.scheduler.patch("drones_per_brand", lambda counts: _increment(counts, brand))
+        self.scheduler.patch("drones_per_aircraft", lambda counts: _increment(counts, aircraft_name))
+        if soldier_drones == 1:
+            self.scheduler.patch("soldiers_without_drones", lambda count: count - 1)
+
+def _increment(counts, key):
+    return {**counts, key: counts.get(key, 0) + 1}
+
+# Process-wide statistics
+fleet_statistics = FleetStatistics()
@@ -0,0 +1,169 @@
+import json
+import numpy as np
+import pandas as pd
+import columnar
+
+LABEL_COLORS = {"Aircraft": "blue", "Soldier": "orange", "Drone": "green"}
+
+REPULSION = dict(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
+
+# Declarative network specs: which columns of a result frame are nodes and how
+# they are drawn, and which pair of columns are the edges.
+# A node role may prefix its ids with another column (drones are keyed by brand and
+# name) and take its color from `colors` by the value of `color_column`; an edge
+# takes its title from `title_column` when present, `title` otherwise.
+SPECS = {
+    "aircraft": {
+        "nodes": [{"column": "Name", "color": "green"}],
+    },
+    "soldiers": {
+        "nodes": [{"column": "Name", "color": "green"}],
+    },
+    "drones": {
+        "nodes": [{"column": "Drone", "color": "green", "id_prefix": "Brand"}],
+    },
+    "aircraft_drone": {
+        "nodes": [{"column": "Aircraft", "color": "blue"}, {"column": "Drone", "color": "green"}],
+        "edges": {"source": "Aircraft", "target": "Drone", "title_column": "Relationship", "title": "CONNECTED_TO"},
+    },
+    "soldier_drone": {
+        "nodes": [{"column": "Soldier", "color": "blue"}, {"column": "Drone", "color": "green"}],
+        "edges": {"source": "Soldier", "target": "Drone", "title": "Responsible for", "color": "orange"},
+        "repulsion": dict(REPULSION, node_distance=150, spring_length=100),
+    },
+    "ego": {
+        "nodes": [
+            {"column": "Source", "id_prefix": "SourceUUID", "color_column": "SourceLabel", "colors": LABEL_COLORS, "color": "gray"},
+            {"column": "Target", "id_prefix": "TargetUUID", "color_column": "TargetLabel", "colors": LABEL_COLORS, "color": "gray"},
+        ],
+        "edges": {"source": "Source", "target": "Target", "title_column": "Relationship", "title": ""},
+    },
+}
+
+# Node ids and labels of one role, one per row
+def _role_ids(data, role):
+    labels = pd.Series(columnar.column(data, role["column"]), dtype=object).astype(str).to_numpy(dtype=object)
+    if "id_prefix" in role:
+        prefixes = pd.Series(columnar.column(data, role["id_prefix"]), dtype=object).astype(str).to_numpy(dtype=object)
+        return prefixes + "-" + labels, labels
+    return labels, labels
+
+# Node colors of one role: the role color, or one per row from its color column
+def _role_colors(data, role):
+    if "color_column" not in role:
+        return role["color"]
+    values = pd.Series(columnar.column(data, role["color_column"]), dtype=object)
+    return values.map(role["colors"]).fillna(role["color"]).to_numpy(dtype=object)
+
+# Build the nodes and edges of a spec from a result frame.
+# Nodes are deduplicated in one pass, the first occurrence (in row order, then role
+# order) keeps its label and color, as with repeated Network.add_node calls. Edges
+# refer to nodes by their integer position and undirected duplicates are dropped.
+# Returns (nodes, edges) as dicts of equally long lists: nodes has id, label and
+# color; edges has source, target, title and color.
+def build(spec, data):
+    rows = len(data)
+    roles = spec["nodes"]
+    role_ids = [_role_ids(data, role) for role in roles]
+
+    # Row-major interleaving of the roles: row 0 role 0, row 0 role 1, row 1 role 0...
+    ids = np.empty(rows * len(roles), dtype=object)
+    labels = np.empty(rows * len(roles), dtype=object)
+    colors = np.empty(rows * len(roles), dtype=object)
+    for position, (role, (role_id, role_label)) in enumerate(zip(roles, role_ids)):
+        ids[position::len(roles)] = role_id
+        labels[position::len(roles)] = role_label
+        colors[position::len(roles)] = _role_colors(data, role)
+
+    # Codes are numbered in order of first appearance
+    codes, _ = pd.factorize(ids)
+    _, first = np.unique(codes, return_index=True)
+    nodes = {"id": ids[first].tolist(), "label": labels[first].tolist(), "color": colors[first].tolist()}
+
+    edge_spec = spec.get("edges")
+    if edge_spec is None or rows == 0:
+        return nodes, {"source": [], "target": [], "title": [], "color": []}
+
+    columns = [role["column"] for role in roles]
+    sources = codes[columns.index(edge_spec["source"])::len(roles)]
+    targets = codes[columns.index(edge_spec["target"])::len(roles)]
+    pairs = np.minimum(sources, targets) * len(first) + np.maximum(sources, targets)
+    _, kept = np.unique(pairs, return_index=True)
+    kept.sort()
+
+    if "title_column" in edge_spec:
+        titles = np.asarray(columnar.column(data, edge_spec["title_column"], edge_spec["title"]), dtype=object)[kept].tolist()
+    else:
+        titles = [edge_spec["title"]] * len(kept)
+    return nodes, {
+        "source": sources[kept].tolist(),
+        "target": targets[kept].tolist(),
+        "title": titles,
+        "color": [edge_spec.get("color")] * len(kept),
+    }
+
+# Append nodes to a pyvis network in bulk. Network.add_node (and add_nodes, which
+# calls it) checks every id against a list, which makes building a graph quadratic.
+# This fills the node lists of Network the way add_node does, so pyvis is pinned in
+# requirements.txt and tests/test_graph_builder.py compares both on that version.
+# The ids must be unique and not in the network yet. Every extra option is a
+# sequence with one value per node, None values are left out.
+def append_nodes(net, ids, labels, colors, **options):
+    font = {"color": net.font_color} if net.font_color else None
+    names = list(options)
+    for node_id, label, color, *values in zip(ids, labels, colors, *options.values()):
+        node = {"color": color, "id": node_id, "label": label, "shape": "dot"}
+        if font:
+            node["font"] = font
+        for name, value in zip(names, values):
+            if value is not None:
+                node[name] = value
+        net.nodes.append(node)
+        net.node_ids.append(node_id)
+        net.node_map[node_id] = node
+
+# Append edges to a pyvis network in bulk, without the duplicate check of
+# Network.add_edge. Options work as in append_nodes.
+def append_edges(net, sources, targets, **options):
+    names = list(options)
+    for source, target, *values in zip(sources, targets, *options.values()):
+        edge = {"from": source, "to": target}
+        for name, value in zip(names, values):
+            if value is not None:
+                edge[name] = value
+        if net.directed:
+            edge["arrows"] = "to"
+        net.edges.append(edge)
+
+# pyvis network of a result frame, drawn as described by the named spec
+def create_network(spec_name, data):
+    # Imported here: pyvis takes a third of a second to load and pages that draw
+    # nothing, like the login screen, should not pay for it
+    from pyvis.network import Network
+
+    spec = SPECS[spec_name]
+    nodes, edges = build(spec, data)
+
+    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
+    net.barnes_hut()
+    append_nodes(net, nodes["id"], nodes["label"], nodes["color"])
+    node_ids = nodes["id"]
+    append_edges(net, [node_ids[source] for source in edges["source"]], [node_ids[target] for target in edges["target"]],
+                 title=edges["title"], color=edges["color"])
+    net.repulsion(**spec.get("repulsion", REPULSION))
+    return net
+
+# The same network as vis.js data, without pyvis: nodes with id, label and color,
+# edges referring to nodes by position. Much smaller than the pyvis HTML page.
+def create_json(spec_name, data):
+    nodes, edges = build(SPECS[spec_name], data)
+    return json.dumps({
+        "nodes": [
+            {"id": node_id, "label": label, "color": color}
+            for node_id, label, color in zip(nodes["id"], nodes["label"], nodes["color"])
+        ],
+        "edges": [
+            {"from": source, "to": target, "title": title, **({"color": color} if color else {})}
+            for source, target, title, color in zip(edges["source"], edges["target"], edges["title"], edges["color"])
+        ],
+    })
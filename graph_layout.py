@@ -0,0 +1,184 @@
+import hashlib
+import json
+import math
+from cache import TTLCache
+import columnar
+import graph_builder
+
+# Above this many nodes the graph is laid out on the server and client physics is off
+LARGE_GRAPH_THRESHOLD = 1000
+# Groups with more members than this are drawn as one cluster node until expanded
+CLUSTER_MIN_SIZE = 20
+# At most this many nodes are drawn: groups collapse, then merge, until the graph fits
+MAX_VISIBLE_NODES = 500
+# Spring layout is used up to this many groups (networkx needs scipy beyond), a circular layout above
+MAX_SPRING_LAYOUT_NODES = 500
+
+# Process-wide cache of group positions, keyed by a hash of the group graph
+layout_cache = TTLCache(maxsize=32, ttl=3600)
+
+# Members and relationship titles of every group, e.g. the drones of each aircraft
+def group_rows(data, group_column, member_column):
+    groups = {}
+    relationships = columnar.column(data, "Relationship", "CONNECTED_TO")
+    for group, member, relationship in zip(data[group_column], data[member_column], relationships):
+        groups.setdefault(str(group), []).append((str(member), relationship))
+    return groups
+
+def count_nodes(data, group_column, member_column):
+    if data.empty:
+        return 0
+    nodes = set(map(str, data[group_column].unique()))
+    nodes.update(map(str, data[member_column].unique()))
+    return len(nodes)
+
+def is_large(data, group_column, member_column):
+    return count_nodes(data, group_column, member_column) > LARGE_GRAPH_THRESHOLD
+
+# Groups collapsed when nothing is expanded, for the "expand" control
+def cluster_names(data, group_column, member_column, max_nodes=MAX_VISIBLE_NODES):
+    groups = group_rows(data, group_column, member_column)
+    open_groups, _ = plan_clusters(groups, max_nodes=max_nodes)
+    return sorted(set(groups) - open_groups)
+
+# Which groups to draw in at most max_nodes nodes, as (open groups, buckets). An open
+# group is drawn with its members, a bucket is a list of collapsed groups drawn as one
+# node. Expanded groups are opened first while they fit and groups up to
+# CLUSTER_MIN_SIZE members after them. The largest of the others then collapse until
+# the graph fits, and if one node per group is still too many, collapsed groups of
+# consecutive names are merged into buckets.
+def plan_clusters(groups, expanded=(), max_nodes=MAX_VISIBLE_NODES):
+    members_of = {group: {member for member, _ in members} for group, members in groups.items()}
+    # Member -> number of open groups drawing it
+    counts = {}
+    open_groups = set()
+
+    def open_group(group):
+        open_groups.add(group)
+        for member in members_of[group]:
+            counts[member] = counts.get(member, 0) + 1
+
+    def close_group(group):
+        open_groups.discard(group)
+        for member in members_of[group]:
+            counts[member] -= 1
+            if not counts[member]:
+                del counts[member]
+
+    pinned = set()
+    for group in expanded:
+        if group not in members_of or group in open_groups:
+            continue
+        open_group(group)
+        # Everything else can still be merged into a single bucket
+        if len(open_groups) + len(counts) + (len(open_groups) < len(groups)) > max_nodes:
+            close_group(group)
+        else:
+            pinned.add(group)
+
+    for group, members in groups.items():
+        if group not in open_groups and len(members) <= CLUSTER_MIN_SIZE:
+            open_group(group)
+    for group in sorted(open_groups - pinned, key=lambda group: len(members_of[group]), reverse=True):
+        if len(groups) + len(counts) <= max_nodes:
+            break
+        close_group(group)
+
+    collapsed = sorted(set(groups) - open_groups)
+    slots = max(1, max_nodes - len(open_groups) - len(counts))
+    size = max(1, math.ceil(len(collapsed) / slots))
+    return open_groups, [collapsed[start:start + size] for start in range(0, len(collapsed), size)]
+
+# Positions of the groups in [-1, 1]. Two groups are linked when they share a member,
+# so related aircraft (or soldiers) end up close to each other.
+def layout_groups(groups):
+    import networkx as nx
+
+    graph = nx.Graph()
+    graph.add_nodes_from(groups)
+    groups_by_member = {}
+    for group, members in groups.items():
+        for member, _ in members:
+            groups_by_member.setdefault(member, []).append(group)
+    for member_groups in groups_by_member.values():
+        for first, second in zip(member_groups, member_groups[1:]):
+            graph.add_edge(first, second)
+
+    content = json.dumps([sorted(graph.nodes), sorted(sorted(edge) for edge in graph.edges)])
+    key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def compute():
+        if len(graph) <= MAX_SPRING_LAYOUT_NODES:
+            positions = nx.spring_layout(graph, seed=42, iterations=50)
+        else:
+            positions = nx.circular_layout(graph)
+        return {node: (float(x), float(y)) for node, (x, y) in positions.items()}
+
+    return layout_cache.get_or_load(key, compute)
+
+# Large-graph network: groups placed by the server-side layout, members placed on a
+# ring around their group, and groups collapsed or merged as planned by plan_clusters
+def create_large_network(data, group_column, member_column, expanded=(), group_color="blue", member_color="green",
+                         max_nodes=MAX_VISIBLE_NODES):
+    # Loaded on first use, like in graph_builder.create_network
+    from pyvis.network import Network
+
+    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
+    net.toggle_physics(False)
+
+    groups = group_rows(data, group_column, member_column)
+    positions = layout_groups(groups)
+    scale = 300 * math.sqrt(len(groups))
+    open_groups, buckets = plan_clusters(groups, expanded, max_nodes)
+    added = set()
+    linked = set()
+    nodes = {"ids": [], "labels": [], "colors": [], "x": [], "y": [], "size": [], "title": []}
+    edges = {"sources": [], "targets": [], "title": []}
+
+    # Nodes and edges are collected first and appended in bulk, see graph_builder.
+    # Groups and members are identified by label and name, so an aircraft and a
+    # drone of the same name are two nodes.
+    def add_node(node_id, label, color, x, y, size=None, title=None):
+        for name, value in zip(nodes, (node_id, label, color, x, y, size, title)):
+            nodes[name].append(value)
+
+    for bucket in buckets:
+        x = sum(positions[group][0] for group in bucket) / len(bucket) * scale
+        y = sum(positions[group][1] for group in bucket) / len(bucket) * scale
+        count = sum(len(groups[group]) for group in bucket)
+        size = 10 + min(40, math.sqrt(count))
+        if len(bucket) == 1:
+            add_node(f"cluster:{bucket[0]}", f"{bucket[0]} ({count})", group_color, x, y, size=size,
+                     title=f"{count} {member_column} nodes, expand it from the list above")
+        else:
+            add_node(f"bucket:{bucket[0]}:{bucket[-1]}", f"{bucket[0]} .. {bucket[-1]} ({count})", group_color, x, y,
+                     size=size, title=f"{len(bucket)} {group_column} groups with {count} {member_column} nodes, "
+                                      f"expand one from the list above")
+
+    for group, members in groups.items():
+        if group not in open_groups:
+            continue
+        x, y = positions[group]
+        x, y = x * scale, y * scale
+
+        group_id = f"{group_column}:{group}"
+        if group_id not in added:
+            add_node(group_id, group, group_color, x, y)
+            added.add(group_id)
+        radius = 60 + 6 * len(members)
+        for index, (member, relationship) in enumerate(members):
+            member_id = f"{member_column}:{member}"
+            if member_id not in added:
+                angle = 2 * math.pi * index / len(members)
+                add_node(member_id, member, member_color, x + radius * math.cos(angle), y + radius * math.sin(angle))
+                added.add(member_id)
+            if (group_id, member_id) not in linked:
+                edges["sources"].append(group_id)
+                edges["targets"].append(member_id)
+                edges["title"].append(relationship)
+                linked.add((group_id, member_id))
+
+    graph_builder.append_nodes(net, nodes["ids"], nodes["labels"], nodes["colors"],
+                               x=nodes["x"], y=nodes["y"], size=nodes["size"], title=nodes["title"])
+    graph_builder.append_edges(net, edges["sources"], edges["targets"], title=edges["title"])
+    return net
@@ -0,0 +1,209 @@
+import contextvars
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+import columnar
+import queries
+
+# Queries slower than this (client wall time, in milliseconds) go to the slow-query log
+SLOW_QUERY_MS = 500
+# Number of recent executions and reruns kept in memory
+RING_SIZE = 1000
+RERUN_HISTORY = 100
+
+slow_query_log = logging.getLogger("neo4j_app.slow_queries")
+
+_lock = threading.Lock()
+_executions = deque(maxlen=RING_SIZE)
+_reruns = deque(maxlen=RERUN_HISTORY)
+_totals = {}
+_rerun_ids = itertools.count(1)
+
+# Rerun the current code runs for. Propagated to fetch pool threads by fetch.fetch_all.
+current_rerun = contextvars.ContextVar("current_rerun", default=None)
+
+# Totals of one Streamlit rerun
+class Rerun:
+    def __init__(self, page):
+        self.id = next(_rerun_ids)
+        self.page = page
+        self.started_at = time.time()
+        self.queries = 0
+        self.rows = 0
+        self.wall_ms = 0.0
+        self.server_ms = 0.0
+        self.slow = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+# Start collecting totals for a rerun of the given page
+def start_rerun(page):
+    rerun = Rerun(page)
+    current_rerun.set(rerun)
+    with _lock:
+        _reruns.append(rerun)
+    return rerun
+
+# Parameter names and value types, never the values themselves
+def parameters_shape(parameters):
+    shape = {}
+    for key, value in (parameters or {}).items():
+        if isinstance(value, (list, tuple)):
+            shape[key] = f"list[{len(value)}]"
+        else:
+            shape[key] = type(value).__name__
+    return shape
+
+def _record(query, parameters, started, rows, summary=None, error=None):
+    wall_ms = (time.perf_counter() - started) * 1000
+    available_after = getattr(summary, "result_available_after", None)
+    consumed_after = getattr(summary, "result_consumed_after", None)
+    name = queries.name_of(query) or "adhoc"
+    execution = {
+        "query": name,
+        "parameters": parameters_shape(parameters),
+        "rows": rows,
+        "wall_ms": round(wall_ms, 3),
+        "result_available_after_ms": available_after,
+        "result_consumed_after_ms": consumed_after,
+        "error": error,
+        "timestamp": time.time(),
+    }
+    server_ms = (available_after or 0) + (consumed_after or 0)
+    slow = wall_ms >= SLOW_QUERY_MS
+    rerun = current_rerun.get()
+    if rerun is not None:
+        execution["rerun"] = rerun.id
+        execution["page"] = rerun.page
+
+    with _lock:
+        _executions.append(execution)
+        totals = _totals.setdefault(name, {"count": 0, "rows": 0, "wall_ms": 0.0, "server_ms": 0.0, "slow": 0, "errors": 0})
+        totals["count"] += 1
+        totals["rows"] += rows
+        totals["wall_ms"] += wall_ms
+        totals["server_ms"] += server_ms
+        totals["slow"] += slow
+        totals["errors"] += error is not None
+        if rerun is not None:
+            rerun.queries += 1
+            rerun.rows += rows
+            rerun.wall_ms += wall_ms
+            rerun.server_ms += server_ms
+            rerun.slow += slow
+            rerun.errors += error is not None
+
+    if slow:
+        slow_query_log.warning("Slow query %s: %.1f ms, %d rows, parameters %s",
+                               name, wall_ms, rows, execution["parameters"])
+
+# Run a query on a session or transaction and return result.data(), recording it
+def run_data(runner, query, parameters=None):
+    started = time.perf_counter()
+    try:
+        result = runner.run(query, parameters or {})
+        rows = result.data()
+        summary = result.consume()
+    except Exception as e:
+        _record(query, parameters, started, 0, error=type(e).__name__)
+        raise
+    _record(query, parameters, started, len(rows), summary)
+    return rows
+
+# Run a query and return its records as a DataFrame built column by column
+# (see columnar.py), recording it. With a chunk_size, records are converted
+# chunk_size at a time as they stream in, so only one chunk of records is held
+# besides the typed columns.
+def run_frame(runner, query, parameters=None, chunk_size=None):
+    started = time.perf_counter()
+    frames = []
+    rows = 0
+    try:
+        result = runner.run(query, parameters or {})
+        keys = result.keys()
+        records = iter(result)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if chunk or not frames:
+                frames.append(columnar.to_frame(keys, chunk))
+                rows += len(chunk)
+            if chunk_size is None or len(chunk) < chunk_size:
+                break
+        summary = result.consume()
+    except Exception as e:
+        _record(query, parameters, started, rows, error=type(e).__name__)
+        raise
+    _record(query, parameters, started, rows, summary)
+    return columnar.concat_frames(frames)
+
+# Run a query and return result.single(), recording it
+def run_single(runner, query, parameters=None):
+    started = time.perf_counter()
+    try:
+        result = runner.run(query, parameters or {})
+        record = result.single()
+        summary = result.consume()
+    except Exception as e:
+        _record(query, parameters, started, 0, error=type(e).__name__)
+        raise
+    _record(query, parameters, started, 0 if record is None else 1, summary)
+    return record
+
+# Run a query and yield its records as dicts, recording it once the stream ends
+def run_stream(runner, query, parameters=None):
+    started = time.perf_counter()
+    rows = 0
+    try:
+        result = runner.run(query, parameters or {})
+        for record in result:
+            rows += 1
+            yield record.data()
+        summary = result.consume()
+    except GeneratorExit:
+        _record(query, parameters, started, rows, error="closed early")
+        raise
+    except Exception as e:
+        _record(query, parameters, started, rows, error=type(e).__name__)
+        raise
+    _record(query, parameters, started, rows, summary)
+
+def recent_executions():
+    with _lock:
+        return list(_executions)
+
+def recent_reruns():
+    with _lock:
+        return [rerun.as_dict() for rerun in _reruns]
+
+def query_totals():
+    with _lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+# Recent executions as JSON lines
+def export_jsonl():
+    return "".join(json.dumps(execution) + "\n" for execution in recent_executions())
+
+# Per-query totals in the Prometheus text exposition format
+def export_prometheus():
+    lines = []
+    metrics = [
+        ("neo4j_app_queries_total", "counter", "Executed queries", "count", 1),
+        ("neo4j_app_query_rows_total", "counter", "Rows returned", "rows", 1),
+        ("neo4j_app_query_seconds_total", "counter", "Client wall time", "wall_ms", 0.001),
+        ("neo4j_app_query_server_seconds_total", "counter", "Server time until the result was available and consumed", "server_ms", 0.001),
+        ("neo4j_app_slow_queries_total", "counter", f"Queries slower than {SLOW_QUERY_MS} ms", "slow", 1),
+        ("neo4j_app_query_errors_total", "counter", "Failed queries", "errors", 1),
+    ]
+    totals = query_totals()
+    for metric, metric_type, help_text, key, factor in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name, values in sorted(totals.items()):
+            lines.append(f'{metric}{{query="{name}"}} {values[key] * factor:g}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,293 @@
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from uuid import uuid4
+import queries
+
+# Compact in-process property graph for the Aircraft/Soldier/Drone model.
+# Nodes of a label are rows in parallel lists (name, uuid, brand) addressed by an
+# integer index; relationships are rows in parallel typed arrays, and every node keeps
+# the ids of its incident relationships. Deleted rows are tombstoned, not moved.
+# Nodes and relationships carry the version of the write that created them, and the
+# change log mirrors the Change nodes of the database (see queries.py).
+class MemoryGraph:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.labels = list(queries.ENTITY_LABELS)
+        self.types = ["HAS", "RESPONSIBLE_FOR"] + list(queries.RELATIONSHIP_TYPES)
+        self.names = {label: [] for label in self.labels}
+        self.uuids = {label: [] for label in self.labels}
+        self.brands = {label: [] for label in self.labels}
+        self.node_versions = {label: [] for label in self.labels}
+        self.node_alive = {label: bytearray() for label in self.labels}
+        self.incident = {label: [] for label in self.labels}
+        self.by_uuid = {label: {} for label in self.labels}
+        self.by_name = {label: {} for label in self.labels}
+        self.node_counts = {label: 0 for label in self.labels}
+        # Sorted (uuid, index) pairs per label for keyset pages and (name, uuid, index)
+        # triples of the named nodes for prefix search, rebuilt when None
+        self._uuid_order = {label: None for label in self.labels}
+        self._name_order = {label: None for label in self.labels}
+
+        self.edge_type = array("B")
+        self.edge_source_label = array("B")
+        self.edge_source = array("q")
+        self.edge_target_label = array("B")
+        self.edge_target = array("q")
+        self.edge_version = array("q")
+        self.edge_alive = bytearray()
+        self.edge_count = 0
+        # Relationships written with a uuid (see writes.py), both ways
+        self.edge_by_uuid = {}
+        self.edge_uuids = {}
+        # (source label code, target label code, type code) -> ids of the relationships, ascending
+        self.edge_index = {}
+
+        self.pruned_before = 0
+        self.changes = []
+
+    # Hold the graph for a series of reads and writes that must not interleave with
+    # those of other threads, e.g. one query of FakeDriver
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self
+
+    # Nodes
+
+    def add_node(self, label, name, uuid, brand=None, version=0):
+        with self._lock:
+            index = len(self.names[label])
+            self.names[label].append(name)
+            self.uuids[label].append(uuid)
+            self.brands[label].append(brand)
+            self.node_versions[label].append(version)
+            self.node_alive[label].append(1)
+            self.incident[label].append([])
+            self.by_uuid[label][uuid] = index
+            self.by_name[label].setdefault(name, []).append(index)
+            self.node_counts[label] += 1
+            order = self._uuid_order[label]
+            if order is not None:
+                bisect.insort(order, (uuid, index))
+            order = self._name_order[label]
+            if order is not None and name is not None:
+                bisect.insort(order, (name, uuid, index))
+            return index
+
+    def find_by_name(self, label, name):
+        return list(self.by_name[label].get(name, ()))
+
+    def find_by_uuid(self, label, uuid):
+        return self.by_uuid[label].get(uuid)
+
+    def node(self, label, index):
+        return {"name": self.names[label][index], "uuid": self.uuids[label][index], "brand": self.brands[label][index]}
+
+    # Indexes of the live nodes of a label
+    def node_indexes(self, label):
+        alive = self.node_alive[label]
+        return [index for index in range(len(alive)) if alive[index]]
+
+    # Delete the relationships of a node, returns how many were removed
+    def detach_node(self, label, index):
+        with self._lock:
+            removed = 0
+            for edge in self.incident[label][index]:
+                if self.edge_alive[edge]:
+                    self.edge_alive[edge] = 0
+                    self.edge_count -= 1
+                    removed += 1
+            self.incident[label][index] = []
+            return removed
+
+    # Detach-delete a node, returns the number of relationships removed with it
+    def delete_node(self, label, index):
+        with self._lock:
+            if not self.node_alive[label][index]:
+                return 0
+            removed = self.detach_node(label, index)
+            self.node_alive[label][index] = 0
+            self.node_counts[label] -= 1
+            uuid = self.uuids[label][index]
+            name = self.names[label][index]
+            self.by_uuid[label].pop(uuid, None)
+            same_name = self.by_name[label].get(name, [])
+            if index in same_name:
+                same_name.remove(index)
+            for order, entry in ((self._uuid_order[label], (uuid, index)),
+                                 (self._name_order[label] if name is not None else None, (name, uuid, index))):
+                if order is not None:
+                    position = bisect.bisect_left(order, entry)
+                    if position < len(order) and order[position] == entry:
+                        del order[position]
+            return removed
+
+    # Live nodes with uuid > after, in uuid order
+    def page(self, label, after, limit):
+        with self._lock:
+            order = self._uuid_order[label]
+            if order is None:
+                order = sorted((self.uuids[label][index], index) for index in self.node_indexes(label))
+                self._uuid_order[label] = order
+            start = bisect.bisect_right(order, (after, float("inf")))
+            return [index for _, index in order[start:start + limit]]
+
+    # Live nodes whose name starts with prefix, in (name, uuid) order
+    def search(self, label, prefix, limit):
+        with self._lock:
+            order = self._name_order[label]
+            if order is None:
+                order = sorted((self.names[label][index], self.uuids[label][index], index)
+                               for index in self.node_indexes(label) if self.names[label][index] is not None)
+                self._name_order[label] = order
+            matches = []
+            for name, _, index in order[bisect.bisect_left(order, (prefix,)):]:
+                if len(matches) == limit or not name.startswith(prefix):
+                    break
+                matches.append(index)
+            return matches
+
+    # Relationships
+
+    def add_edge(self, source_label, source, rel_type, target_label, target, version=0, uuid=None):
+        with self._lock:
+            edge = len(self.edge_alive)
+            if uuid is not None:
+                self.edge_by_uuid[uuid] = edge
+                self.edge_uuids[edge] = uuid
+            self.edge_version.append(version)
+            self.edge_type.append(self.types.index(rel_type))
+            self.edge_source_label.append(self.labels.index(source_label))
+            self.edge_source.append(source)
+            self.edge_target_label.append(self.labels.index(target_label))
+            self.edge_target.append(target)
+            self.edge_alive.append(1)
+            self.edge_count += 1
+            key = (self.edge_source_label[edge], self.edge_target_label[edge], self.edge_type[edge])
+            self.edge_index.setdefault(key, array("q")).append(edge)
+            self.incident[source_label][source].append(edge)
+            self.incident[target_label][target].append(edge)
+            return edge
+
+    # Live relationship with the given uuid, or None
+    def find_edge(self, uuid):
+        edge = self.edge_by_uuid.get(uuid)
+        return edge if edge is not None and self.edge_alive[edge] else None
+
+    # Like MERGE on (source)-[:rel_type]->(target): the live relationship between the
+    # two nodes with that type, or a new one. Returns (edge, created).
+    def merge_edge(self, source_label, source, rel_type, target_label, target, version=0, uuid=None):
+        with self._lock:
+            source_code, target_code = self.labels.index(source_label), self.labels.index(target_label)
+            type_code = self.types.index(rel_type)
+            for edge in self.incident[source_label][source]:
+                if (self.edge_alive[edge] and self.edge_type[edge] == type_code
+                        and self.edge_source_label[edge] == source_code and self.edge_source[edge] == source
+                        and self.edge_target_label[edge] == target_code and self.edge_target[edge] == target):
+                    return edge, False
+            return self.add_edge(source_label, source, rel_type, target_label, target, version, uuid), True
+
+    # Live relationships from source_label to target_label as
+    # (source index, type, target index), optionally of one type only and
+    # with the version and the uuid (or None) of each relationship appended
+    def edges(self, source_label, target_label, rel_type=None, versions=False, uuids=False):
+        source_code = self.labels.index(source_label)
+        target_code = self.labels.index(target_label)
+        type_codes = range(len(self.types)) if rel_type is None else [self.types.index(rel_type)]
+        # In id order, as if all relationships were scanned
+        for edge in heapq.merge(*(self.edge_index.get((source_code, target_code, code), ()) for code in type_codes)):
+            if self.edge_alive[edge]:
+                row = (self.edge_source[edge], self.types[self.edge_type[edge]], self.edge_target[edge])
+                if versions:
+                    row += (self.edge_version[edge],)
+                if uuids:
+                    row += (self.edge_uuids.get(edge),)
+                yield row
+
+    # Live relationships of one node as (other label, other index, type, outgoing)
+    def neighbours(self, label, index):
+        label_code = self.labels.index(label)
+        for edge in self.incident[label][index]:
+            if not self.edge_alive[edge]:
+                continue
+            rel_type = self.types[self.edge_type[edge]]
+            if self.edge_source_label[edge] == label_code and self.edge_source[edge] == index:
+                yield self.labels[self.edge_target_label[edge]], self.edge_target[edge], rel_type, True
+            else:
+                yield self.labels[self.edge_source_label[edge]], self.edge_source[edge], rel_type, False
+
+    def out_degree(self, label, index, rel_type):
+        return sum(
+            1 for _, _, edge_type, outgoing in self.neighbours(label, index)
+            if outgoing and edge_type == rel_type
+        )
+
+    # A graph holding the nodes and relationships of a snapshot (see snapshot.py)
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        graph = cls()
+        graph.types += [rel_type for rel_type in snapshot.types if rel_type not in graph.types]
+        for label in snapshot.labels:
+            for name, uuid, brand in zip(snapshot.names[label].to_list(), snapshot.uuids[label].to_list(),
+                                         snapshot.brands[label].to_list()):
+                graph.add_node(label, name, uuid, brand)
+        edges = snapshot.edges
+        for source_label, source, rel_type, target_label, target in zip(
+            edges["source_label"].tolist(), edges["source"].tolist(), edges["type"].tolist(),
+            edges["target_label"].tolist(), edges["target"].tolist(),
+        ):
+            graph.add_edge(snapshot.labels[source_label], source, snapshot.types[rel_type],
+                           snapshot.labels[target_label], target)
+        return graph
+
+    # A graph from the rows of snapshot.read_graph: nodes of every label as
+    # uuid/name/brand dicts, relationships of every source label as source/type/
+    # target_label/target(/uuid) dicts. Relationships to unknown nodes are skipped.
+    @classmethod
+    def from_rows(cls, nodes, relationships):
+        graph = cls()
+        for label, rows in nodes.items():
+            for row in rows:
+                graph.add_node(label, row["name"], row["uuid"], row.get("brand"))
+        for source_label, rows in relationships.items():
+            for row in rows:
+                source = graph.find_by_uuid(source_label, row["source"])
+                target = graph.find_by_uuid(row["target_label"], row["target"])
+                if source is None or target is None:
+                    continue
+                if row["type"] not in graph.types:
+                    graph.types.append(row["type"])
+                graph.add_edge(source_label, source, row["type"], row["target_label"], target, uuid=row.get("uuid"))
+        return graph
+
+    # Change log
+
+    # Current time in milliseconds, the version of a write (see WRITE_VERSION in queries.py)
+    @staticmethod
+    def next_version():
+        return int(time.time() * 1000)
+
+    # Writes run one at a time here, so changes are recorded in version order
+    def record_change(self, version, kind, **fields):
+        with self._lock:
+            self.changes.append(dict(fields, id=str(uuid4()), version=version, kind=kind))
+
+    # Changes with a version above since, in the order of the changes_since query
+    def changes_since(self, since, limit):
+        with self._lock:
+            versions = [change["version"] for change in self.changes]
+            start = bisect.bisect_right(versions, since)
+            changes = sorted(self.changes[start:], key=lambda change: (change["version"], change["kind"], change["id"]))
+            return changes[:limit]
+
+    def prune_changes(self, before):
+        with self._lock:
+            self.pruned_before = max(self.pruned_before, before)
+            kept = [change for change in self.changes if change["version"] >= before]
+            removed = len(self.changes) - len(kept)
+            self.changes = kept
+            return removed
@@ -0,0 +1,358 @@
+import re
+from functools import lru_cache
+
+# Labels and relationship types that may be interpolated into Cypher text,
+# everything else goes through $parameters
+ENTITY_LABELS = ["Aircraft", "Soldier", "Drone"]
+RELATIONSHIP_TYPES = ["CONNECTED_TO", "SUPPORTS", "MONITORS"]
+
+# Every write is versioned with the server time it started at, in milliseconds.
+# Written nodes and relationships are stamped with it, and an append-only Change node
+# per change (a tombstone for deletes) lets other processes patch their caches, see
+# changes.py. Writers share no node, so they do not wait on each other. In exchange,
+# versions are not in commit order: a write can commit after a later-versioned one.
+# Readers of the log therefore read the last COMMIT_LAG milliseconds again and skip
+# the changes they have seen by id.
+WRITE_VERSION = """
+    WITH timestamp() AS version
+"""
+
+# Longest a write transaction that logs changes may run, in milliseconds. A change
+# committed later than that after its version is never read by a process that has
+# synced in between, so writes.execute_write aborts interactive writes at this bound
+# (writes.TRANSACTION_TIMEOUT). The batch paths, which may run longer, log nothing
+# in their own transactions: they log their changes with log_invalidated, in a short
+# transaction once the batch committed (see bulk_import.py and bulk_delete.py).
+COMMIT_LAG = 10000
+
+# Named, parameterized Cypher templates.
+# {label} and {rel_type} are the only placeholders and are checked against the whitelists above.
+QUERIES = {
+    # Creates MERGE on the UUID chosen by the client and log a change only when they
+    # created something, so a write retried after its commit went through (see
+    # writes.py) returns the same rows without writing twice
+    "create_entity": WRITE_VERSION + """
+    MERGE (n:{label} {uuid: $uuid})
+    ON CREATE SET n.name = $name, n.version = version, n.updated_at = datetime()
+    FOREACH (_ IN CASE WHEN n.version = version THEN [1] ELSE [] END |
+        CREATE (:Change {id: randomUUID(), version: version, kind: "node_created", label: "{label}", name: $name, uuid: $uuid, at: datetime()}))
+    RETURN n.name AS Name, n.uuid AS UUID
+    """,
+    # The aircraft and the soldier are matched by UUID: names of aircraft and soldiers
+    # are not unique, so matching by name could relate the drone to several of them
+    "create_drone": WRITE_VERSION + """
+    MATCH (a:Aircraft {uuid: $aircraft})
+    MATCH (s:Soldier {uuid: $soldier})
+    MERGE (d:Drone {uuid: $uuid})
+    ON CREATE SET d.name = $name, d.brand = $brand, d.version = version, d.updated_at = datetime()
+    WITH version, a, s, d, d.version = version AS created, randomUUID() AS has, randomUUID() AS responsible_for
+    FOREACH (_ IN CASE WHEN created THEN [1] ELSE [] END |
+        CREATE (s)-[:RESPONSIBLE_FOR {uuid: responsible_for, version: version, updated_at: datetime()}]->(d)
+        CREATE (a)-[:HAS {uuid: has, version: version, updated_at: datetime()}]->(d))
+    WITH version, a, s, d, created, has, responsible_for, size([(s)-[:RESPONSIBLE_FOR]->(:Drone) | 1]) AS soldier_drones
+    FOREACH (_ IN CASE WHEN created THEN [1] ELSE [] END |
+        CREATE (:Change {id: randomUUID(), version: version, kind: "node_created", label: "Drone", name: d.name, uuid: d.uuid, brand: d.brand,
+                         aircraft: a.name, soldier_drones: soldier_drones, at: datetime()})
+        CREATE (:Change {id: randomUUID(), version: version, kind: "relationship_created", source_label: "Aircraft", source: a.name,
+                         type: "HAS", target: d.name, uuid: has, at: datetime()})
+        CREATE (:Change {id: randomUUID(), version: version, kind: "relationship_created", source_label: "Soldier", source: s.name,
+                         type: "RESPONSIBLE_FOR", target: d.name, uuid: responsible_for, at: datetime()}))
+    RETURN d.name AS Drone, d.uuid AS UUID, d.brand AS Brand, soldier_drones AS SoldierDrones
+    """,
+    # Coalesced writes (see writes.WriteCoalescer): one row per request, each with a
+    # uuid that becomes the uuid of its relationship and is returned as Key.
+    # Relationships are MERGEd on their ends and type, like the bulk writes below, so
+    # adding one that exists (by any path) leaves it as it was.
+    "add_relationships": WRITE_VERSION + """
+    UNWIND $rows AS row
+    MATCH (a:Aircraft {name: row.aircraft}), (d:Drone {name: row.drone})
+    MERGE (a)-[r:{rel_type}]->(d)
+    ON CREATE SET r.uuid = row.uuid, r.version = version, r.updated_at = datetime()
+    FOREACH (_ IN CASE WHEN r.version = version THEN [1] ELSE [] END |
+        CREATE (:Change {id: randomUUID(), version: version, kind: "relationship_created", source_label: "Aircraft", source: a.name,
+                         type: "{rel_type}", target: d.name, uuid: r.uuid, at: datetime()}))
+    RETURN row.uuid AS Key, a.name AS Aircraft, d.name AS Drone, type(r) AS Relationship
+    """,
+    "assign_soldiers_to_drones": WRITE_VERSION + """
+    UNWIND $rows AS row
+    MATCH (s:Soldier {name: row.soldier}), (d:Drone {name: row.drone})
+    MERGE (s)-[r:RESPONSIBLE_FOR]->(d)
+    ON CREATE SET r.uuid = row.uuid, r.version = version, r.updated_at = datetime()
+    FOREACH (_ IN CASE WHEN r.version = version THEN [1] ELSE [] END |
+        CREATE (:Change {id: randomUUID(), version: version, kind: "relationship_created", source_label: "Soldier", source: s.name,
+                         type: "RESPONSIBLE_FOR", target: d.name, uuid: r.uuid, at: datetime()}))
+    RETURN row.uuid AS Key, s.name AS Soldier, d.name AS Drone
+    """,
+    # Deletion runs in two steps (see bulk_delete.py): the relationships of the nodes
+    # in server-side batches, which needs an auto-commit transaction, then the nodes
+    # themselves with anything attached since
+    "delete_relationships_batched": """
+    MATCH (n:{label})
+    WHERE n.uuid IN $uuids
+    MATCH (n)-[r]-()
+    WITH DISTINCT r
+    WITH r, labels(startNode(r)) + labels(endNode(r)) AS ends
+    CALL {
+        WITH r
+        DELETE r
+    } IN TRANSACTIONS OF $batch_size ROWS
+    RETURN count(*) AS relationships, collect(DISTINCT ends) AS labels
+    """,
+    # Changes of the batch paths, logged once their batch committed (see COMMIT_LAG):
+    # the cached data of every label they may have touched is invalidated
+    "log_invalidated": WRITE_VERSION + """
+    UNWIND $labels AS label
+    CREATE (:Change {id: randomUUID(), version: version, kind: "invalidated", label: label, at: datetime()})
+    RETURN count(*) AS count
+    """,
+    "delete_entities": WRITE_VERSION + """
+    MATCH (n:{label})
+    WHERE n.uuid IN $uuids
+    CREATE (:Change {id: randomUUID(), version: version, kind: "node_deleted", label: "{label}", name: n.name, uuid: n.uuid, at: datetime()})
+    WITH n, size([(n)--() | 1]) AS relationships
+    DETACH DELETE n
+    RETURN count(n) AS nodes, coalesce(sum(relationships), 0) AS relationships
+    """,
+    "entity_names": """
+    MATCH (n:{label})
+    RETURN n.name AS Name
+    """,
+    "list_entities": """
+    MATCH (n:{label})
+    RETURN n.name AS Name, n.uuid AS UUID
+    """,
+    "list_drones": """
+    MATCH (d:Drone)
+    RETURN d.name AS Drone, d.uuid AS UUID, d.brand AS Brand
+    """,
+    "page_entities": """
+    MATCH (n:{label})
+    WHERE n.uuid > $after
+    RETURN n.name AS Name, n.uuid AS UUID
+    ORDER BY n.uuid
+    LIMIT $limit
+    """,
+    "page_drones": """
+    MATCH (d:Drone)
+    WHERE d.uuid > $after
+    RETURN d.name AS Drone, d.uuid AS UUID, d.brand AS Brand
+    ORDER BY d.uuid
+    LIMIT $limit
+    """,
+    "search_entities": """
+    MATCH (n:{label})
+    WHERE n.name STARTS WITH $prefix
+    RETURN n.name AS Name, n.uuid AS UUID
+    ORDER BY n.name
+    LIMIT $limit
+    """,
+    "aircraft_drone_relationships": """
+    MATCH (a:Aircraft)-[r]->(d:Drone)
+    RETURN a.name AS Aircraft, d.name AS Drone, type(r) AS Relationship, r.version AS Version
+    """,
+    "soldier_drone_relationships": """
+    MATCH (a:Soldier)-[r]->(d:Drone)
+    RETURN a.name AS Soldier, d.name AS Drone, type(r) AS Relationship, r.version AS Version
+    """,
+    # Bulk writes log no change, bulk_import.py logs them after each batch (see
+    # COMMIT_LAG). Rows carry uuids derived from their source (see bulk_import.py) and
+    # nodes are MERGEd on them, relationships on their ends and type, so a batch
+    # written again after a crash or a lost acknowledgement leaves the graph as it
+    # was. count is the number of nodes or relationships created by this write.
+    "bulk_create_entities": WRITE_VERSION + """
+    UNWIND $rows AS row
+    MERGE (n:{label} {uuid: row.uuid})
+    ON CREATE SET n.name = row.name, n.version = version, n.updated_at = datetime()
+    RETURN COUNT(DISTINCT CASE WHEN n.version = version THEN n END) AS count
+    """,
+    "bulk_create_drones": WRITE_VERSION + """
+    UNWIND $rows AS row
+    MERGE (d:Drone {uuid: row.uuid})
+    ON CREATE SET d.name = row.name, d.brand = row.brand, d.version = version, d.updated_at = datetime()
+    WITH version, d, row
+    CALL {
+        WITH version, d, row
+        MATCH (a:Aircraft {name: row.aircraft})
+        MERGE (a)-[r:HAS]->(d)
+        ON CREATE SET r.uuid = randomUUID(), r.version = version, r.updated_at = datetime()
+    }
+    CALL {
+        WITH version, d, row
+        MATCH (s:Soldier {name: row.soldier})
+        MERGE (s)-[r:RESPONSIBLE_FOR]->(d)
+        ON CREATE SET r.uuid = randomUUID(), r.version = version, r.updated_at = datetime()
+    }
+    RETURN COUNT(DISTINCT CASE WHEN d.version = version THEN d END) AS count
+    """,
+    "bulk_add_relationships": WRITE_VERSION + """
+    UNWIND $rows AS row
+    MATCH (a:Aircraft {name: row.aircraft}), (d:Drone {name: row.drone})
+    MERGE (a)-[r:{rel_type}]->(d)
+    ON CREATE SET r.uuid = row.uuid, r.version = version, r.updated_at = datetime()
+    RETURN COUNT(DISTINCT CASE WHEN r.version = version THEN r END) AS count
+    """,
+    # Server time, as a version, and the version below which changes were pruned
+    "current_version": """
+    OPTIONAL MATCH (log:ChangeLog {name: "fleet"})
+    RETURN timestamp() AS version, coalesce(log.pruned_before, 0) AS pruned_before
+    """,
+    # Changes with a version above $since, or from the last $lag milliseconds when it
+    # is null, along with the current_version columns. They are in version order, and
+    # within one write node changes come before relationship changes (by kind).
+    "changes_since": """
+    MATCH (c:Change)
+    WHERE c.version > coalesce($since, timestamp() - $lag)
+    WITH c
+    ORDER BY c.version, c.kind, c.id
+    LIMIT $limit
+    WITH collect(properties(c)) AS changes
+    OPTIONAL MATCH (log:ChangeLog {name: "fleet"})
+    RETURN timestamp() AS version, coalesce(log.pruned_before, 0) AS pruned_before, changes
+    """,
+    # Drop changes older than $before; clients that have not seen them resync fully.
+    # The change log node only records how far the log was pruned.
+    "prune_changes": """
+    MERGE (log:ChangeLog {name: "fleet"})
+    SET log.pruned_before = CASE WHEN coalesce(log.pruned_before, 0) > $before THEN log.pruned_before ELSE $before END
+    WITH log
+    OPTIONAL MATCH (c:Change)
+    WHERE c.version < $before
+    DELETE c
+    RETURN COUNT(c) AS count
+    """,
+    # One page of neighbours for each node of a frontier (see ego.py): the neighbours
+    # with a UUID after the node's cursor, in UUID order, at most $limit per node,
+    # one row per neighbour with every relationship between the two.
+    # Keyset paging on the uniquely indexed uuid, limited per node inside the
+    # subquery: the distinct neighbours past the cursor are cut to the top $limit
+    # (no sort of a hub's whole neighbourhood, nothing collected for the rest), and
+    # only the relationships of those are read again and collected.
+    "ego_neighbours": """
+    UNWIND $nodes AS node
+    MATCH (n:{label} {uuid: node.uuid})
+    CALL {
+        WITH n, node
+        MATCH (n)--(m)
+        WHERE m.uuid > node.after AND any(label IN labels(m) WHERE label IN $labels)
+        WITH DISTINCT m
+        ORDER BY m.uuid
+        LIMIT $limit
+        RETURN m
+    }
+    MATCH (n)-[r]-(m)
+    WITH node, m, collect({type: type(r), outgoing: startNode(r) = n}) AS relationships
+    RETURN node.uuid AS Source, [label IN labels(m) WHERE label IN $labels][0] AS Label,
+           m.name AS Name, m.uuid AS UUID, relationships AS Relationships
+    """,
+    # Full reads for snapshot.py
+    "snapshot_nodes": """
+    MATCH (n:{label})
+    RETURN n.uuid AS uuid, n.name AS name, n.brand AS brand
+    """,
+    "snapshot_relationships": """
+    MATCH (a:{label})-[r]->(b)
+    WITH a, r, b, [label IN labels(b) WHERE label IN $labels] AS target_labels
+    WHERE size(target_labels) > 0
+    RETURN a.uuid AS source, type(r) AS type, target_labels[0] AS target_label, b.uuid AS target, r.uuid AS uuid
+    """,
+    # Aggregates refreshed in the background, see aggregates.py
+    "aggregate_totals": """
+    CALL { MATCH (a:Aircraft) RETURN COUNT(a) AS aircraft }
+    CALL { MATCH (s:Soldier) RETURN COUNT(s) AS soldiers }
+    CALL { MATCH (d:Drone) RETURN COUNT(d) AS drones }
+    RETURN {Aircraft: aircraft, Soldier: soldiers, Drone: drones} AS value
+    """,
+    "aggregate_drones_per_brand": """
+    MATCH (d:Drone)
+    WITH d.brand AS brand, COUNT(d) AS total
+    RETURN collect([brand, total]) AS value
+    """,
+    "aggregate_drones_per_aircraft": """
+    MATCH (a:Aircraft)
+    OPTIONAL MATCH (a)-[:HAS]->(d:Drone)
+    WITH a, COUNT(d) AS total
+    RETURN collect([a.name, total]) AS value
+    """,
+    "aggregate_soldiers_without_drones": """
+    MATCH (s:Soldier)
+    WHERE NOT (s)-[:RESPONSIBLE_FOR]->(:Drone)
+    RETURN COUNT(s) AS value
+    """,
+    "statistics": """
+    CALL { MATCH (a:Aircraft) RETURN COUNT(a) AS aircraft }
+    CALL { MATCH (s:Soldier) RETURN COUNT(s) AS soldiers }
+    CALL { MATCH (d:Drone) RETURN COUNT(d) AS drones }
+    CALL {
+        MATCH (d:Drone)
+        WITH d.brand AS brand, COUNT(d) AS total
+        RETURN collect({brand: brand, count: total}) AS drones_per_brand
+    }
+    CALL {
+        MATCH (a:Aircraft)
+        OPTIONAL MATCH (a)-[:HAS]->(d:Drone)
+        WITH a, COUNT(d) AS total
+        RETURN collect({aircraft: a.name, count: total}) AS drones_per_aircraft
+    }
+    CALL {
+        MATCH (s:Soldier)
+        WHERE NOT (s)-[:RESPONSIBLE_FOR]->(:Drone)
+        RETURN COUNT(s) AS soldiers_without_drones
+    }
+    RETURN aircraft, soldiers, drones, drones_per_brand, drones_per_aircraft, soldiers_without_drones
+    """,
+}
+
+# Reverse lookup from rendered text to (name, label, rel_type), used for logging
+_rendered = {}
+
+# Check a label against the whitelist
+def check_label(label):
+    if label not in ENTITY_LABELS:
+        raise ValueError(f"Unsupported entity type: {label}")
+    return label
+
+# Check a relationship type against the whitelist
+def check_relationship_type(rel_type):
+    if rel_type not in RELATIONSHIP_TYPES:
+        raise ValueError(f"Unsupported relationship type: {rel_type}")
+    return rel_type
+
+# Render a named template. The text is identical for every call with the same
+# placeholders, so the server can reuse its cached plan.
+@lru_cache(maxsize=None)
+def render(name, label=None, rel_type=None):
+    if name not in QUERIES:
+        raise KeyError(f"Unknown query: {name}")
+    text = QUERIES[name]
+    if "{label}" in text:
+        text = text.replace("{label}", check_label(label))
+    if "{rel_type}" in text:
+        text = text.replace("{rel_type}", check_relationship_type(rel_type))
+    _rendered[text] = (name, label, rel_type)
+    return text
+
+# Name of a rendered query, or None for ad-hoc text
+def name_of(text):
+    return _rendered.get(text, (None, None, None))[0]
+
+# (name, label, rel_type) a text was rendered from, or None for ad-hoc text
+def describe(text):
+    return _rendered.get(text)
+
+# Column names of a rendered query, from its last RETURN clause, e.g. the keys of an
+# empty result
+@lru_cache(maxsize=None)
+def columns(text):
+    clause = re.split(r"\bRETURN\s+(?:DISTINCT\s+)?", text)[-1]
+    clause = re.split(r"\b(?:ORDER BY|SKIP|LIMIT)\b", clause)[0]
+    items, depth, start = [], 0, 0
+    for position, char in enumerate(clause):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(clause[start:position])
+            start = position + 1
+    items.append(clause[start:])
+    return [re.split(r"\s+AS\s+", " ".join(item.split()))[-1] for item in items if item.strip()]
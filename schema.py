@@ -0,0 +1,73 @@
+import threading
+import time
+from neo4j import Driver
+import connection
+
+# Uniqueness constraints, each one also backs a range index on its property
+CONSTRAINTS = {
+    "aircraft_uuid_unique": "CREATE CONSTRAINT aircraft_uuid_unique IF NOT EXISTS FOR (n:Aircraft) REQUIRE n.uuid IS UNIQUE",
+    "soldier_uuid_unique": "CREATE CONSTRAINT soldier_uuid_unique IF NOT EXISTS FOR (n:Soldier) REQUIRE n.uuid IS UNIQUE",
+    "drone_uuid_unique": "CREATE CONSTRAINT drone_uuid_unique IF NOT EXISTS FOR (n:Drone) REQUIRE n.uuid IS UNIQUE",
+    "drone_name_unique": "CREATE CONSTRAINT drone_name_unique IF NOT EXISTS FOR (n:Drone) REQUIRE n.name IS UNIQUE",
+    "change_log_name_unique": "CREATE CONSTRAINT change_log_name_unique IF NOT EXISTS FOR (n:ChangeLog) REQUIRE n.name IS UNIQUE",
+}
+
+# Indexes for name lookups (range), substring/prefix search (text) and the change feed
+INDEXES = {
+    "aircraft_name": "CREATE INDEX aircraft_name IF NOT EXISTS FOR (n:Aircraft) ON (n.name)",
+    "soldier_name": "CREATE INDEX soldier_name IF NOT EXISTS FOR (n:Soldier) ON (n.name)",
+    "aircraft_name_text": "CREATE TEXT INDEX aircraft_name_text IF NOT EXISTS FOR (n:Aircraft) ON (n.name)",
+    "soldier_name_text": "CREATE TEXT INDEX soldier_name_text IF NOT EXISTS FOR (n:Soldier) ON (n.name)",
+    "drone_name_text": "CREATE TEXT INDEX drone_name_text IF NOT EXISTS FOR (n:Drone) ON (n.name)",
+    "change_version": "CREATE INDEX change_version IF NOT EXISTS FOR (n:Change) ON (n.version)",
+}
+
+# Seconds after which a bootstrap that left indexes populating is checked again
+RECHECK_INTERVAL = 30.0
+
+# Bootstrap done in this process for each database: the key of a shared driver (see
+# connection.shared_key), so a driver rebuilt by connection.reset_driver is not
+# bootstrapped again, or the driver itself for the embedded backends
+_reports = {}
+_lock = threading.Lock()
+
+# Names of the expected constraints and indexes that are missing or not online
+def check_schema(driver: Driver):
+    with driver.session() as session:
+        constraints = {record["name"] for record in session.run("SHOW CONSTRAINTS YIELD name")}
+        indexes = {
+            record["name"]: record["state"]
+            for record in session.run("SHOW INDEXES YIELD name, state")
+        }
+    missing = [name for name in CONSTRAINTS if name not in constraints]
+    missing += [name for name in INDEXES if indexes.get(name) != "ONLINE"]
+    return missing
+
+# Create every constraint and index that does not exist yet. Statements are
+# idempotent; one failing (e.g. duplicate drone names) does not stop the others.
+# Returns a dict of statement name -> error message for the failures.
+def create_schema(driver: Driver):
+    errors = {}
+    with driver.session() as session:
+        for name, statement in {**CONSTRAINTS, **INDEXES}.items():
+            try:
+                session.run(statement).consume()
+            except Exception as e:
+                errors[name] = str(e)
+    return errors
+
+# Bootstrap the schema once per database and process. Returns the constraints and
+# indexes still missing after the bootstrap, as name -> reason. While some are only
+# not online yet, they are checked again every RECHECK_INTERVAL seconds.
+def ensure_schema(driver: Driver):
+    key = connection.shared_key(driver) or driver
+    with _lock:
+        bootstrap = _reports.get(key)
+        if bootstrap is None:
+            bootstrap = _reports[key] = {"errors": create_schema(driver), "missing": None, "checked_at": 0.0}
+        pending = bootstrap["missing"] is None or "not online yet" in bootstrap["missing"].values()
+        if pending and time.monotonic() - bootstrap["checked_at"] >= RECHECK_INTERVAL:
+            missing = check_schema(driver)
+            bootstrap["missing"] = {name: bootstrap["errors"].get(name, "not online yet") for name in missing}
+            bootstrap["checked_at"] = time.monotonic()
+        return bootstrap["missing"]
@@ -0,0 +1,466 @@
+import argparse
+import bisect
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import aggregates
+import connection
+import instrumentation
+import queries
+from fake_driver import FakeSession
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Snapshot layout, one directory per export under the snapshot root:
+#   meta.json                           format, time, change log version, labels,
+#                                       relationship types, counts and statistics
+#   <label>.<field>.data/offsets.npy    string columns (uuid, name, brand) as UTF-8
+#                                       bytes plus n + 1 offsets, .nulls.npy if any
+#   <label>.name_order.npy              node indexes in name order
+#   edges.<field>.npy                   relationships as source label/index, type,
+#                                       target label/index, sorted by source
+#   <label>.out_offsets.npy             CSR: outgoing edges of node i are
+#                                       edges[out_offsets[i]:out_offsets[i + 1]]
+#   <label>.in_edges/in_offsets.npy     CSR of incoming edge ids, by target
+# Nodes of a label are stored in UUID order, so pages are slices. The CURRENT file
+# names the directory in use and is replaced atomically once a new export is done.
+FORMAT = 1
+POINTER = "CURRENT"
+
+# Exports kept on disk; readers may still have an older one mapped
+DEFAULT_KEEP = 2
+
+def _write_strings(directory, name, values):
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    if any(value is None for value in values):
+        np.save(os.path.join(directory, f"{name}.nulls.npy"), np.array([value is None for value in values]))
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+# Memory-mapped string column
+class Strings:
+    def __init__(self, directory, name):
+        self.offsets = _load(directory, f"{name}.offsets")
+        self.data = _load(directory, f"{name}.data")
+        nulls = os.path.join(directory, f"{name}.nulls.npy")
+        self.nulls = np.load(nulls, mmap_mode="r") if os.path.exists(nulls) else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if self.nulls is not None and self.nulls[index]:
+            return None
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    # Every value, decoded in one pass by Arrow straight from the mapped buffers
+    def to_list(self):
+        if pa is None or not len(self.data):
+            values = [self[index] for index in range(len(self))]
+        else:
+            array = pa.LargeStringArray.from_buffers(len(self), pa.py_buffer(self.offsets), pa.py_buffer(self.data))
+            values = array.to_pylist()
+        if self.nulls is not None:
+            for index in np.flatnonzero(self.nulls):
+                values[index] = None
+        return values
+
+# A column seen through a permutation, for binary search in name order
+class _Ordered:
+    def __init__(self, column, order):
+        self.column = column
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    # Names are sorted with nulls as "" (see write_snapshot)
+    def __getitem__(self, position):
+        return self.column[self.order[position]] or ""
+
+# Read everything in one read transaction. Returns the change log version, the
+# statistics record (None unless asked for), the nodes of every label as uuid/name/
+# brand dicts and the relationships of every source label as source/type/
+# target_label/target dicts.
+def read_graph(driver, statistics=True):
+    def work(tx):
+        version = instrumentation.run_single(tx, queries.render("current_version"))["version"]
+        record = instrumentation.run_single(tx, queries.render("statistics")).data() if statistics else None
+        nodes = {
+            label: list(instrumentation.run_stream(tx, queries.render("snapshot_nodes", label=label)))
+            for label in queries.ENTITY_LABELS
+        }
+        relationships = {
+            label: list(instrumentation.run_stream(tx, queries.render("snapshot_relationships", label=label),
+                                                   {"labels": queries.ENTITY_LABELS}))
+            for label in queries.ENTITY_LABELS
+        }
+        return version, record, nodes, relationships
+
+    with driver.session() as session:
+        return session.execute_read(work)
+
+# Write one snapshot into an empty directory
+def write_snapshot(directory, version, statistics, nodes, relationships):
+    labels = list(queries.ENTITY_LABELS)
+    types = ["HAS", "RESPONSIBLE_FOR"] + list(queries.RELATIONSHIP_TYPES)
+    index_of = {}
+    for label in labels:
+        rows = sorted(nodes[label], key=lambda row: row["uuid"])
+        index_of[label] = {row["uuid"]: index for index, row in enumerate(rows)}
+        names = [row["name"] for row in rows]
+        _write_strings(directory, f"{label}.uuid", [row["uuid"] for row in rows])
+        _write_strings(directory, f"{label}.name", names)
+        _write_strings(directory, f"{label}.brand", [row.get("brand") for row in rows])
+        np.save(os.path.join(directory, f"{label}.name_order.npy"),
+                np.array(sorted(range(len(names)), key=lambda index: names[index] or ""), dtype=np.int64))
+
+    # Relationships whose end was deleted between the node and relationship reads are dropped
+    columns = {"source_label": [], "source": [], "type": [], "target_label": [], "target": []}
+    for source_label in labels:
+        for row in relationships[source_label]:
+            source = index_of[source_label].get(row["source"])
+            target = index_of[row["target_label"]].get(row["target"])
+            if source is None or target is None:
+                continue
+            if row["type"] not in types:
+                types.append(row["type"])
+            columns["source_label"].append(labels.index(source_label))
+            columns["source"].append(source)
+            columns["type"].append(types.index(row["type"]))
+            columns["target_label"].append(labels.index(row["target_label"]))
+            columns["target"].append(target)
+
+    edges = {
+        "source_label": np.array(columns["source_label"], dtype=np.uint8),
+        "source": np.array(columns["source"], dtype=np.int64),
+        "type": np.array(columns["type"], dtype=np.uint8),
+        "target_label": np.array(columns["target_label"], dtype=np.uint8),
+        "target": np.array(columns["target"], dtype=np.int64),
+    }
+    order = np.lexsort((edges["source"], edges["source_label"]))
+    for field, values in edges.items():
+        edges[field] = values[order]
+        np.save(os.path.join(directory, f"edges.{field}.npy"), edges[field])
+
+    for code, label in enumerate(labels):
+        count = len(index_of[label])
+        low, high = np.searchsorted(edges["source_label"], [code, code + 1])
+        out_offsets = low + np.searchsorted(edges["source"][low:high], np.arange(count + 1))
+        np.save(os.path.join(directory, f"{label}.out_offsets.npy"), out_offsets.astype(np.int64))
+        incoming = np.flatnonzero(edges["target_label"] == code)
+        incoming = incoming[np.argsort(edges["target"][incoming], kind="stable")]
+        np.save(os.path.join(directory, f"{label}.in_edges.npy"), incoming.astype(np.int64))
+        np.save(os.path.join(directory, f"{label}.in_offsets.npy"),
+                np.searchsorted(edges["target"][incoming], np.arange(count + 1)).astype(np.int64))
+
+    meta = {
+        "format": FORMAT,
+        "created_at": time.time(),
+        "version": version,
+        "labels": labels,
+        "types": types,
+        "counts": {label: len(index_of[label]) for label in labels},
+        "relationships": len(order),
+        "statistics": statistics,
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+# Export the graph into a new directory under root and make it the current snapshot.
+# The directory is complete before CURRENT points to it, so readers never see a
+# partial export. Older exports beyond `keep` are removed.
+def export_snapshot(driver, root, keep=DEFAULT_KEEP):
+    os.makedirs(root, exist_ok=True)
+    name = f"snapshot-{time.time_ns()}"
+    staging = os.path.join(root, f"{name}.tmp")
+    os.makedirs(staging)
+    try:
+        meta = write_snapshot(staging, *read_graph(driver))
+        os.rename(staging, os.path.join(root, name))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, POINTER)
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(name)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    exports = sorted(entry for entry in os.listdir(root) if entry.startswith("snapshot-") and not entry.endswith(".tmp"))
+    for old in exports[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return meta
+
+# One memory-mapped snapshot. Arrays are paged in by the OS on first access, so
+# opening is constant time whatever the size of the graph.
+class Snapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if self.meta["format"] != FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.meta['format']} in {directory}")
+        self.labels = self.meta["labels"]
+        self.types = self.meta["types"]
+        self.uuids = {label: Strings(directory, f"{label}.uuid") for label in self.labels}
+        self.names = {label: Strings(directory, f"{label}.name") for label in self.labels}
+        self.brands = {label: Strings(directory, f"{label}.brand") for label in self.labels}
+        self.name_order = {label: _load(directory, f"{label}.name_order") for label in self.labels}
+        self.edges = {field: _load(directory, f"edges.{field}") for field in ("source_label", "source", "type", "target_label", "target")}
+        self.out_offsets = {label: _load(directory, f"{label}.out_offsets") for label in self.labels}
+        self.in_edges = {label: _load(directory, f"{label}.in_edges") for label in self.labels}
+        self.in_offsets = {label: _load(directory, f"{label}.in_offsets") for label in self.labels}
+
+    @property
+    def created_at(self):
+        return self.meta["created_at"]
+
+    def age(self):
+        return time.time() - self.created_at
+
+    def count(self, label):
+        return len(self.uuids[label])
+
+    def find_by_uuid(self, label, uuid):
+        uuids = self.uuids[label]
+        index = bisect.bisect_left(uuids, uuid)
+        return index if index < len(uuids) and uuids[index] == uuid else None
+
+    # Node indexes with uuid > after, in uuid order
+    def page(self, label, after, limit):
+        start = bisect.bisect_right(self.uuids[label], after)
+        return range(start, min(start + limit, self.count(label)))
+
+    # Node indexes whose name starts with prefix, in name order. Nameless nodes never match.
+    def search(self, label, prefix, limit):
+        names = self.names[label]
+        order = self.name_order[label]
+        ordered = _Ordered(names, order)
+        matches = []
+        for position in range(bisect.bisect_left(ordered, prefix), len(ordered)):
+            if len(matches) == limit or not ordered[position].startswith(prefix):
+                break
+            if names[int(order[position])] is not None:
+                matches.append(int(order[position]))
+        return matches
+
+    # Relationships from source_label to target_label as arrays of
+    # (source indexes, type names, target indexes), optionally of one type
+    def relationships(self, source_label, target_label, rel_type=None):
+        edges = self.edges
+        mask = (edges["source_label"] == self.labels.index(source_label)) & (edges["target_label"] == self.labels.index(target_label))
+        if rel_type is not None:
+            mask &= edges["type"] == self.types.index(rel_type)
+        types = np.array(self.types, dtype=object)
+        return edges["source"][mask], types[edges["type"][mask]], edges["target"][mask]
+
+    # Relationships of one node as (other label, other index, type, outgoing)
+    def neighbours(self, label, index):
+        edges = self.edges
+        offsets = self.out_offsets[label]
+        for edge in range(offsets[index], offsets[index + 1]):
+            yield self.labels[edges["target_label"][edge]], int(edges["target"][edge]), self.types[edges["type"][edge]], True
+        offsets = self.in_offsets[label]
+        for edge in self.in_edges[label][offsets[index]:offsets[index + 1]]:
+            yield self.labels[edges["source_label"][edge]], int(edges["source"][edge]), self.types[edges["type"][edge]], False
+
+# Raised for queries a snapshot cannot answer, i.e. writes
+class ReadOnlyError(Exception):
+    pass
+
+# Stand-in for neo4j.Driver answering the registered read queries from the current
+# snapshot under root, like FakeDriver does from a MemoryGraph. CURRENT is checked at
+# most every check_interval seconds; a new export is swapped in by opening it, while
+# reads already running keep the snapshot they started with.
+class SnapshotDriver:
+    def __init__(self, root, check_interval=5.0):
+        self.root = root
+        self.check_interval = check_interval
+        # Time of the last swap in milliseconds, reported as an invalidated change of
+        # every label so the change feed drops the caches built from the previous snapshot
+        self.swapped_at = 0
+        self._snapshot = None
+        self._name = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                with open(os.path.join(self.root, POINTER), "r") as f:
+                    name = f.read().strip()
+                if name != self._name:
+                    self._snapshot = Snapshot(os.path.join(self.root, name))
+                    self._name = name
+                    self.swapped_at = int(time.time() * 1000)
+            return self._snapshot
+
+    def session(self, **config):
+        return FakeSession(self)
+
+    def verify_connectivity(self):
+        self.snapshot()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters):
+        described = queries.describe(query)
+        handler = getattr(self, f"_query_{described[0]}", None) if described else None
+        if handler is None:
+            raise ReadOnlyError(f"Not available in read-only snapshot mode: {described[0] if described else query.strip()[:60]}")
+        snapshot = self.snapshot()
+        return handler(snapshot, parameters, described[1])
+
+    def _query_current_version(self, s, p, label):
+        return [{"version": int(time.time() * 1000), "pruned_before": 0}]
+
+    def _query_changes_since(self, s, p, label):
+        version = int(time.time() * 1000)
+        since = p["since"] if p["since"] is not None else version - p["lag"]
+        changes = [
+            {"id": f"{self._name}:{label}", "version": self.swapped_at, "kind": "invalidated", "label": label}
+            for label in queries.ENTITY_LABELS
+        ] if self.swapped_at > since else []
+        return [{"version": version, "pruned_before": 0, "changes": changes}]
+
+    def _query_statistics(self, s, p, label):
+        return [s.meta["statistics"]]
+
+    def _query_aggregate_totals(self, s, p, label):
+        return [{"value": aggregates.value_from_statistics("aggregate_totals", s.meta["statistics"])}]
+
+    def _query_aggregate_drones_per_brand(self, s, p, label):
+        return [{"value": aggregates.value_from_statistics("aggregate_drones_per_brand", s.meta["statistics"])}]
+
+    def _query_aggregate_drones_per_aircraft(self, s, p, label):
+        return [{"value": aggregates.value_from_statistics("aggregate_drones_per_aircraft", s.meta["statistics"])}]
+
+    def _query_aggregate_soldiers_without_drones(self, s, p, label):
+        return [{"value": aggregates.value_from_statistics("aggregate_soldiers_without_drones", s.meta["statistics"])}]
+
+    def _query_snapshot_nodes(self, s, p, label):
+        return [
+            {"uuid": uuid, "name": name, "brand": brand}
+            for uuid, name, brand in zip(s.uuids[label].to_list(), s.names[label].to_list(), s.brands[label].to_list())
+        ]
+
+    def _query_snapshot_relationships(self, s, p, label):
+        uuids = {target_label: np.array(s.uuids[target_label].to_list(), dtype=object) for target_label in p["labels"]}
+        rows = []
+        for target_label in p["labels"]:
+            sources, types, targets = s.relationships(label, target_label)
+            rows += [
+                {"source": source, "type": rel_type, "target_label": target_label, "target": target}
+                for source, rel_type, target in zip(uuids[label][sources].tolist(), types.tolist(), uuids[target_label][targets].tolist())
+            ]
+        return rows
+
+    def _query_entity_names(self, s, p, label):
+        return [{"Name": name} for name in s.names[label].to_list()]
+
+    def _query_list_entities(self, s, p, label):
+        return [{"Name": name, "UUID": uuid} for name, uuid in zip(s.names[label].to_list(), s.uuids[label].to_list())]
+
+    def _query_list_drones(self, s, p, label):
+        return [
+            {"Drone": name, "UUID": uuid, "Brand": brand}
+            for name, uuid, brand in zip(s.names["Drone"].to_list(), s.uuids["Drone"].to_list(), s.brands["Drone"].to_list())
+        ]
+
+    def _query_page_entities(self, s, p, label):
+        return [{"Name": s.names[label][i], "UUID": s.uuids[label][i]} for i in s.page(label, p["after"], p["limit"])]
+
+    def _query_page_drones(self, s, p, label):
+        return [
+            {"Drone": s.names["Drone"][i], "UUID": s.uuids["Drone"][i], "Brand": s.brands["Drone"][i]}
+            for i in s.page("Drone", p["after"], p["limit"])
+        ]
+
+    def _query_search_entities(self, s, p, label):
+        return [{"Name": s.names[label][i], "UUID": s.uuids[label][i]} for i in s.search(label, p["prefix"], p["limit"])]
+
+    def _relationship_rows(self, s, source_label):
+        sources, types, targets = s.relationships(source_label, "Drone")
+        names = np.array(s.names[source_label].to_list(), dtype=object)[sources]
+        drones = np.array(s.names["Drone"].to_list(), dtype=object)[targets]
+        return [
+            {source_label: name, "Drone": drone, "Relationship": rel_type, "Version": None}
+            for name, drone, rel_type in zip(names.tolist(), drones.tolist(), types.tolist())
+        ]
+
+    def _query_aircraft_drone_relationships(self, s, p, label):
+        return self._relationship_rows(s, "Aircraft")
+
+    def _query_soldier_drone_relationships(self, s, p, label):
+        return self._relationship_rows(s, "Soldier")
+
+    def _query_ego_neighbours(self, s, p, label):
+        rows = []
+        for node in p["nodes"]:
+            index = s.find_by_uuid(label, node["uuid"])
+            if index is None:
+                continue
+            neighbours = {}
+            for other_label, other, edge_type, outgoing in s.neighbours(label, index):
+                uuid = s.uuids[other_label][other]
+                if other_label in p["labels"] and uuid > node["after"]:
+                    neighbours.setdefault((uuid, other_label, other), []).append({"type": edge_type, "outgoing": outgoing})
+            for (uuid, other_label, other), relationships in sorted(neighbours.items())[:p["limit"]]:
+                rows.append({"Source": node["uuid"], "Label": other_label, "Name": s.names[other_label][other],
+                             "UUID": uuid, "Relationships": relationships})
+        return rows
+
+# One snapshot driver per root and process, like connection.get_driver
+_drivers = {}
+_lock = threading.Lock()
+
+def get_snapshot_driver(root, check_interval=5.0):
+    with _lock:
+        driver = _drivers.get(root)
+        if driver is None:
+            driver = SnapshotDriver(root, check_interval)
+            driver.verify_connectivity()
+            _drivers[root] = driver
+    return driver
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the fleet graph into a memory-mapped snapshot for read-only dashboards.")
+    parser.add_argument("root", help="Snapshot directory; each export is swapped in atomically")
+    parser.add_argument("--every", type=float, help="Export again every EVERY seconds instead of once")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Exports kept on disk")
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI"))
+    parser.add_argument("--username", default=os.environ.get("NEO4J_USERNAME", "neo4j"))
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD"))
+    args = parser.parse_args(argv)
+
+    if not args.uri or not args.password:
+        parser.error("--uri and --password (or NEO4J_URI and NEO4J_PASSWORD) are required")
+
+    driver = connection.get_driver(args.uri, args.username, args.password)
+    while True:
+        started = time.monotonic()
+        meta = export_snapshot(driver, args.root, args.keep)
+        print(f"Snapshot of version {meta['version']}: " + ", ".join(f"{count} {label}" for label, count in meta["counts"].items())
+              + f", {meta['relationships']} relationships in {time.monotonic() - started:.1f}s", flush=True)
+        if not args.every:
+            break
+        time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+
+if __name__ == "__main__":
+    main()
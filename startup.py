@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Startup timings of this process, kept light so the login page can import it
+# before anything heavy. The first import of this module stands in for the start
+# of the process: app.py imports it first.
+PROCESS_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+# Name -> milliseconds of the first time a step ran in this process (cold)
+_first = {}
+# Page -> milliseconds from the start of the rerun to the end of its script, first
+# rerun of the process and most recent
+_paint = {}
+
+# Time a step, e.g. the imports of the authenticated pages. Only the first run in
+# the process is kept: later reruns find the modules in sys.modules.
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    yield
+    with _lock:
+        _first.setdefault(name, (time.perf_counter() - started) * 1000)
+
+# Record that the script of a page finished drawing, for a rerun that started at
+# rerun_started (time.perf_counter()). The first paint of the process also records
+# the time since the process started.
+def painted(page, rerun_started):
+    now = time.perf_counter()
+    elapsed = (now - rerun_started) * 1000
+    with _lock:
+        if not _paint:
+            _first.setdefault("first paint since process start", (now - PROCESS_STARTED) * 1000)
+        timings = _paint.setdefault(page, {"first_ms": elapsed})
+        timings["last_ms"] = elapsed
+
+# {"steps": {name: ms}, "pages": {page: {"first_ms", "last_ms"}}}
+def report():
+    with _lock:
+        return {"steps": dict(_first), "pages": {page: dict(timings) for page, timings in _paint.items()}}
+
+# Modules measured by `python startup.py`
+MODULES = ["streamlit", "auth", "pandas", "neo4j", "pyvis.network", "networkx", "utils", "backends", "bulk_import"]
+
+# Cold import time of a module in milliseconds, in a fresh interpreter
+def cold_import_ms(module):
+    code = f"import time; started = time.perf_counter(); import {module}; print((time.perf_counter() - started) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(result.stdout.split()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import times of the app modules.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        samples = sorted(cold_import_ms(module) for _ in range(args.repeat))
+        print(f"{module}: {samples[len(samples) // 2]:.0f} ms")
+
+if __name__ == "__main__":
+    main()
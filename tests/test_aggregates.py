@@ -0,0 +1,46 @@
+import aggregates
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+def fleet():
+    graph = MemoryGraph()
+    aircraft = graph.add_node("Aircraft", "Alpha", "a-1")
+    graph.add_node("Soldier", "Smith", "s-1")
+    drone = graph.add_node("Drone", "D-1", "d-1", "Kratos")
+    graph.add_edge("Aircraft", aircraft, "HAS", "Drone", drone)
+    return graph
+
+# The values of a cold page come from one statistics query
+def test_missing_aggregates_are_read_together():
+    driver = FakeDriver(fleet())
+    values = aggregates.AggregateScheduler().values(driver)
+
+    assert driver.round_trips == 1 and driver.query_counts["statistics"] == 1
+    assert values == {
+        "totals": {"Aircraft": 1, "Soldier": 1, "Drone": 1},
+        "drones_per_brand": {"Kratos": 1},
+        "drones_per_aircraft": {"Alpha": 1},
+        "soldiers_without_drones": 1,
+    }
+
+def test_single_aggregate_uses_its_own_query():
+    driver = FakeDriver(fleet())
+    scheduler = aggregates.AggregateScheduler()
+    scheduler.values(driver)
+    driver.graph.add_node("Soldier", "Jones", "s-2")
+
+    assert scheduler.refresh(driver, ["soldiers_without_drones"]) == {"soldiers_without_drones": 2}
+    assert driver.query_counts["aggregate_soldiers_without_drones"] == 1
+    assert driver.query_counts["statistics"] == 1
+
+def test_dirty_aggregates_are_refreshed_by_readers_without_the_thread():
+    driver = FakeDriver(fleet())
+    scheduler = aggregates.AggregateScheduler()
+    scheduler.values(driver)
+    driver.graph.add_node("Drone", "D-2", "d-2", "Anduril")
+    scheduler.mark_dirty("Drone")
+
+    values = scheduler.values(driver)
+    assert values["totals"]["Drone"] == 2 and values["drones_per_brand"] == {"Kratos": 1, "Anduril": 1}
+    assert driver.query_counts["statistics"] == 2
+    assert not any(status["pending"] for status in scheduler.status().values())
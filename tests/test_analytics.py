@@ -0,0 +1,80 @@
+import threading
+import pytest
+import analytics
+import utils
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+# Two aircraft, two soldiers and four drones: A-1 has D-0 and D-1, Smith is
+# responsible for D-0 and D-2, D-3 stands alone
+def fleet():
+    graph = MemoryGraph()
+    aircraft = [graph.add_node("Aircraft", f"A-{number}", f"a-{number}") for number in range(2)]
+    soldiers = [graph.add_node("Soldier", name, f"s-{number}") for number, name in enumerate(["Smith", "Jones"])]
+    drones = [graph.add_node("Drone", f"D-{number}", f"d-{number}", "Kratos") for number in range(4)]
+    graph.add_edge("Aircraft", aircraft[1], "HAS", "Drone", drones[0])
+    graph.add_edge("Aircraft", aircraft[1], "HAS", "Drone", drones[1])
+    graph.add_edge("Soldier", soldiers[0], "RESPONSIBLE_FOR", "Drone", drones[0])
+    graph.add_edge("Soldier", soldiers[0], "RESPONSIBLE_FOR", "Drone", drones[2])
+    return graph
+
+def test_node_metrics():
+    metrics = analytics.node_metrics(fleet()).set_index("Name")
+    assert metrics.loc["D-0", "Degree"] == 2 and metrics.loc["D-3", "Degree"] == 0
+    assert metrics["PageRank"].sum() == pytest.approx(1.0)
+    assert metrics["PageRank"].idxmax() in ("D-0", "A-1", "Smith")
+
+def test_components():
+    sizes = analytics.components(fleet()).set_index("Name")["ComponentSize"]
+    assert sizes["A-1"] == sizes["D-2"] == 5
+    assert sizes["D-3"] == sizes["A-0"] == 1
+
+def test_soldier_load_and_orphaned_drones():
+    graph = fleet()
+    assert list(analytics.soldier_load(graph)[["Soldier", "Drones"]].itertuples(index=False, name=None)) == [("Smith", 2), ("Jones", 0)]
+    assert list(analytics.orphaned_drones(graph)["Drone"]) == ["D-2", "D-3"]
+
+def test_shortest_path():
+    graph = fleet()
+    path = analytics.shortest_path(graph, "Aircraft", "a-1", "Drone", "d-2")
+    assert [(step["Name"], step["Via"]) for step in path] == [
+        ("A-1", None), ("D-0", "-[HAS]->"), ("Smith", "<-[RESPONSIBLE_FOR]-"), ("D-2", "-[RESPONSIBLE_FOR]->"),
+    ]
+    assert analytics.shortest_path(graph, "Aircraft", "a-1", "Drone", "d-3") is None
+    assert analytics.shortest_path(graph, "Aircraft", "a-1", "Drone", "missing") is None
+
+def test_failed_path_search_is_not_a_missing_path(monkeypatch):
+    class FailingProjection(analytics.FleetProjection):
+        def load(self, driver):
+            raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(analytics, "fleet_projection", FailingProjection())
+    assert utils.get_shortest_path(FakeDriver(), "Aircraft", "a-1", "Drone", "d-2") == []
+
+# Sessions finding the projection stale at once load it once
+def test_projection_is_loaded_once_by_concurrent_sessions():
+    driver = FakeDriver(fleet(), latency=0.01)
+    projection = analytics.FleetProjection()
+    graphs = []
+    threads = [threading.Thread(target=lambda: graphs.append(projection.graph(driver))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert driver.query_counts["current_version"] == 1
+    assert len({id(graph) for graph in graphs}) == 1
+
+def test_projection_follows_changes():
+    driver = FakeDriver(fleet())
+    projection = analytics.FleetProjection()
+    graph = projection.graph(driver)
+    version = driver.graph.next_version()
+
+    projection.apply({"version": version, "kind": "node_created", "label": "Drone", "name": "D-4", "uuid": "d-4", "brand": "Kratos"})
+    projection.apply({"version": version, "kind": "relationship_created", "source_label": "Aircraft", "source": "A-0",
+                      "type": "HAS", "target": "D-4", "uuid": "r-1"})
+    assert analytics.shortest_path(graph, "Aircraft", "a-0", "Drone", "d-4") is not None
+
+    projection.apply({"version": version, "kind": "invalidated", "label": "Drone"})
+    assert projection.graph(driver) is not graph
@@ -0,0 +1,52 @@
+import pytest
+import bulk_delete
+from neo4j.exceptions import TransientError
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+# Two soldiers responsible for three drones, one of them also on an aircraft
+@pytest.fixture
+def driver():
+    graph = MemoryGraph()
+    aircraft = graph.add_node("Aircraft", "Alpha", "a-1")
+    soldiers = [graph.add_node("Soldier", name, f"s-{number}") for number, name in enumerate(["Smith", "Jones"])]
+    drones = [graph.add_node("Drone", f"D-{number}", f"d-{number}", "Kratos") for number in range(3)]
+    for drone in drones:
+        graph.add_edge("Soldier", soldiers[0], "RESPONSIBLE_FOR", "Drone", drone)
+    graph.add_edge("Soldier", soldiers[1], "RESPONSIBLE_FOR", "Drone", drones[0])
+    graph.add_edge("Aircraft", aircraft, "HAS", "Drone", drones[0])
+    return FakeDriver(graph)
+
+def invalidations(driver):
+    return [change["label"] for change in driver.graph.changes_since(0, 100) if change["kind"] == "invalidated"]
+
+def test_counts(driver):
+    counts = bulk_delete.delete_entities(driver, "Drone", ["d-0", " d-0 ", "", "d-1", "missing"], chunk_size=2)
+    assert counts == {"requested": 3, "nodes": 2, "relationships": 4, "missing": 1}
+    assert [driver.graph.names["Drone"][index] for index in driver.graph.node_indexes("Drone")] == ["D-2"]
+
+def test_progress_after_every_chunk(driver):
+    reports = []
+    bulk_delete.delete_entities(driver, "Drone", ["d-0", "d-1", "d-2"], chunk_size=2, progress=lambda *report: reports.append(report))
+    assert reports == [(2, 3, 2, 4), (3, 3, 3, 5)]
+
+def test_invalidates_the_connected_labels_once(driver):
+    bulk_delete.delete_entities(driver, "Soldier", ["s-0", "s-1"], chunk_size=1)
+    assert sorted(invalidations(driver)) == ["Drone", "Soldier"]
+
+def test_invalidates_the_labels_at_both_ends(driver):
+    bulk_delete.delete_entities(driver, "Drone", ["d-0"])
+    assert sorted(invalidations(driver)) == ["Aircraft", "Drone", "Soldier"]
+
+def test_invalidates_only_the_label_without_relationships(driver):
+    bulk_delete.delete_entities(driver, "Drone", ["missing"])
+    assert invalidations(driver) == ["Drone"]
+
+def test_failed_batches_invalidate_every_label(driver, monkeypatch):
+    def fail(p, label, rel_type):
+        raise TransientError("batch failed")
+
+    monkeypatch.setattr(driver, "_query_delete_relationships_batched", fail)
+    with pytest.raises(TransientError):
+        bulk_delete.delete_entities(driver, "Soldier", ["s-0"])
+    assert sorted(invalidations(driver)) == ["Aircraft", "Drone", "Soldier"]
@@ -0,0 +1,78 @@
+import pytest
+import bulk_import
+import utils
+from cache import entity_cache
+from changes import change_feed
+from fake_driver import FakeDriver
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+    change_feed.reset()
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+@pytest.fixture
+def sources(tmp_path):
+    return {
+        "Aircraft": write(tmp_path / "aircraft.csv", "name\nAlpha\nBravo\n"),
+        "Soldier": write(tmp_path / "soldiers.csv", "name\nSmith\n"),
+        "Drone": write(tmp_path / "drones.csv", "name,brand,aircraft,soldier\nD-1,Kratos,Alpha,Smith\nD-2,Kratos,Bravo,Smith\n"),
+        "Relationship": write(tmp_path / "relationships.csv", "aircraft,drone,type\nAlpha,D-1,SUPPORTS\nAlpha,D-1,SUPPORTS\nBravo,D-2,MONITORS\n"),
+    }
+
+def relationships(graph, source_label):
+    names = graph.names
+    return sorted((names[source_label][source], rel_type, names["Drone"][target])
+                  for source, rel_type, target in graph.edges(source_label, "Drone"))
+
+def test_counts_are_rows_written(sources):
+    driver = FakeDriver()
+    totals = bulk_import.run_import(driver, sources, batch_size=1)
+
+    # The second SUPPORTS row of the relationship file adds nothing
+    assert totals == {"Aircraft": 2, "Soldier": 1, "Drone": 2, "Relationship": 2}
+    assert relationships(driver.graph, "Aircraft") == [
+        ("Alpha", "HAS", "D-1"), ("Alpha", "SUPPORTS", "D-1"), ("Bravo", "HAS", "D-2"), ("Bravo", "MONITORS", "D-2"),
+    ]
+    assert relationships(driver.graph, "Soldier") == [("Smith", "RESPONSIBLE_FOR", "D-1"), ("Smith", "RESPONSIBLE_FOR", "D-2")]
+
+def test_import_again_writes_nothing(sources):
+    driver = FakeDriver()
+    bulk_import.run_import(driver, sources)
+    edges = relationships(driver.graph, "Aircraft")
+
+    totals = bulk_import.run_import(driver, sources)
+    assert totals == {"Aircraft": 0, "Soldier": 0, "Drone": 0, "Relationship": 0}
+    assert len(driver.graph.node_indexes("Aircraft")) == 2
+    assert relationships(driver.graph, "Aircraft") == edges
+
+def test_relationship_added_interactively_is_not_duplicated(sources):
+    driver = FakeDriver()
+    bulk_import.run_import(driver, {"Aircraft": sources["Aircraft"], "Soldier": sources["Soldier"], "Drone": sources["Drone"]})
+    utils.add_relationship(driver, "Alpha", "D-1", "SUPPORTS")
+
+    assert bulk_import.run_import(driver, {"Relationship": sources["Relationship"]}) == {"Relationship": 1}
+    assert relationships(driver.graph, "Aircraft").count(("Alpha", "SUPPORTS", "D-1")) == 1
+
+def test_checkpoint_resumes_after_written_rows(sources, tmp_path):
+    driver = FakeDriver()
+    checkpoint = bulk_import.Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.advance(bulk_import._source_key("Aircraft", sources["Aircraft"]), 1)
+
+    assert bulk_import.import_source(driver, "Aircraft", sources["Aircraft"], checkpoint=checkpoint) == 1
+    assert [driver.graph.names["Aircraft"][index] for index in driver.graph.node_indexes("Aircraft")] == ["Bravo"]
+    assert bulk_import.Checkpoint(checkpoint.path).done(bulk_import._source_key("Aircraft", sources["Aircraft"])) == 2
+
+def test_bulk_writes_invalidate_every_label_they_touch(sources):
+    driver = FakeDriver()
+    bulk_import.run_import(driver, sources)
+    invalidated = {change["label"] for change in driver.graph.changes_since(0, 100) if change["kind"] == "invalidated"}
+    assert invalidated == {"Aircraft", "Soldier", "Drone"}
+
+def test_rows_missing_a_column_are_rejected(tmp_path):
+    source = write(tmp_path / "drones.csv", "name,brand,aircraft,soldier\nD-1,,Alpha,Smith\n")
+    with pytest.raises(ValueError):
+        bulk_import.import_source(FakeDriver(), "Drone", source)
@@ -0,0 +1,77 @@
+import time
+import pytest
+import utils
+from cache import TTLCache, entity_cache, graph_cache
+from changes import change_feed
+from fake_driver import FakeDriver
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+    graph_cache.clear()
+    change_feed.reset()
+
+def test_get_or_load_loads_once():
+    cache = TTLCache()
+    loads = []
+    load = lambda: loads.append(1) or ["Alpha"]
+
+    assert cache.get_or_load("names", load) == ["Alpha"]
+    assert cache.get_or_load("names", load) == ["Alpha"]
+    assert len(loads) == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache()
+
+    def fail():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("names", fail)
+    assert cache.get_or_load("names", lambda: ["Alpha"]) == ["Alpha"]
+
+def test_expired_entries_are_reloaded():
+    cache = TTLCache(ttl=0.01)
+    cache.set("names", ["Alpha"])
+    time.sleep(0.02)
+    assert cache.get("names") is None
+    assert cache.peek("names") is None
+    assert cache.items() == []
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert [key for key, _ in cache.items()] == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_drops_tagged_entries_only():
+    cache = TTLCache()
+    cache.set("aircraft", 1, tags=("Aircraft",))
+    cache.set("relationships", 2, tags=("Aircraft", "Drone"))
+    cache.set("soldiers", 3, tags=("Soldier",))
+
+    assert cache.invalidate("Drone") == 1
+    assert cache.get("relationships") is None
+    assert (cache.get("aircraft"), cache.get("soldiers")) == (1, 3)
+
+def test_names_are_cached_until_a_write():
+    driver = FakeDriver()
+    utils.add_entity_with_uuid(driver, "Aircraft", "Alpha")
+    assert utils.load_entity_names(driver, "Aircraft") == ["Alpha"]
+    hits = entity_cache.stats()["hits"]
+    assert utils.load_entity_names(driver, "Aircraft") == ["Alpha"]
+    assert entity_cache.stats()["hits"] == hits + 1
+
+    utils.add_entity_with_uuid(driver, "Aircraft", "Bravo")
+    assert sorted(utils.load_entity_names(driver, "Aircraft")) == ["Alpha", "Bravo"]
+
+def test_write_to_another_label_keeps_names():
+    driver = FakeDriver()
+    utils.add_entity_with_uuid(driver, "Aircraft", "Alpha")
+    utils.load_entity_names(driver, "Aircraft")
+    utils.add_entity_with_uuid(driver, "Soldier", "Smith")
+    assert entity_cache.peek(("names", "Aircraft")) is not None
@@ -0,0 +1,74 @@
+import threading
+import pytest
+import changes
+import utils
+from cache import entity_cache
+from changes import ChangeFeed, change_feed
+from fake_driver import FakeDriver
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+    change_feed.reset()
+
+def test_nameless_node_does_not_touch_search_results():
+    entity_cache.set(("search", "Aircraft", "Al", 20), [{"Name": "Alpha", "UUID": "a-1"}], tags=("Aircraft",))
+    assert not changes._touches(("search", "Aircraft", "Al", 20), [], "Aircraft", None, "a-2")
+
+    feed = ChangeFeed()
+    feed._node_created({"label": "Aircraft", "name": None, "uuid": "a-2"})
+    assert entity_cache.peek(("search", "Aircraft", "Al", 20)) is not None
+
+def test_created_node_is_patched_in():
+    driver = FakeDriver()
+    utils.add_entity_with_uuid(driver, "Aircraft", "Alpha")
+    assert [row["Name"] for row in utils.load_search(driver, "Aircraft", "")] == ["Alpha"]
+
+    # Written by another process
+    driver.graph.add_node("Aircraft", "Bravo", "a-2", version=driver.graph.next_version())
+    driver.graph.record_change(driver.graph.next_version(), "node_created", label="Aircraft", name="Bravo", uuid="a-2")
+    assert change_feed.sync(driver, force=True)
+    assert [row["Name"] for row in utils.load_search(driver, "Aircraft", "")] == ["Alpha", "Bravo"]
+
+# The query runs outside the lock: another sync completes meanwhile, and the changes
+# read by the first one are then dropped, not applied twice
+def test_sync_does_not_hold_the_lock_across_the_query():
+    driver = FakeDriver()
+    feed = ChangeFeed(poll_interval=0)
+    feed.sync(driver, force=True)
+    read = feed.changes_since
+    others = []
+
+    def changes_since(*args):
+        if not others:
+            others.append(threading.Thread(target=feed.sync, args=(driver, True)))
+            others[0].start()
+            others[0].join(timeout=5)
+        return read(*args)
+
+    feed.changes_since = changes_since
+    generation = feed._generation
+    assert feed.sync(driver) is False
+    assert not others[0].is_alive()
+    assert feed._generation == generation + 1
+
+# A forced sync reads again when another one applied its changes meanwhile
+def test_forced_sync_reads_again_after_a_concurrent_sync():
+    driver = FakeDriver()
+    feed = ChangeFeed()
+    feed.sync(driver, force=True)
+    read = feed.changes_since
+    calls = []
+
+    def changes_since(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            thread = threading.Thread(target=feed.sync, args=(driver, True))
+            thread.start()
+            thread.join(timeout=5)
+        return read(*args)
+
+    feed.changes_since = changes_since
+    feed.sync(driver, force=True)
+    # The first read, the concurrent sync's, and the read again
+    assert len(calls) == 3
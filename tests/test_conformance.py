@@ -0,0 +1,120 @@
+import os
+import uuid
+import pytest
+import backends
+import queries
+import utils
+from cache import entity_cache, graph_cache
+from changes import change_feed
+from fake_driver import FakeDriver
+from fleet_stats import fleet_statistics
+
+# Conformance checks for the backends of backends.py: one scenario of creates,
+# assignments, relationships, deletes, statistics and relationship listing run
+# through the utils API. Every entity is named with a run prefix and removed at the
+# end, and statistics are compared as differences, so a shared database can be used
+# as long as nothing else writes to it during the run. The embedded backend is always
+# checked, Neo4j when NEO4J_URI is set (with NEO4J_USERNAME and NEO4J_PASSWORD).
+
+@pytest.fixture(params=[
+    "embedded",
+    pytest.param("neo4j", marks=pytest.mark.skipif(not os.environ.get("NEO4J_URI"), reason="NEO4J_URI is not set")),
+])
+def driver(request):
+    if request.param == "embedded":
+        return backends.get_driver({"KIND": "embedded"})
+    return backends.get_driver({"KIND": "neo4j"}, os.environ["NEO4J_URI"],
+                               os.environ.get("NEO4J_USERNAME", "neo4j"), os.environ.get("NEO4J_PASSWORD"))
+
+# Caches are per process, not per backend
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+    graph_cache.clear()
+    change_feed.reset()
+
+def _relationships(frame, source_column, prefix):
+    if frame.empty:
+        return set()
+    rows = frame[frame[source_column].astype(str).str.startswith(prefix)]
+    return set(zip(rows[source_column].astype(str), rows["Drone"].astype(str), rows["Relationship"].astype(str)))
+
+def _statistics(driver):
+    fleet_statistics.mark_stale()
+    return utils.get_fleet_statistics(driver)
+
+def test_scenario(driver):
+    prefix = f"conformance-{uuid.uuid4().hex[:8]}-"
+    aircraft, soldier, other_soldier, drone = (prefix + name for name in ("aircraft", "soldier", "other-soldier", "drone"))
+    before = _statistics(driver)
+
+    # Create
+    created = utils.add_entity_with_uuid(driver, "Aircraft", aircraft)
+    assert [row["Name"] for row in created] == [aircraft]
+    aircraft_uuid = created[0]["UUID"]
+    soldier_uuid = utils.add_entity_with_uuid(driver, "Soldier", soldier)[0]["UUID"]
+    utils.add_entity_with_uuid(driver, "Soldier", other_soldier)
+    assert [row["Name"] for row in utils.load_search(driver, "Soldier", prefix)] == [other_soldier, soldier]
+
+    drones = utils.add_drone_with_unique_name_and_brand(driver, aircraft_uuid, drone, soldier_uuid, "Conformance")
+    assert [(row["Drone"], row["Brand"], row["SoldierDrones"]) for row in drones] == [(drone, "Conformance", 1)]
+    assert utils.add_drone_with_unique_name_and_brand(driver, aircraft_uuid, drone, soldier_uuid, "Conformance") == []
+
+    # Assign and relate
+    assigned = utils.assign_soldier_to_drone(driver, other_soldier, drone)
+    assert [(row["Soldier"], row["Drone"]) for row in assigned] == [(other_soldier, drone)]
+    related = utils.add_relationship(driver, aircraft, drone, "SUPPORTS")
+    assert [(row["Aircraft"], row["Drone"], row["Relationship"]) for row in related] == [(aircraft, drone, "SUPPORTS")]
+
+    # Relationship listing
+    assert _relationships(utils.get_aircraft_drone_relationships(driver), "Aircraft", prefix) == \
+        {(aircraft, drone, "HAS"), (aircraft, drone, "SUPPORTS")}
+    assert _relationships(utils.get_soldier_drone_relationships(driver), "Soldier", prefix) == \
+        {(soldier, drone, "RESPONSIBLE_FOR"), (other_soldier, drone, "RESPONSIBLE_FOR")}
+
+    # Statistics
+    after = _statistics(driver)
+    assert [after[label] - before[label] for label in ("Aircraft", "Soldier", "Drone")] == [1, 2, 1]
+    assert after["drones_per_brand"].get("Conformance") == 1
+    assert after["drones_per_aircraft"].get(aircraft) == 1
+    assert after["soldiers_without_drones"] - before["soldiers_without_drones"] == 0
+
+    # Delete
+    drone_uuid = drones[0]["UUID"]
+    deleted = utils.delete_entities(driver, "Drone", [drone_uuid, drone_uuid, "missing-" + prefix])
+    assert (deleted["requested"], deleted["nodes"], deleted["relationships"], deleted["missing"]) == (2, 1, 4, 1)
+    assert _relationships(utils.get_aircraft_drone_relationships(driver), "Aircraft", prefix) == set()
+    for label, name in (("Aircraft", aircraft), ("Soldier", soldier), ("Soldier", other_soldier)):
+        utils.delete_entities(driver, label, [match["UUID"] for match in utils.load_search(driver, label, name)])
+    assert utils.load_search(driver, "Soldier", prefix) == []
+    final = _statistics(driver)
+    assert [final[label] - before[label] for label in ("Aircraft", "Soldier", "Drone")] == [0, 0, 0]
+
+# The embedded backend answers every query of the registry
+@pytest.mark.parametrize("name", list(queries.QUERIES))
+def test_registry_query_has_embedded_handler(name):
+    assert callable(getattr(FakeDriver, f"_query_{name}", None))
+
+# Empty results still name their columns, like the driver's
+def test_empty_result_keys():
+    with FakeDriver().session() as session:
+        result = session.run(queries.render("aircraft_drone_relationships"))
+        assert result.data() == []
+        assert result.keys() == ["Aircraft", "Drone", "Relationship", "Version"]
+
+# A new drone is related to the selected aircraft and soldier only, not to others of the same name
+def test_drone_with_duplicate_aircraft_names(driver):
+    prefix = f"conformance-{uuid.uuid4().hex[:8]}-"
+    aircraft, soldier, drone = (prefix + name for name in ("aircraft", "soldier", "drone"))
+    selected = utils.add_entity_with_uuid(driver, "Aircraft", aircraft)[0]["UUID"]
+    other = utils.add_entity_with_uuid(driver, "Aircraft", aircraft)[0]["UUID"]
+    soldier_uuid = utils.add_entity_with_uuid(driver, "Soldier", soldier)[0]["UUID"]
+
+    drones = utils.add_drone_with_unique_name_and_brand(driver, selected, drone, soldier_uuid, "Conformance")
+    assert [row["Drone"] for row in drones] == [drone]
+    frame = utils.get_aircraft_drone_relationships(driver)
+    assert len(frame[frame["Drone"].astype(str) == drone]) == 1
+
+    utils.delete_entities(driver, "Drone", [drones[0]["UUID"]])
+    utils.delete_entities(driver, "Aircraft", [selected, other])
+    utils.delete_entities(driver, "Soldier", [soldier_uuid])
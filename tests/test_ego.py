@@ -0,0 +1,62 @@
+import pytest
+import ego
+from cache import entity_cache
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+
+# An aircraft with five drones, one of them also supported by it, and a soldier
+# responsible for the first drone
+@pytest.fixture
+def driver():
+    graph = MemoryGraph()
+    aircraft = graph.add_node("Aircraft", "Alpha", "a-1")
+    soldier = graph.add_node("Soldier", "Smith", "s-1")
+    drones = [graph.add_node("Drone", f"D-{number}", f"d-{number}", "Kratos") for number in range(5)]
+    for drone in drones:
+        graph.add_edge("Aircraft", aircraft, "HAS", "Drone", drone)
+    graph.add_edge("Aircraft", aircraft, "SUPPORTS", "Drone", drones[1])
+    graph.add_edge("Soldier", soldier, "RESPONSIBLE_FOR", "Drone", drones[0])
+    return FakeDriver(graph)
+
+def test_pages_follow_the_uuid_cursor(driver):
+    first = ego.load_pages(driver, [("Aircraft", "a-1", "")], fan_out=2)[("Aircraft", "a-1", "")]
+    assert [row["UUID"] for row in first["neighbours"]] == ["d-0", "d-1"] and first["more"]
+
+    second = ego.load_pages(driver, [("Aircraft", "a-1", "d-1")], fan_out=2)[("Aircraft", "a-1", "d-1")]
+    assert [row["UUID"] for row in second["neighbours"]] == ["d-2", "d-3"] and second["more"]
+
+    last = ego.load_pages(driver, [("Aircraft", "a-1", "d-3")], fan_out=2)[("Aircraft", "a-1", "d-3")]
+    assert [row["UUID"] for row in last["neighbours"]] == ["d-4"] and not last["more"]
+
+def test_neighbour_rows_hold_every_relationship(driver):
+    page = ego.load_pages(driver, [("Aircraft", "a-1", "d-0")], fan_out=1)[("Aircraft", "a-1", "d-0")]
+    [row] = page["neighbours"]
+    assert row["UUID"] == "d-1"
+    assert sorted(relationship["type"] for relationship in row["Relationships"]) == ["HAS", "SUPPORTS"]
+    assert all(relationship["outgoing"] for relationship in row["Relationships"])
+
+def test_pages_are_cached(driver):
+    ego.load_pages(driver, [("Aircraft", "a-1", "")], fan_out=2)
+    queries_run = driver.query_counts["ego_neighbours"]
+    ego.load_pages(driver, [("Aircraft", "a-1", "")], fan_out=2)
+    assert driver.query_counts["ego_neighbours"] == queries_run
+
+def test_neighbourhood_loads_the_requested_pages(driver):
+    nodes, relationships = ego.neighbourhood(driver, "Aircraft", "a-1", "Alpha", depth=1, fan_out=2)
+    assert list(nodes["UUID"]) == ["a-1", "d-0", "d-1"]
+    assert nodes.set_index("UUID").loc["a-1", "More"]
+
+    nodes, relationships = ego.neighbourhood(driver, "Aircraft", "a-1", "Alpha", depth=1, fan_out=2,
+                                             pages={("Aircraft", "a-1"): 3})
+    assert list(nodes["UUID"]) == ["a-1", "d-0", "d-1", "d-2", "d-3", "d-4"]
+    assert not nodes.set_index("UUID").loc["a-1", "More"]
+    assert len(relationships) == 6
+
+def test_second_hop_reaches_the_soldier(driver):
+    nodes, relationships = ego.neighbourhood(driver, "Aircraft", "a-1", "Alpha", depth=2, fan_out=2)
+    assert list(zip(nodes["UUID"], nodes["Depth"])) == [("a-1", 0), ("d-0", 1), ("d-1", 1), ("s-1", 2)]
+    assert ("Smith", "D-0", "RESPONSIBLE_FOR") in set(zip(relationships["Source"], relationships["Target"], relationships["Relationship"]))
@@ -0,0 +1,65 @@
+import bz2
+import csv
+import gzip
+import io
+import os
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+import export
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+@pytest.fixture
+def driver():
+    graph = MemoryGraph()
+    aircraft = graph.add_node("Aircraft", "Alpha", "a-1")
+    for number in range(25):
+        drone = graph.add_node("Drone", f"D-{number}", f"d-{number}", "Kratos")
+        graph.add_edge("Aircraft", aircraft, "HAS", "Drone", drone)
+    return FakeDriver(graph)
+
+def exported(driver, table, file_format, compression):
+    output = io.BytesIO()
+    rows = export.export_table(driver, table, output, file_format, compression, chunk_size=10)
+    return rows, output.getvalue()
+
+@pytest.mark.parametrize("compression, decompress", [("none", bytes), ("gzip", gzip.decompress), ("bz2", bz2.decompress)])
+def test_csv_export(driver, compression, decompress):
+    rows, data = exported(driver, "Drone", "csv", compression)
+    lines = list(csv.reader(io.StringIO(decompress(data).decode("utf-8"))))
+    assert rows == 25
+    assert lines[0] == ["Drone", "UUID", "Brand"]
+    assert sorted(lines[1:]) == sorted([f"D-{number}", f"d-{number}", "Kratos"] for number in range(25))
+
+def test_parquet_export_has_a_row_group_per_chunk(driver):
+    import pyarrow.parquet as pq
+
+    rows, data = exported(driver, "aircraft_drone", "parquet", "zstd")
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert rows == 25 and parquet.metadata.num_rows == 25
+    assert parquet.num_row_groups == 3
+    assert parquet.schema_arrow.names == ["Aircraft", "Drone", "Relationship"]
+
+def test_unsupported_compression_is_rejected(driver):
+    with pytest.raises(ValueError):
+        export.export_table(driver, "Drone", io.BytesIO(), "parquet", "bz2")
+
+# The download callable goes through Streamlit's conversion, which closes and removes the file
+def test_download_data_is_accepted_by_streamlit(driver):
+    download = export.export_to_temporary_file(driver, "Drone", "csv", "gzip", chunk_size=10)
+    path = download.path
+    data, _ = convert_data_to_bytes_and_infer_mime(download, RuntimeError("unsupported"))
+
+    assert gzip.decompress(data) == gzip.decompress(exported(driver, "Drone", "csv", "gzip")[1])
+    assert download.closed and not os.path.exists(path)
+
+def test_failed_export_leaves_no_file(driver, tmp_path, monkeypatch):
+    monkeypatch.setattr(export.tempfile, "tempdir", str(tmp_path))
+
+    def fail(*args):
+        raise RuntimeError("stream broken")
+
+    monkeypatch.setattr(export, "export_table", fail)
+    with pytest.raises(RuntimeError):
+        export.export_to_temporary_file(driver, "Drone")
+    assert os.listdir(tmp_path) == []
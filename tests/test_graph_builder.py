@@ -0,0 +1,51 @@
+import json
+import pandas as pd
+from pyvis.network import Network
+import graph_builder
+
+def relationships():
+    return pd.DataFrame([
+        {"Aircraft": "Alpha", "Drone": "D-1", "Relationship": "HAS"},
+        {"Aircraft": "Alpha", "Drone": "D-2", "Relationship": "SUPPORTS"},
+        {"Aircraft": "Bravo", "Drone": "D-1", "Relationship": "HAS"},
+        {"Aircraft": "Alpha", "Drone": "D-1", "Relationship": "MONITORS"},
+    ])
+
+def test_nodes_are_deduplicated_in_first_appearance_order():
+    nodes, edges = graph_builder.build(graph_builder.SPECS["aircraft_drone"], relationships())
+
+    assert nodes["id"] == ["Alpha", "D-1", "D-2", "Bravo"]
+    assert nodes["color"] == ["blue", "green", "green", "blue"]
+    # The second Alpha - D-1 row is a duplicate, the first one keeps its title
+    assert list(zip(edges["source"], edges["target"], edges["title"])) == [(0, 1, "HAS"), (0, 2, "SUPPORTS"), (3, 1, "HAS")]
+
+def test_id_prefix_keeps_nodes_of_the_same_name_apart():
+    data = pd.DataFrame([{"Drone": "D-1", "Brand": "Kratos"}, {"Drone": "D-1", "Brand": "Anduril"}])
+    nodes, _ = graph_builder.build(graph_builder.SPECS["drones"], data)
+    assert nodes["id"] == ["Kratos-D-1", "Anduril-D-1"]
+    assert nodes["label"] == ["D-1", "D-1"]
+
+def test_empty_frame_builds_an_empty_network():
+    nodes, edges = graph_builder.build(graph_builder.SPECS["aircraft_drone"], pd.DataFrame())
+    assert nodes["id"] == [] and edges["source"] == []
+
+# The bulk appends leave the network as the public add_node and add_edge would
+def test_append_matches_the_pyvis_api():
+    data = relationships()
+    built = graph_builder.create_network("aircraft_drone", data)
+
+    expected = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
+    nodes, edges = graph_builder.build(graph_builder.SPECS["aircraft_drone"], data)
+    for node_id, label, color in zip(nodes["id"], nodes["label"], nodes["color"]):
+        expected.add_node(node_id, label=label, color=color)
+    for source, target, title in zip(edges["source"], edges["target"], edges["title"]):
+        expected.add_edge(nodes["id"][source], nodes["id"][target], title=title)
+
+    assert built.get_nodes() == expected.get_nodes()
+    assert [built.get_node(node_id) for node_id in built.get_nodes()] == [expected.get_node(node_id) for node_id in expected.get_nodes()]
+    assert built.get_edges() == expected.get_edges()
+
+def test_json_refers_to_nodes_by_position():
+    data = json.loads(graph_builder.create_json("soldier_drone", pd.DataFrame([{"Soldier": "Smith", "Drone": "D-1"}])))
+    assert [node["id"] for node in data["nodes"]] == ["Smith", "D-1"]
+    assert data["edges"] == [{"from": 0, "to": 1, "title": "Responsible for", "color": "orange"}]
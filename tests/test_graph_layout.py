@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+import graph_layout
+from benchmark import generate_fleet
+
+# 10k entities: 1000 soldiers with about 9 drones each, so no group is over
+# CLUSTER_MIN_SIZE, and 100 aircraft with about 180 drones each
+@pytest.fixture(scope="module")
+def fleet():
+    return generate_fleet(10_000)
+
+def relationships(graph, group_column):
+    return pd.DataFrame(
+        [{group_column: graph.names[group_column][s], "Drone": graph.names["Drone"][d], "Relationship": t}
+         for s, t, d in graph.edges(group_column, "Drone")]
+    )
+
+def node_count(net):
+    return len(net.get_nodes())
+
+@pytest.mark.parametrize("group_column", ["Soldier", "Aircraft"])
+def test_large_network_stays_within_budget(fleet, group_column):
+    data = relationships(fleet, group_column)
+    assert graph_layout.is_large(data, group_column, "Drone")
+
+    net = graph_layout.create_large_network(data, group_column, "Drone")
+    assert node_count(net) <= graph_layout.MAX_VISIBLE_NODES
+
+def test_many_small_groups_merge_into_buckets(fleet):
+    data = relationships(fleet, "Soldier")
+    groups = graph_layout.group_rows(data, "Soldier", "Drone")
+    open_groups, buckets = graph_layout.plan_clusters(groups, max_nodes=100)
+
+    assert len(open_groups) + len(buckets) <= 100
+    assert sorted(group for bucket in buckets for group in bucket) == sorted(set(groups) - open_groups)
+    assert node_count(graph_layout.create_large_network(data, "Soldier", "Drone", max_nodes=100)) <= 100
+
+def test_expanded_group_is_drawn_with_its_members(fleet):
+    data = relationships(fleet, "Aircraft")
+    group = graph_layout.cluster_names(data, "Aircraft", "Drone")[0]
+
+    net = graph_layout.create_large_network(data, "Aircraft", "Drone", expanded=[group])
+    ids = set(net.get_nodes())
+    members = {f"Drone:{member}" for member in data.loc[data["Aircraft"] == group, "Drone"]}
+    assert f"Aircraft:{group}" in ids and members <= ids
+    assert len(ids) <= graph_layout.MAX_VISIBLE_NODES
+
+# An aircraft and a drone of the same name are drawn as two nodes
+def test_group_and_member_of_the_same_name_are_distinct():
+    data = pd.DataFrame([
+        {"Aircraft": "Falcon", "Drone": "Falcon", "Relationship": "HAS"},
+        {"Aircraft": "Falcon", "Drone": "Hawk", "Relationship": "HAS"},
+    ])
+    net = graph_layout.create_large_network(data, "Aircraft", "Drone", expanded=["Falcon"])
+
+    assert set(net.get_nodes()) == {"Aircraft:Falcon", "Drone:Falcon", "Drone:Hawk"}
+    assert {(edge["from"], edge["to"]) for edge in net.get_edges()} == {("Aircraft:Falcon", "Drone:Falcon"), ("Aircraft:Falcon", "Drone:Hawk")}
@@ -0,0 +1,78 @@
+import logging
+from collections import deque
+import pytest
+import instrumentation
+import queries
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+@pytest.fixture(autouse=True)
+def fresh_records(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_executions", deque(maxlen=instrumentation.RING_SIZE))
+    monkeypatch.setattr(instrumentation, "_reruns", deque(maxlen=instrumentation.RERUN_HISTORY))
+    monkeypatch.setattr(instrumentation, "_totals", {})
+    yield
+    instrumentation.current_rerun.set(None)
+
+@pytest.fixture
+def session():
+    graph = MemoryGraph()
+    graph.add_node("Aircraft", "Alpha", "a-1")
+    graph.add_node("Aircraft", "Bravo", "a-2")
+    with FakeDriver(graph).session() as session:
+        yield session
+
+def names_query():
+    return queries.render("entity_names", label="Aircraft")
+
+def test_execution_is_recorded_without_parameter_values(session):
+    rows = instrumentation.run_data(session, queries.render("search_entities", label="Aircraft"), {"prefix": "secret", "limit": 10})
+    [execution] = instrumentation.recent_executions()
+
+    assert execution["query"] == "search_entities" and execution["rows"] == len(rows)
+    assert execution["parameters"] == {"prefix": "str", "limit": "int"}
+    assert "secret" not in instrumentation.export_jsonl()
+
+def test_totals_and_rerun_attribution(session):
+    rerun = instrumentation.start_rerun("Statistics")
+    instrumentation.run_data(session, names_query())
+    instrumentation.run_frame(session, names_query(), chunk_size=1)
+
+    totals = instrumentation.query_totals()["entity_names"]
+    assert (totals["count"], totals["rows"], totals["errors"]) == (2, 4, 0)
+    assert (rerun.queries, rerun.rows) == (2, 4)
+    assert {execution["page"] for execution in instrumentation.recent_executions()} == {"Statistics"}
+
+def test_ring_buffer_keeps_the_latest_executions(session, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_executions", deque(maxlen=3))
+    for _ in range(5):
+        instrumentation.run_data(session, names_query())
+    assert len(instrumentation.recent_executions()) == 3
+    assert instrumentation.query_totals()["entity_names"]["count"] == 5
+
+def test_slow_queries_are_logged(session, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger=instrumentation.slow_query_log.name):
+        instrumentation.run_single(session, names_query())
+    assert "Slow query entity_names" in caplog.text
+    assert instrumentation.query_totals()["entity_names"]["slow"] == 1
+
+def test_failed_query_is_recorded_and_raised(session):
+    with pytest.raises(Exception):
+        instrumentation.run_data(session, "MATCH (n) RETURN n")
+    [execution] = instrumentation.recent_executions()
+    assert (execution["query"], execution["error"]) == ("adhoc", "UnsupportedQueryError")
+    assert instrumentation.query_totals()["adhoc"]["errors"] == 1
+
+def test_stream_closed_early_is_recorded(session):
+    stream = instrumentation.run_stream(session, names_query())
+    next(stream)
+    stream.close()
+    [execution] = instrumentation.recent_executions()
+    assert (execution["rows"], execution["error"]) == (1, "closed early")
+
+def test_prometheus_export(session):
+    instrumentation.run_data(session, names_query())
+    text = instrumentation.export_prometheus()
+    assert 'neo4j_app_queries_total{query="entity_names"} 1' in text
+    assert 'neo4j_app_query_rows_total{query="entity_names"} 2' in text
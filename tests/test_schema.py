@@ -0,0 +1,36 @@
+import schema
+import utils
+from fake_driver import FakeDriver
+
+# A FakeDriver whose indexes are populating until ready is set
+class PopulatingDriver(FakeDriver):
+    def __init__(self):
+        super().__init__()
+        self.ready = False
+
+    def run(self, query, parameters):
+        rows = super().run(query, parameters)
+        if query.strip().upper().startswith("SHOW INDEXES") and not self.ready:
+            return [dict(row, state="POPULATING") for row in rows]
+        return rows
+
+def test_schema_is_bootstrapped_once_per_driver():
+    driver = FakeDriver()
+    assert schema.ensure_schema(driver) == {}
+    statements = driver.query_counts["(schema)"]
+    assert schema.ensure_schema(driver) == {}
+    assert driver.query_counts["(schema)"] == statements
+
+def test_writes_do_not_touch_the_schema():
+    driver = FakeDriver()
+    utils.add_entity_with_uuid(driver, "Aircraft", "Alpha")
+    assert driver.query_counts["(schema)"] == 0
+
+def test_populating_indexes_are_checked_again(monkeypatch):
+    driver = PopulatingDriver()
+    assert set(schema.ensure_schema(driver)) == set(schema.INDEXES)
+
+    driver.ready = True
+    assert set(schema.ensure_schema(driver)) == set(schema.INDEXES)
+    monkeypatch.setattr(schema, "RECHECK_INTERVAL", 0)
+    assert schema.ensure_schema(driver) == {}
@@ -0,0 +1,47 @@
+import pytest
+import utils
+from cache import entity_cache
+from changes import change_feed
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    entity_cache.clear()
+    change_feed.reset()
+
+@pytest.fixture
+def driver():
+    graph = MemoryGraph()
+    for number, name in enumerate(["Alpha", "Alpine", "Alps", "Bravo", "Charlie"]):
+        graph.add_node("Aircraft", name, f"a-{number}")
+    return FakeDriver(graph)
+
+def names(rows):
+    return [row["Name"] for row in rows]
+
+def test_matches_start_with_the_prefix_in_name_order(driver):
+    assert names(utils.load_search(driver, "Aircraft", "Al")) == ["Alpha", "Alpine", "Alps"]
+    assert names(utils.load_search(driver, "Aircraft", "", limit=2)) == ["Alpha", "Alpine"]
+    assert utils.load_search(driver, "Aircraft", "Z") == []
+
+def test_longer_prefix_is_filtered_from_a_complete_shorter_one(driver):
+    utils.load_search(driver, "Aircraft", "A")
+    queries_run = driver.query_counts["search_entities"]
+
+    assert names(utils.load_search(driver, "Aircraft", "Alp")) == ["Alpha", "Alpine", "Alps"]
+    assert names(utils.load_search(driver, "Aircraft", "Alpi")) == ["Alpine"]
+    assert driver.query_counts["search_entities"] == queries_run
+
+def test_truncated_shorter_prefix_is_not_used(driver):
+    utils.load_search(driver, "Aircraft", "", limit=2)
+    queries_run = driver.query_counts["search_entities"]
+
+    assert names(utils.load_search(driver, "Aircraft", "B", limit=2)) == ["Bravo"]
+    assert driver.query_counts["search_entities"] == queries_run + 1
+
+def test_new_entity_is_found_after_a_write(driver):
+    assert names(utils.load_search(driver, "Aircraft", "Al")) == ["Alpha", "Alpine", "Alps"]
+    utils.add_entity_with_uuid(driver, "Aircraft", "Alto")
+    assert names(utils.load_search(driver, "Aircraft", "Alt")) == ["Alto"]
+    assert "Alto" in names(utils.load_search(driver, "Aircraft", "Al"))
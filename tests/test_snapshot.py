@@ -0,0 +1,36 @@
+import snapshot
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+
+# A fleet with a nameless aircraft, whose name sorts before every other one
+def fleet():
+    graph = MemoryGraph()
+    graph.add_node("Aircraft", None, "a-0")
+    graph.add_node("Aircraft", "Alpha", "a-1")
+    graph.add_node("Aircraft", "Alpine", "a-2")
+    graph.add_node("Aircraft", "Bravo", "a-3")
+    graph.add_node("Soldier", "Smith", "s-1")
+    drone = graph.add_node("Drone", "Drone-1", "d-1", "Kratos")
+    graph.add_edge("Aircraft", graph.find_by_uuid("Aircraft", "a-0"), "HAS", "Drone", drone)
+    return graph
+
+def test_search_skips_nameless_nodes(tmp_path):
+    snapshot.export_snapshot(FakeDriver(fleet()), str(tmp_path))
+    current = snapshot.SnapshotDriver(str(tmp_path)).snapshot()
+    names = current.names["Aircraft"]
+
+    assert current.count("Aircraft") == 4
+    assert [names[index] for index in current.search("Aircraft", "", 10)] == ["Alpha", "Alpine", "Bravo"]
+    assert [names[index] for index in current.search("Aircraft", "Alp", 10)] == ["Alpha", "Alpine"]
+    assert [names[index] for index in current.search("Aircraft", "", 2)] == ["Alpha", "Alpine"]
+    assert current.search("Aircraft", "Z", 10) == []
+
+def test_memory_graph_search_skips_nameless_nodes():
+    graph = fleet()
+    names = graph.names["Aircraft"]
+
+    assert [names[index] for index in graph.search("Aircraft", "", 10)] == ["Alpha", "Alpine", "Bravo"]
+    graph.add_node("Aircraft", None, "a-4")
+    graph.add_node("Aircraft", "Alps", "a-5")
+    graph.delete_node("Aircraft", graph.find_by_uuid("Aircraft", "a-0"))
+    assert [names[index] for index in graph.search("Aircraft", "Alp", 10)] == ["Alpha", "Alpine", "Alps"]
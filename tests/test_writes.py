@@ -0,0 +1,94 @@
+import threading
+import time
+import uuid
+import pytest
+import queries
+from fake_driver import FakeDriver
+from memory_graph import MemoryGraph
+from writes import WriteCoalescer
+
+QUERY = queries.render("add_relationships", rel_type="SUPPORTS")
+
+def fleet(drones=50):
+    graph = MemoryGraph()
+    graph.add_node("Aircraft", "Alpha", "a-1")
+    for number in range(drones):
+        graph.add_node("Drone", f"D-{number}", f"d-{number}", "Kratos")
+    return graph
+
+def row(number):
+    return {"aircraft": "Alpha", "drone": f"D-{number}", "uuid": str(uuid.uuid4())}
+
+def supported(driver):
+    return sorted(driver.graph.names["Drone"][target] for _, _, target in driver.graph.edges("Aircraft", "Drone", "SUPPORTS"))
+
+def test_write_returns_its_records_without_key():
+    driver = FakeDriver(fleet())
+    records = WriteCoalescer().write(driver, QUERY, [row(0)])
+    assert records == [{"Aircraft": "Alpha", "Drone": "D-0", "Relationship": "SUPPORTS"}]
+
+def test_concurrent_writes_share_transactions():
+    driver = FakeDriver(fleet(), latency=0.02)
+    coalescer = WriteCoalescer(max_batch=8)
+    results = {}
+
+    def write(number):
+        results[number] = coalescer.write(driver, QUERY, [row(number)])
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(records == [{"Aircraft": "Alpha", "Drone": f"D-{number}", "Relationship": "SUPPORTS"}]
+               for number, records in results.items())
+    assert len(results) == 40 and coalescer.rows == 40
+    assert 40 / 8 <= coalescer.batches < 40
+    assert len(supported(driver)) == 40
+
+def test_timed_out_write_is_not_written_when_its_batch_had_not_started():
+    driver = FakeDriver(fleet(), latency=0.2)
+    coalescer = WriteCoalescer()
+    first = threading.Thread(target=coalescer.write, args=(driver, QUERY, [row(0)]))
+    first.start()
+    time.sleep(0.05)
+
+    # Queued behind the first write, whose transaction is still running
+    with pytest.raises(TimeoutError):
+        coalescer.write(driver, QUERY, [row(1)], timeout=0.05)
+    first.join()
+    time.sleep(0.1)
+    assert supported(driver) == ["D-0"]
+    assert coalescer.write(driver, QUERY, [row(2)]) != []
+
+def test_failed_batch_fails_its_callers():
+    driver = FakeDriver(fleet())
+    coalescer = WriteCoalescer()
+    with pytest.raises(KeyError):
+        coalescer.write(driver, QUERY, [{"aircraft": "Alpha", "drone": "D-0"}])
+    assert coalescer.write(driver, QUERY, [row(1)]) != []
+
+# A drain that fails outside a batch unregisters its query and fails the rows still waiting
+def test_failed_drain_does_not_block_later_writes(monkeypatch):
+    driver = FakeDriver(fleet())
+    coalescer = WriteCoalescer()
+    flush = coalescer._flush
+
+    def fail(*args):
+        raise RuntimeError("drain failed")
+
+    monkeypatch.setattr(coalescer, "_flush", fail)
+    with pytest.raises(RuntimeError):
+        coalescer.write(driver, QUERY, [row(0)], timeout=1)
+    assert coalescer._pending == {}
+
+    monkeypatch.setattr(coalescer, "_flush", flush)
+    assert coalescer.write(driver, QUERY, [row(1)], timeout=1) != []
+
+def test_write_after_shutdown_fails_at_once():
+    coalescer = WriteCoalescer()
+    coalescer._executor.shutdown()
+    with pytest.raises(RuntimeError):
+        coalescer.write(FakeDriver(fleet()), QUERY, [row(0)])
+    assert coalescer._pending == {}
@@ -1,251 +1,502 @@
 import streamlit as st
-from neo4j import Driver, GraphDatabase
-from pyvis.network import Network
+from neo4j import Driver
+from neo4j.exceptions import ConstraintError, ServiceUnavailable, SessionExpired
 import pandas as pd
 import uuid  
-from enum import Enum
-import secrets
-import time
-
-# Function to generate a secure token
-def generate_token():
-    return secrets.token_hex(32)
+import hashlib
+import json
+import queries
+import connection
+from cache import entity_cache, graph_cache
+from fleet_stats import fleet_statistics
+from changes import change_feed, track_versions, RELATIONSHIP_QUERIES
+import fetch
+import instrumentation
+import columnar
+import writes
+from writes import write_coalescer
+# The modules of single pages (graphs, analytics, export, bulk delete, ego,
+# startup) are imported by the functions using them
+
+# Run a query and return its records, letting errors propagate
+def execute(driver: Driver, query, parameters=None):
+    with driver.session() as session:
+        return instrumentation.run_data(session, query, parameters)
 
-# Function to check token expiration (optional)
-def is_token_valid(token):
-    if token is None:
-        return False
-    token_parts = token.split(":")
-    if len(token_parts) != 2:
-        return False
-    try:
-        token_creation_time = int(token_parts[1])
-        current_time = int(time.time())
-        # Token valid for 1 hour (3600 seconds)
-        return current_time - token_creation_time < 3600
-    except ValueError:
-        return False
+# Run a query and return its records as a DataFrame (see columnar.py), letting errors propagate.
+# With a chunk_size the records are streamed and converted chunk_size at a time,
+# for the full tables and relationship sets.
+def execute_frame(driver: Driver, query, parameters=None, chunk_size=None):
+    config = {"fetch_size": chunk_size} if chunk_size else {}
+    with driver.session(**config) as session:
+        return instrumentation.run_frame(session, query, parameters, chunk_size)
 
-# Logout function
-def logout():
-    st.session_state["token"] = None
-    st.sidebar.info("You have been logged out!")
+# Records converted per chunk by the reads of whole tables and relationship sets
+LARGE_READ_CHUNK = 10000
 
 # Get data
-def run_query(driver: Driver, query):
+def run_query(driver: Driver, query, parameters=None):
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        return execute(driver, query, parameters)
     except Exception as e:
         st.error(f"Error executing query: {e}")
         return []
 
-# Add Aircraft, Drone lub Soldier with UUID
+# Get data as a DataFrame
+def run_query_frame(driver: Driver, query, parameters=None):
+    try:
+        return execute_frame(driver, query, parameters)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        return pd.DataFrame()
+
+# A driver whose server went away is checked, and replaced if need be, on the next
+# rerun (see connection.get_healthy_driver)
+def _check_connection(driver: Driver, error):
+    if isinstance(error, (ServiceUnavailable, SessionExpired)):
+        connection.mark_unhealthy(driver)
+        return False
+    return True
+
+# Bring the caches and statistics up to date after a write, by applying the change
+# feed (see changes.py). When the feed cannot be read, everything built from the
+# written labels is dropped instead.
+def _after_write(driver: Driver, *labels):
+    import analytics
+    try:
+        change_feed.sync(driver, force=True)
+    except Exception as e:
+        _check_connection(driver, e)
+        entity_cache.invalidate(*labels)
+        fleet_statistics.mark_stale(*labels)
+        analytics.fleet_projection.mark_stale()
+
+# Apply the writes made since the last rerun, by this or any other process, to the
+# caches. Unchanged data costs one probe per poll interval and no other query.
+def sync_changes(driver: Driver):
+    try:
+        change_feed.sync(driver)
+    except Exception as e:
+        if _check_connection(driver, e):
+            st.sidebar.warning(f"Change feed unavailable, cached data may be outdated: {e}")
+        else:
+            st.sidebar.warning(f"Lost the connection to the database, reconnecting on the next action: {e}")
+
+# Add Aircraft, Drone lub Soldier with UUID.
+# Writes below run in managed transactions retried on transient errors (see writes.py)
 def add_entity_with_uuid(driver: Driver, entity_type, name):
     entity_uuid = str(uuid.uuid4())
-    query = f"CREATE (n:{entity_type} {{name: '{name}', uuid: '{entity_uuid}'}}) RETURN n.name AS Name, n.uuid AS UUID"
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        query = queries.render("create_entity", label=entity_type)
+        return writes.write_data(driver, query, {"name": name, "uuid": entity_uuid})
     except Exception as e:
         st.error(f"Error adding {entity_type}: {e}")
         return []
+    finally:
+        _after_write(driver, entity_type)
 
-# Add drones with brand and unique name
-def add_drone_with_unique_name_and_brand(driver: Driver, aircraft_name, drone_name, soldier_name, brand):
-    existing_drone_query = f"""
-    MATCH (d:Drone {{name: '{drone_name}'}})
-    RETURN d.name AS Drone
-    """
-    existing_drone = run_query(driver, existing_drone_query)
-    
-    if existing_drone:
-        st.error(f"Drone with name '{drone_name}' already exists.")
-        return []
-
+# Add drones with brand and unique name.
+# Uniqueness is enforced by the drone_name_unique constraint (see schema.py) in the same write.
+# The aircraft and the soldier are given by UUID, their names are not unique.
+def add_drone_with_unique_name_and_brand(driver: Driver, aircraft_uuid, drone_name, soldier_uuid, brand):
     drone_uuid = str(uuid.uuid4())
-    query = f"""
-    CREATE (d:Drone {{name: '{drone_name}', uuid: '{drone_uuid}', brand: '{brand}'}})
-    WITH d
-    MATCH (a:Aircraft {{name: '{aircraft_name}'}})
-    MATCH (s:Soldier {{name: '{soldier_name}'}})
-    CREATE (s)-[:RESPONSIBLE_FOR]->(d)
-    CREATE (a)-[:HAS]->(d)
-    RETURN d.name AS Drone, d.uuid AS UUID, d.brand AS Brand;
-
-    """
+    query = queries.render("create_drone")
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        return writes.write_data(driver, query, {
+            "name": drone_name, "uuid": drone_uuid, "brand": brand,
+            "aircraft": aircraft_uuid, "soldier": soldier_uuid,
+        })
+    except ConstraintError:
+        st.error(f"Drone with name '{drone_name}' already exists.")
+        return []
     except Exception as e:
         st.error(f"Error adding drone: {e}")
         return []
+    finally:
+        _after_write(driver, "Drone")
 
-# Add relationship
-def add_relationship(driver: Driver, aircraft, drone, relationship_type):
-    query = f"""
-    MATCH (a:Aircraft {{name: '{aircraft}'}}), (d:Drone {{name: '{drone}'}})
-    CREATE (a)-[:{relationship_type}]->(d)
-    RETURN a.name AS Aircraft, d.name AS Drone, '{relationship_type}' AS Relationship
-    """
+# Add relationships from one aircraft to drones, in one transaction shared with
+# the relationships other sessions add at the same time
+def add_relationships(driver: Driver, aircraft, drones, relationship_type):
+    rows = [{"aircraft": aircraft, "drone": drone, "uuid": str(uuid.uuid4())} for drone in drones]
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        return write_coalescer.write(driver, queries.render("add_relationships", rel_type=relationship_type), rows)
     except Exception as e:
         st.error(f"Error adding relationship: {e}")
         return []
+    finally:
+        _after_write(driver, "Aircraft", "Drone")
 
-# Create Aircrafts and Drones Network
-def create_aircraft_drone_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
-
-    for row in data:
-        net.add_node(row["Aircraft"], label=row["Aircraft"], color="blue")
-        net.add_node(row["Drone"], label=row["Drone"], color="green")
-        net.add_edge(row["Aircraft"], row["Drone"], title=row.get("Relationship", "CONNECTED_TO"))
-
-    net.repulsion(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
-    return net
-
-# Create Soldiers and Drones Network
-def create_soldier_drone_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
-
-    for row in data:
-        net.add_node(row["Soldier"], label=row["Aircraft"], color="blue")
-        net.add_node(row["Drone"], label=row["Drone"], color="green")
-        net.add_edge(row["Soldier"], row["Drone"], title=row.get("Relationship", "CONNECTED_TO"))
-
-    net.repulsion(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
-    return net
+# Add relationship
+def add_relationship(driver: Driver, aircraft, drone, relationship_type):
+    return add_relationships(driver, aircraft, [drone], relationship_type)
+
+# Render a network to HTML in memory, drawn as described by a graph_builder spec
+# ("aircraft", "soldiers", "drones", "aircraft_drone" or "soldier_drone"). The result
+# is cached under a hash of the spec name, the title and the input frame, so an
+# unchanged graph is served without rendering and no file is shared between sessions.
+def render_network_html(spec_name, data, title):
+    import graph_builder
+    key = _graph_key(spec_name, title, data)
+    return graph_cache.get_or_load(key, lambda: graph_builder.create_network(spec_name, data).generate_html())
+
+# Render a large network with server-side layout and collapsed clusters, see graph_layout
+def render_large_network_html(data, title, group_column, member_column, expanded=()):
+    import graph_layout
+    expanded = sorted(expanded)
+    key = _graph_key("large", title, group_column, member_column, expanded, data)
+    return graph_cache.get_or_load(
+        key,
+        lambda: graph_layout.create_large_network(data, group_column, member_column, expanded).generate_html(),
+    )
+
+def _graph_key(*parts):
+    parts = [columnar.fingerprint(part) if isinstance(part, pd.DataFrame) else part for part in parts]
+    content = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-def create_drones_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
+# Relation types
+allowed_relationship_types = queries.RELATIONSHIP_TYPES
 
-    for row in data:
-        net.add_node(str(row["Brand"])+"-"+str(row["Drone"]), label=row["Drone"], color="green")
+# Read-through cached query, as a list of dicts or as a DataFrame (streamed in
+# chunks of chunk_size when given). Errors propagate and nothing is cached.
+# Cached frames are shared, do not modify them.
+def _load_cached(driver, key, name, entity_type, label=None, parameters=None, frame=False, chunk_size=None):
+    query = queries.render(name, label=label)
 
-    net.repulsion(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
-    return net
+    def load():
+        if frame:
+            return execute_frame(driver, query, parameters, chunk_size)
+        return execute(driver, query, parameters)
 
-def create_soldiers_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
+    return entity_cache.get_or_load(key, load, tags=(entity_type,))
 
-    for row in data:
-        net.add_node(str(row["Name"]), label=str(row["Name"]), color="green")
+# Read-through cached query, failures are reported and not cached
+def _cached_named(driver, key, name, entity_type, label=None, parameters=None, frame=False, chunk_size=None):
+    try:
+        return _load_cached(driver, key, name, entity_type, label, parameters, frame, chunk_size)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        return pd.DataFrame() if frame else []
+
+# Loaders below raise instead of reporting, so they can run on the fetch pool (see fetch.py)
+def load_entity_names(driver, entity_type):
+    data = _load_cached(driver, ("names", entity_type), "entity_names", entity_type, label=entity_type)
+    return [item["Name"] for item in data]
+
+# One page of an entity table as a DataFrame, ordered by UUID.
+# Keyset pagination: the page starts after the last UUID of the previous one, so
+# every page costs the same no matter how deep it is.
+def load_entity_page(driver, entity_type, after=None, page_size=50):
+    parameters = {"after": after or "", "limit": page_size}
+    key = ("page", entity_type, after, page_size)
+    if entity_type == "Drone":
+        return _load_cached(driver, key, "page_drones", entity_type, parameters=parameters, frame=True)
+    return _load_cached(driver, key, "page_entities", entity_type, label=entity_type, parameters=parameters, frame=True)
+
+# Relationship set of a source label (see changes.RELATIONSHIP_QUERIES), cached and
+# patched in place by the change feed
+def load_relationships(driver, name):
+    source_label = next(label for label, query in RELATIONSHIP_QUERIES.items() if query == name)
+    return entity_cache.get_or_load(
+        ("relationships", name),
+        lambda: track_versions(execute_frame(driver, queries.render(name), chunk_size=LARGE_READ_CHUNK)),
+        tags=(source_label, "Drone"),
+    )
 
-    net.repulsion(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
-    return net
+# Lists of Aircraft, Drones, Soldiers
+def get_entity_names(driver, entity_type):
+    try:
+        return load_entity_names(driver, entity_type)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        return []
 
+def get_aircraft_names(driver):
+    return get_entity_names(driver, "Aircraft")
 
-def create_aircrafts_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
+def get_drone_names(driver):
+    return get_entity_names(driver, "Drone")
 
-    for row in data:
-        net.add_node(str(row["Name"]), label=str(row["Name"]), color="green")
+def get_soldier_names(driver):
+    return get_entity_names(driver, "Soldier")
 
-    net.repulsion(node_distance=120, central_gravity=0.33, spring_length=110, spring_strength=0.10, damping=0.95)
-    return net
+# Tables of Aircraft, Soldiers (Name, UUID) and Drones (Drone, UUID, Brand)
+def get_entities(driver, entity_type):
+    if entity_type == "Drone":
+        return _cached_named(driver, ("table", entity_type), "list_drones", entity_type, frame=True, chunk_size=LARGE_READ_CHUNK)
+    return _cached_named(driver, ("table", entity_type), "list_entities", entity_type, label=entity_type, frame=True,
+                         chunk_size=LARGE_READ_CHUNK)
 
+def get_entity_page(driver, entity_type, after=None, page_size=50):
+    try:
+        return load_entity_page(driver, entity_type, after, page_size)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        return pd.DataFrame()
+
+PAGE_SIZES = [25, 50, 100, 500]
+
+# UUIDs where each visited page starts, kept in session state
+def _page_cursors(entity_type):
+    key = f"{entity_type}_page_cursors"
+    if key not in st.session_state:
+        st.session_state[key] = [None]
+    return st.session_state[key]
+
+def _reset_pages(entity_type):
+    st.session_state[f"{entity_type}_page_cursors"] = [None]
+
+# Start and size of the current page of an entity table
+def _page_position(entity_type):
+    return _page_cursors(entity_type)[-1], st.session_state.get(f"{entity_type}_page_size", PAGE_SIZES[1])
+
+# Current page of an entity table and whether there is a next one
+def get_current_page(driver, entity_type):
+    after, page_size = _page_position(entity_type)
+    rows = get_entity_page(driver, entity_type, after, page_size + 1)
+    return rows.iloc[:page_size], len(rows) > page_size
+
+# Page size and previous/next controls for an entity table
+def show_page_controls(entity_type, rows, has_next):
+    cursors = _page_cursors(entity_type)
+    st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{entity_type}_page_size",
+                 on_change=_reset_pages, args=(entity_type,))
+    previous_column, page_column, next_column = st.columns(3)
+    previous_column.button("Previous page", key=f"{entity_type}_previous_page",
+                           disabled=len(cursors) == 1, on_click=cursors.pop)
+    page_column.write(f"Page {len(cursors)}")
+    next_column.button("Next page", key=f"{entity_type}_next_page",
+                       disabled=not has_next or rows.empty, on_click=cursors.append,
+                       args=(rows["UUID"].iloc[-1] if not rows.empty else None,))
+
+# Format, compression and download button for a table of export.TABLES. The file is
+# written only when the button is clicked, streamed chunk by chunk to a temporary file,
+# then held in memory by Streamlit until it is downloaded (see export.export_to_temporary_file).
+def show_export(driver: Driver, table, label):
+    import export
+    format_column, compression_column = st.columns(2)
+    file_format = format_column.selectbox("Export format", list(export.COMPRESSIONS), key=f"{table}_export_format")
+    compression = compression_column.selectbox("Compression", export.COMPRESSIONS[file_format], key=f"{table}_export_compression")
+    st.download_button(
+        f"Download {label}",
+        lambda: export.export_to_temporary_file(driver, table, file_format, compression),
+        file_name=export.file_name(table, file_format, compression),
+        mime=export.mime_type(file_format, compression),
+        key=f"{table}_export",
+        on_click="ignore",
+    )
+    st.caption(f"Downloads are held in the app's memory. Export large tables with: python export.py {table} PATH")
+
+# Run the independent reads of a page concurrently and report failures here, in the
+# script thread. A failed read comes back as an empty list, or an empty DataFrame
+# for the reads named in `frames`.
+def _fetch_bundle(tasks, frames=()):
+    results, errors = fetch.fetch_all(tasks)
+    for name, error in errors.items():
+        st.error(f"Error executing query: {error}")
+        results[name] = pd.DataFrame() if name in frames else []
+    return results
+
+# Typeahead search: top matches whose name starts with the prefix, served by the
+# name indexes (see schema.py). A cached shorter prefix with fewer than `limit`
+# matches already holds every match of the longer one, so it is filtered locally.
+SEARCH_LIMIT = 20
+
+def load_search(driver, entity_type, prefix, limit=SEARCH_LIMIT):
+    for length in range(len(prefix) - 1, -1, -1):
+        shorter = entity_cache.peek(("search", entity_type, prefix[:length], limit))
+        if shorter is not None and len(shorter) < limit:
+            return [row for row in shorter if row["Name"].startswith(prefix)]
+    parameters = {"prefix": prefix, "limit": limit}
+    return _load_cached(driver, ("search", entity_type, prefix, limit), "search_entities", entity_type,
+                        label=entity_type, parameters=parameters)
+
+def _search_prefix(key):
+    return st.session_state.get(f"{key}_search", "")
+
+def _format_entity(entity):
+    return f"{entity['Name']} (UUID: {entity['UUID']})"
+
+# Search box and result list for one entity type. Returns the selected
+# {"Name", "UUID"} or None. `matches` are the results for the current prefix.
+def show_entity_search(entity_type, label, key, matches):
+    prefix = st.text_input(f"Search {label}", key=f"{key}_search", placeholder="Start typing a name")
+    if not matches:
+        if prefix:
+            st.info(f"No {entity_type} name starts with '{prefix}'.")
+        else:
+            st.error(f"No {entity_type} found in the database. Add {entity_type} first.")
+    return st.selectbox(label, matches, format_func=_format_entity, key=f"{key}_select")
+
+# Search box and result list, fetching the matches for the current prefix
+def search_entity(driver, entity_type, label, key):
+    try:
+        matches = load_search(driver, entity_type, _search_prefix(key))
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        matches = []
+    return show_entity_search(entity_type, label, key, matches)
 
-# Generate soldiers and drones networks
-def create_soldier_drone_network(data, title):
-    net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
+# Search box and multi-select for one entity type. Selected entities stay selected
+# when the search changes. Returns the list of selected {"Name", "UUID"}.
+def search_entities(driver, entity_type, label, key):
+    prefix = st.text_input(f"Search {label}", key=f"{key}_search", placeholder="Start typing a name")
+    try:
+        matches = load_search(driver, entity_type, prefix)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        matches = []
+    selected = st.session_state.get(f"{key}_select", [])
+    options = selected + [match for match in matches if match not in selected]
+    if prefix and not matches:
+        st.info(f"No {entity_type} name starts with '{prefix}'.")
+    return st.multiselect(label, options, format_func=_format_entity, key=f"{key}_select")
+
+# Reads of the Drones page: aircraft and soldier matches and the current drones page
+def fetch_drones_page(driver, aircraft_key, soldier_key):
+    after, page_size = _page_position("Drone")
+    aircraft_prefix, soldier_prefix = _search_prefix(aircraft_key), _search_prefix(soldier_key)
+    data = _fetch_bundle({
+        "aircraft": lambda: load_search(driver, "Aircraft", aircraft_prefix),
+        "soldiers": lambda: load_search(driver, "Soldier", soldier_prefix),
+        "drones": lambda: load_entity_page(driver, "Drone", after, page_size + 1),
+    }, frames=("drones",))
+    drones = data["drones"]
+    return data["aircraft"], data["soldiers"], drones.iloc[:page_size], len(drones) > page_size
+
+# Reads of the Aircraft and Drones Relationships page
+def fetch_aircraft_drone_page(driver, aircraft_key, drone_key):
+    aircraft_prefix, drone_prefix = _search_prefix(aircraft_key), _search_prefix(drone_key)
+    data = _fetch_bundle({
+        "aircraft": lambda: load_search(driver, "Aircraft", aircraft_prefix),
+        "drones": lambda: load_search(driver, "Drone", drone_prefix),
+        "relationships": lambda: load_relationships(driver, "aircraft_drone_relationships"),
+    }, frames=("relationships",))
+    return data["aircraft"], data["drones"], data["relationships"]
+
+# Reads of the Soldiers and Drones Relationships page
+def fetch_soldier_drone_page(driver, soldier_key, drone_key):
+    soldier_prefix, drone_prefix = _search_prefix(soldier_key), _search_prefix(drone_key)
+    data = _fetch_bundle({
+        "soldiers": lambda: load_search(driver, "Soldier", soldier_prefix),
+        "drones": lambda: load_search(driver, "Drone", drone_prefix),
+        "relationships": lambda: load_relationships(driver, "soldier_drone_relationships"),
+    }, frames=("relationships",))
+    return data["soldiers"], data["drones"], data["relationships"]
+
+# Delete entities of one type by UUID, relationships in bounded batches (see
+# bulk_delete.py). Returns the counts, or None when the deletion failed.
+def delete_entities(driver: Driver, entity_type, uuids, progress=None):
+    import bulk_delete
+    try:
+        return bulk_delete.delete_entities(driver, entity_type, uuids, progress=progress)
+    except Exception as e:
+        st.error(f"Error deleting {entity_type}: {e}")
+        return None
+    finally:
+        _after_write(driver, entity_type)
 
-    # Adding nodes and edges for soldiers and drones
-    for row in data:
-        soldier = row["Soldier"]
-        drone = row["Drone"]
-        # Add soldier node
-        net.add_node(soldier, label=soldier, color="blue")
-        # Add drone node
-        net.add_node(drone, label=drone, color="green")
-        # Create an edge from soldier to drone
-        net.add_edge(soldier, drone, title="Responsible for", color="orange")
+# Deletion function
+def delete_entity(driver: Driver, entity_type, uuid):
+    return delete_entities(driver, entity_type, [uuid])
 
-    net.repulsion(node_distance=150, central_gravity=0.33, spring_length=100, spring_strength=0.10, damping=0.95)
+# Assign a soldier to drones, in one transaction shared with the assignments
+# other sessions make at the same time
+def assign_soldier_to_drones(driver: Driver, soldier_name, drone_names):
+    rows = [{"soldier": soldier_name, "drone": drone, "uuid": str(uuid.uuid4())} for drone in drone_names]
+    try:
+        return write_coalescer.write(driver, queries.render("assign_soldiers_to_drones"), rows)
+    except Exception as e:
+        st.error(f"Error assigning soldier to drone: {e}")
+        return []
+    finally:
+        _after_write(driver, "Soldier", "Drone")
 
-    return net
+# Assign soldier to drone function 
+def assign_soldier_to_drone(driver: Driver, soldier_name, drone_name):
+    return assign_soldier_to_drones(driver, soldier_name, [drone_name])
 
-# Relation types
-allowed_relationship_types = ["CONNECTED_TO", "SUPPORTS", "MONITORS"]
+# Relationships between Aircraft and Drones
+def get_aircraft_drone_relationships(driver):
+    return get_relationships(driver, "aircraft_drone_relationships")
 
-# Lists of Aircraft, Drones, Soldiers
-def get_aircraft_names(driver):
-    query = "MATCH (a:Aircraft) RETURN a.name AS Aircraft"
-    data = run_query(driver, query)
-    return [item["Aircraft"] for item in data]
+# Relationships between Soldiers and Drones
+def get_soldier_drone_relationships(driver):
+    return get_relationships(driver, "soldier_drone_relationships")
 
-def get_drone_names(driver):
-    query = "MATCH (d:Drone) RETURN d.name AS Drone"
-    data = run_query(driver, query)
-    return [item["Drone"] for item in data]
+def get_relationships(driver, name):
+    try:
+        return load_relationships(driver, name)
+    except Exception as e:
+        st.error(f"Error executing query: {e}")
+        return pd.DataFrame()
 
-def get_soldier_names(driver):
-    query = "MATCH (s:Soldier) RETURN s.name AS Soldier"
-    data = run_query(driver, query)
-    return [item["Soldier"] for item in data]
+# Fleet statistics: totals, drones per brand, drones per aircraft and soldiers without drones
+def get_fleet_statistics(driver: Driver):
+    try:
+        return fleet_statistics.snapshot(driver)
+    except Exception as e:
+        st.error(f"Error fetching statistics: {e}")
+        return None
 
-# Deletion function
-def delete_entity(driver: Driver, entity_type, uuid):
-    query = f"""
-    MATCH (n:{entity_type} {{uuid: '{uuid}'}})
-    DETACH DELETE n
-    RETURN n
-    """
+# Nodes and relationships around an entity, see ego.neighbourhood
+def get_neighbourhood(driver, entity_type, uuid, name, depth, fan_out, pages):
+    import ego
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        return ego.neighbourhood(driver, entity_type, uuid, name, depth, fan_out, pages)
     except Exception as e:
-        st.error(f"Error deleting {entity_type}: {e}")
-        return []
+        st.error(f"Error executing query: {e}")
+        return pd.DataFrame(), pd.DataFrame()
 
-# Assign soldier to drone function 
-def assign_soldier_to_drone(driver: Driver, soldier_name, drone_name):
-    query = f"""
-    MATCH (s:Soldier {{name: '{soldier_name}'}}), (d:Drone {{name: '{drone_name}'}})
-    CREATE (s)-[:RESPONSIBLE_FOR]->(d)
-    RETURN s.name AS Soldier, d.name AS Drone
-    """
+# One analysis of analytics.ANALYSES on the fleet projection, cached until it changes
+def get_fleet_analysis(driver: Driver, name):
+    import analytics
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            return result.data()
+        return analytics.fleet_projection.cached(driver, name, analytics.ANALYSES[name])
     except Exception as e:
-        st.error(f"Error assigning soldier to drone: {e}")
+        st.error(f"Error computing {name.replace('_', ' ')}: {e}")
+        return pd.DataFrame()
+
+# Shortest path between two entities on the fleet projection, see analytics.shortest_path.
+# None when they are not connected; an empty list when finding the path failed, which
+# is reported here.
+def get_shortest_path(driver: Driver, source_type, source_uuid, target_type, target_uuid):
+    import analytics
+    try:
+        graph = analytics.fleet_projection.graph(driver)
+        return analytics.shortest_path(graph, source_type, source_uuid, target_type, target_uuid)
+    except Exception as e:
+        st.error(f"Error finding path: {e}")
         return []
 
-# Display soldiers and drones relationships
-def view_soldiers_and_drones(driver):
-    query = """
-    MATCH (s:Soldier)-[:RESPONSIBLE_FOR]->(d:Drone)
-    RETURN s.name AS Soldier, d.name AS Drone, d.uuid AS DroneUUID
-    """
-    data = run_query(driver, query)
-    return data
-
-# Function to fetch the counts from Neo4j
-def get_statistics(driver: Driver):
-    with driver.session() as session:
-        # Cypher query to count the aircraft, soldiers, and drones nodes
-        aircraft_query = "MATCH (a:Aircraft) RETURN COUNT(a) AS count"
-        soldier_query = "MATCH (s:Soldier) RETURN COUNT(s) AS count"
-        drone_query = "MATCH (d:Drone) RETURN COUNT(d) AS count"
-
-        # Execute queries and get counts
-        aircraft_count = session.run(aircraft_query).single()["count"]
-        soldier_count = session.run(soldier_query).single()["count"]
-        drone_count = session.run(drone_query).single()["count"]
-
-        return aircraft_count, soldier_count, drone_count
+# Admin sidebar panel with the totals of this rerun, per-query totals and slow queries
+def show_profiler_panel(rerun):
+    import startup
+    with st.sidebar.expander("Query profiler", expanded=True):
+        st.write(f"This rerun ({rerun.page}): {rerun.queries} queries, {rerun.rows} rows, "
+                 f"{rerun.wall_ms:.1f} ms client, {rerun.server_ms:.1f} ms server")
+
+        totals = instrumentation.query_totals()
+        if totals:
+            st.write("Totals per query")
+            st.dataframe(pd.DataFrame.from_dict(totals, orient="index"))
+
+        slow = [
+            execution for execution in instrumentation.recent_executions()
+            if execution["wall_ms"] >= instrumentation.SLOW_QUERY_MS
+        ]
+        if slow:
+            st.write(f"Slow queries (over {instrumentation.SLOW_QUERY_MS} ms)")
+            st.dataframe(pd.DataFrame(slow[-20:]))
+
+        timings = startup.report()
+        if timings["steps"]:
+            st.write("Startup (first time in this process)")
+            st.dataframe(pd.DataFrame.from_dict(timings["steps"], orient="index", columns=["ms"]))
+        if timings["pages"]:
+            st.write("Script time per page, first and last rerun")
+            st.dataframe(pd.DataFrame.from_dict(timings["pages"], orient="index"))
+
+        st.download_button("Export JSON lines", instrumentation.export_jsonl(), "queries.jsonl")
+        st.download_button("Export Prometheus metrics", instrumentation.export_prometheus(), "metrics.txt")
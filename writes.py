@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from neo4j import Driver, unit_of_work
+import instrumentation
+import queries
+
+# The server aborts a write transaction after this many seconds, so no write that
+# logs changes commits later than the change feed looks back. This is the bound of
+# COMMIT_LAG in queries.py, not a tuning knob: raising one means raising the other.
+TRANSACTION_TIMEOUT = queries.COMMIT_LAG / 1000
+# How long a caller of WriteCoalescer.write waits for its rows to be written
+DEFAULT_TIMEOUT = 30.0
+MAX_BATCH = 500
+
+# Run work(tx) in a managed transaction. The driver retries it on transient errors
+# (deadlocks, leader switches, lost connections) with backoff, up to its
+# max_transaction_retry_time. A commit whose acknowledgement was lost is run again,
+# so work must be idempotent: the write queries MERGE on UUIDs chosen by the client
+# (see queries.py), backed by the constraints bootstrapped at login (see
+# schema.ensure_schema, also run by the bulk paths).
+def execute_write(driver: Driver, work):
+    with driver.session() as session:
+        return session.execute_write(unit_of_work(timeout=TRANSACTION_TIMEOUT)(work))
+
+# Run one write query and return its records, see execute_write
+def write_data(driver: Driver, query, parameters=None):
+    return execute_write(driver, lambda tx: instrumentation.run_data(tx, query, parameters))
+
+# Group commit of small writes. Rows submitted for the same UNWIND $rows query
+# (which returns a Key column holding the uuid of each row) are written by a
+# background thread per query: a write arriving while none is in flight is written
+# at once, and the writes arriving meanwhile share the next transaction. Each caller
+# waits for the records of its own rows, at most `timeout` seconds; a failing batch
+# fails every caller in it.
+class WriteCoalescer:
+    def __init__(self, max_batch=MAX_BATCH, timeout=DEFAULT_TIMEOUT):
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # (driver id, query) -> [(rows, future)] not written yet
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(thread_name_prefix="write-coalescer")
+        self.batches = 0
+        self.rows = 0
+
+    # Write rows (dicts with a "uuid") with the query, returns their records without Key.
+    # Raises TimeoutError when they are not written within timeout seconds; they may
+    # still be written afterwards.
+    def write(self, driver: Driver, query, rows, timeout=None):
+        key = (id(driver), query)
+        future = Future()
+        with self._lock:
+            draining = key in self._pending
+            self._pending.setdefault(key, []).append((rows, future))
+            if not draining:
+                try:
+                    self._executor.submit(self._drain, driver, query, key)
+                except RuntimeError:
+                    # Shut down: nothing would ever drain the query
+                    del self._pending[key]
+                    raise
+
+        timeout = timeout or self.timeout
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Write not acknowledged within {timeout:g} s") from None
+
+    # Write the pending rows of one query, batch after batch, until there are none.
+    # Whatever ends it, the query is unregistered and the rows still waiting fail, so
+    # the next write starts a new drain instead of waiting for this one.
+    def _drain(self, driver, query, key):
+        batch = []
+        try:
+            while True:
+                with self._lock:
+                    waiting = self._pending[key]
+                    if not waiting:
+                        del self._pending[key]
+                        return
+                    batch = []
+                    size = 0
+                    while waiting and (not batch or size + len(waiting[0][0]) <= self.max_batch):
+                        rows, future = waiting.pop(0)
+                        # False when the caller gave up before the batch started
+                        if future.set_running_or_notify_cancel():
+                            batch.append((rows, future))
+                            size += len(rows)
+                if batch:
+                    self._flush(driver, query, batch)
+        except BaseException as e:
+            with self._lock:
+                waiting = self._pending.pop(key, [])
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            for _, future in waiting:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            raise
+
+    def _flush(self, driver, query, batch):
+        try:
+            records = write_data(driver, query, {"rows": [row for rows, _ in batch for row in rows]})
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.rows += sum(len(rows) for rows, _ in batch)
+        for rows, future in batch:
+            keys = {row["uuid"] for row in rows}
+            future.set_result([
+                {column: value for column, value in record.items() if column != "Key"}
+                for record in records if record["Key"] in keys
+            ])
+
+# Process-wide coalescer, shared by every session of the app
+write_coalescer = WriteCoalescer()